@@ -1,33 +1,30 @@
-import json
-from datetime import datetime
+from forum_data import iter_posts
+import argparse
+
+parser = argparse.ArgumentParser(description="Stream the forum export and print a sample.")
+parser.add_argument("--input", default="data/simplified_posts.json", help="Forum export (.json or .jsonl).")
+
 
 def load_json_with_datetime(file_path):
     """
-    Load a JSON file and convert timestamp strings to datetime objects.
+    Stream a JSON / JSON Lines export and convert timestamp strings to datetime objects.
 
     Args:
         file_path (str): Path to the JSON file
 
     Returns:
-        list: List of dictionaries with timestamp fields converted to datetime objects
+        Iterator[dict]: Dictionaries with timestamp fields converted to datetime objects,
+            parsed one at a time
     """
-    # Load JSON data from file
-    with open(file_path, 'r', encoding='utf-8') as f:
-        data = json.load(f)
-
-    # Process each item to convert timestamp fields to datetime objects
-    for item in data:
-        # Convert the creation date
-        if 'date_created' in item:
-            item['date_created'] = datetime.fromisoformat(item['date_created'])
+    return iter_posts(file_path, max_conversation_tokens=None)
 
+# Example usage
+def main(argv=None):
+    args = parser.parse_args(argv)
+    data = load_json_with_datetime(args.input)
 
+    print(next(data).keys())  # Print the first item to verify the conversion
 
-    return data
 
-# Example usage
 if __name__ == "__main__":
-    file_path = "data/simplified_posts.json"  # Replace with your actual file path
-    data = load_json_with_datetime(file_path)
-
-    print(data[0].keys())  # Print the first item to verify the conversion
+    main()
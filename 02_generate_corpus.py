@@ -0,0 +1,49 @@
+from synthetic_corpus import CorpusProfile, write_corpus, length_percentiles, FORMATS, DEFAULT_SOURCE
+from forum_data import iter_records
+import argparse
+import time
+
+parser = argparse.ArgumentParser(
+    description="Generate a synthetic forum corpus with the schema and length distribution of the real export."
+)
+parser.add_argument("--count", type=int, default=100_000, help="Number of threads to generate.")
+parser.add_argument("--output", default="data/synthetic_posts.jsonl", help="Output file (.json or .jsonl).")
+parser.add_argument("--format", choices=FORMATS, default=None, help="Output format; defaults from the file extension.")
+parser.add_argument("--seed", type=int, default=0, help="Seed; the same seed always gives the same threads.")
+parser.add_argument("--source", default=DEFAULT_SOURCE, help="Real export the length and word statistics come from.")
+parser.add_argument("--first-topic-id", type=int, default=1, help="topic_id of the first thread.")
+parser.add_argument(
+    "--labels",
+    action="store_true",
+    help="Also emit Transformation Agent columns (technicalDomain, rootCauseCategory, ...) for load-testing analysis.",
+)
+parser.add_argument("--compare", action="store_true", help="Print conversation length percentiles of the output vs. the source.")
+
+
+def main(argv=None):
+    args = parser.parse_args(argv)
+
+    profile = CorpusProfile.from_file(args.source)
+    start = time.monotonic()
+    n = write_corpus(
+        args.output,
+        args.count,
+        profile,
+        seed=args.seed,
+        labels=args.labels,
+        fmt=args.format,
+        first_topic_id=args.first_topic_id,
+    )
+    print(f"Wrote {n} threads to {args.output} in {time.monotonic() - start:.1f}s")
+
+    if args.compare:
+        quantiles = (0.5, 0.9, 0.95, 0.99, 1.0)
+        generated = length_percentiles((len(r["conversation"]) for r in iter_records(args.output)), quantiles)
+        source = length_percentiles(profile.conversation_lengths, quantiles)
+        print(f"{'quantile':>8} {'source':>10} {'generated':>10}")
+        for q in quantiles:
+            print(f"{q:>8} {source[q]:>10} {generated[q]:>10}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,70 @@
+from dedup import find_duplicates, add_vector_pairs, write_mapping, DEFAULT_SOURCE, DEFAULT_MAPPING_PATH, DEFAULT_THRESHOLD
+from forum_data import iter_records
+from helpers import NAMED_VECTORS
+from instrumentation import instrumented
+import argparse
+import time
+
+parser = argparse.ArgumentParser(
+    description="Find near-duplicate threads and write a duplicate -> canonical topic_id mapping for populate and enrich."
+)
+parser.add_argument("--input", default=DEFAULT_SOURCE, help="Forum export (.json or .jsonl).")
+parser.add_argument("--output", default=DEFAULT_MAPPING_PATH, help="Where to write the canonical-topic mapping.")
+parser.add_argument(
+    "--threshold",
+    type=float,
+    default=DEFAULT_THRESHOLD,
+    help="Minimum estimated Jaccard similarity of title + conversation shingles.",
+)
+parser.add_argument("--num-perm", type=int, default=128, help="MinHash permutations (signature length).")
+parser.add_argument("--shingle-size", type=int, default=5, help="Words per shingle.")
+parser.add_argument("--seed", type=int, default=0, help="Seed of the MinHash functions.")
+parser.add_argument(
+    "--vectors",
+    default=None,
+    help="Vector store from 62_export_vectors.py; also treat threads with near-identical vectors as duplicates.",
+)
+parser.add_argument("--vector", choices=list(NAMED_VECTORS), default="default", help="Named vector to compare (--vectors).")
+parser.add_argument("--vector-threshold", type=float, default=0.95, help="Minimum cosine similarity (--vectors).")
+parser.add_argument("--show", type=int, default=5, help="Print this many of the largest duplicate clusters.")
+
+
+@instrumented("dedup")
+def main(argv=None):
+    args = parser.parse_args(argv)
+
+    start = time.monotonic()
+    finder = find_duplicates(
+        iter_records(args.input),
+        threshold=args.threshold,
+        num_perm=args.num_perm,
+        shingle_size=args.shingle_size,
+        seed=args.seed,
+    )
+    print(f"MinHash/LSH over {len(finder.topic_ids)} threads in {time.monotonic() - start:.1f}s "
+          f"({finder.bands} bands x {finder.rows} rows)")
+
+    if args.vectors:
+        from vector_store import VectorStore, IVFIndex
+        store = VectorStore.open(args.vectors)
+        try:
+            index = IVFIndex.load(store, args.vector)
+        except FileNotFoundError:
+            index = None
+        pairs = add_vector_pairs(finder, store, args.vector, threshold=args.vector_threshold, index=index)
+        print(f"Vector pairs at cosine >= {args.vector_threshold}: {pairs}")
+
+    result = finder.result()
+    write_mapping(result, args.output, source=args.input)
+    print(
+        f"{len(result.duplicates)} duplicates of {result.threads} threads ({result.duplicate_rate:.1%}) "
+        f"in {len(result.clusters)} clusters; mapping written to {args.output}"
+    )
+    for cluster in result.clusters[:args.show]:
+        canonical, *duplicates = cluster
+        similarities = ", ".join(f"{d} ({result.duplicates[d][1]:.2f})" for d in duplicates)
+        print(f"  canonical {canonical}: {similarities}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,115 +1,385 @@
-import weaviate
-from weaviate.classes.config import Configure, Property, DataType
-from weaviate.classes.init import Auth
-from weaviate.util import generate_uuid5
-import os
-from dotenv import load_dotenv
-from datetime import datetime, timezone
-import json
-from tqdm import tqdm
-from helpers import COLLECTION_NAME
-
-weaviate_url = os.getenv("WEAVIATE_URL")
-weaviate_key = os.getenv("WEAVIATE_API_KEY")
-load_dotenv()
-
-client = weaviate.connect_to_weaviate_cloud(
-    cluster_url=weaviate_url,
-    auth_credentials=Auth.api_key(weaviate_key)
+from helpers import COLLECTION_NAME, NAMED_VECTORS, CHUNK_COLLECTION_NAME, CHUNK_NAMED_VECTORS
+from forum_data import iter_posts
+from chunking import MAX_CHUNK_TOKENS, TOKEN_COUNTERS, chunk_conversation, get_token_counter
+from ingest_manifest import IngestManifest, hash_properties, DEFAULT_MANIFEST_PATH, INSERT, UPDATE, SKIP
+from query_cache import invalidate
+from import_engine import BatchImporter, ImportConfig
+from connection import shared_client
+from instrumentation import instrumented, span
+from embeddings import CachedVectorizer, EmbeddingCache, EMBEDDERS, DEFAULT_CACHE_PATH, get_embedder
+import argparse
+
+parser = argparse.ArgumentParser(description="Import forum posts into Weaviate.")
+parser.add_argument(
+    "--mode",
+    choices=["rebuild", "incremental"],
+    default="rebuild",
+    help="'rebuild' deletes and re-imports the collection; 'incremental' only inserts new and updates changed threads.",
+)
+parser.add_argument("--yes", action="store_true", help="Delete an existing collection without prompting (rebuild mode).")
+parser.add_argument("--manifest", default=DEFAULT_MANIFEST_PATH, help="Path to the content-hash manifest.")
+parser.add_argument("--batch-size", type=int, default=200, help="Objects per batch request (initial size when --dynamic).")
+parser.add_argument("--concurrency", type=int, default=2, help="Number of batch requests in flight at once.")
+parser.add_argument("--requests-per-minute", type=int, default=None, help="Rate limit for batch requests.")
+parser.add_argument("--dynamic", action="store_true", help="Adapt the batch size to observed request latency.")
+parser.add_argument("--max-retries", type=int, default=3, help="Re-submissions of a failed object before giving up.")
+parser.add_argument("--report-every", type=float, default=10.0, help="Seconds between throughput reports.")
+parser.add_argument(
+    "--embedder",
+    choices=["server", *EMBEDDERS],
+    default="server",
+    help="'server' lets Weaviate vectorize (text2vec_weaviate); others compute vectors client-side and cache them.",
+)
+parser.add_argument("--embedding-model", default=None, help="Model name (or dimensionality for 'local') of the embedder.")
+parser.add_argument("--embedding-cache", default=DEFAULT_CACHE_PATH, help="Path to the on-disk embedding cache.")
+parser.add_argument("--chunk-tokens", type=int, default=MAX_CHUNK_TOKENS, help="Token budget of each conversation chunk.")
+parser.add_argument("--token-counter", choices=list(TOKEN_COUNTERS), default="approximate", help="How chunk tokens are counted.")
+parser.add_argument("--dedup", default=None, help="Canonical-topic mapping from 05_dedup_posts.py.")
+parser.add_argument(
+    "--duplicates",
+    choices=["skip", "link"],
+    default="link",
+    help="With --dedup: 'skip' leaves duplicate threads out; 'link' imports them without chunks, "
+         "with canonical_topic_id set, so enrichment copies the canonical thread's results.",
 )
 
-with open("data/simplified_posts.json", "r") as f:
-    data = json.load(f)
 
-if COLLECTION_NAME == "ForumPostSmall":
-    data = data[:20]
+def create_collection(client, client_side_vectors=False):
+    from weaviate.classes.config import Configure, Property, DataType
 
-if client.collections.exists(COLLECTION_NAME):
-    confirmation = input(
-        f"Collection '{COLLECTION_NAME}' already exists. Do you want to delete it? (y/n): "
+    client.collections.create(
+        COLLECTION_NAME,
+        description="This collection contains conversations from the Weaviate Forum.",
+        properties=[
+            Property(
+                name="user_id",
+                description="Unique identifier for the user creating the thread.",
+                data_type=DataType.INT
+            ),
+            Property(
+                name="conversation",
+                description="Beginning and end of the forum conversation thread, cut at chunk boundaries to a token budget for context limit.",
+                data_type=DataType.TEXT,
+            ),
+            Property(
+                name="conversation_full",
+                description="Full text of the entire forum conversation thread.",
+                data_type=DataType.TEXT,
+            ),
+            Property(
+                name="date_created",
+                description="Date and time when the thread was first created.",
+                data_type=DataType.DATE
+            ),
+            Property(
+                name="has_accepted_answer",
+                description="Whether the thread has an accepted answer.",
+                data_type=DataType.BOOL
+            ),
+            Property(
+                name="title",
+                description="Title text of the forum thread.",
+                data_type=DataType.TEXT
+            ),
+            Property(
+                name="topic_id",
+                description="Unique identifier for the topic of the thread.",
+                data_type=DataType.INT
+            ),
+            Property(
+                name="canonical_topic_id",
+                description="topic_id of the thread this one is a near-duplicate of, if any.",
+                data_type=DataType.INT
+            ),
+        ],
+        vectorizer_config=[
+            Configure.NamedVectors.text2vec_weaviate(
+                name=name,
+                source_properties=source_properties
+            )
+            if not client_side_vectors
+            # Vectors are computed client-side and supplied at insert time
+            else Configure.NamedVectors.none(name=name)
+            for name, source_properties in NAMED_VECTORS.items()
+        ],
+        replication_config=Configure.replication(factor=3),
+        inverted_index_config=Configure.inverted_index(
+            index_null_state=True,
+            index_timestamps=True,
+        )
     )
-    if confirmation.lower() == "y":
-        client.collections.delete(COLLECTION_NAME)
-    else:
-        print("Exiting without deleting the collection.")
-        client.close()
-        exit()
-
-client.collections.create(
-    COLLECTION_NAME,
-    description="This collection contains conversations from the Weaviate Forum.",
-    properties=[
-        Property(
-            name="user_id",
-            description="Unique identifier for the user creating the thread.",
-            data_type=DataType.INT
-        ),
-        Property(
-            name="conversation",
-            description="Text of the entire forum conversation thread, truncated to 20,000 characters maximum for context limit.",
-            data_type=DataType.TEXT,
-        ),
-        Property(
-            name="conversation_full",
-            description="Full text of the entire forum conversation thread.",
-            data_type=DataType.TEXT,
-        ),
-        Property(
-            name="date_created",
-            description="Date and time when the thread was first created.",
-            data_type=DataType.DATE
-        ),
-        Property(
-            name="has_accepted_answer",
-            description="Whether the thread has an accepted answer.",
-            data_type=DataType.BOOL
-        ),
-        Property(
-            name="title",
-            description="Title text of the forum thread.",
-            data_type=DataType.TEXT
-        ),
-        Property(
-            name="topic_id",
-            description="Unique identifier for the topic of the thread.",
-            data_type=DataType.INT
-        ),
-    ],
-    vectorizer_config=[
-        Configure.NamedVectors.text2vec_weaviate(
-            name="default",
-            source_properties=["conversation_full", "title"]
-        ),
-        Configure.NamedVectors.text2vec_weaviate(
-            name="title",
-            source_properties=["title"]
-        ),
-    ],
-    replication_config=Configure.replication(factor=3),
-    inverted_index_config=Configure.inverted_index(
-        index_null_state=True,
-        index_timestamps=True,
+
+
+
+def create_chunk_collection(client, client_side_vectors=False):
+    from weaviate.classes.config import Configure, Property, DataType, ReferenceProperty
+
+    client.collections.create(
+        CHUNK_COLLECTION_NAME,
+        description="Token-budgeted chunks of Weaviate Forum conversations, each referencing its thread.",
+        properties=[
+            Property(
+                name="topic_id",
+                description="Unique identifier for the topic of the parent thread.",
+                data_type=DataType.INT
+            ),
+            Property(
+                name="chunk_index",
+                description="Position of the chunk within the thread.",
+                data_type=DataType.INT
+            ),
+            Property(
+                name="text",
+                description="Text of the chunk: one or more consecutive posts, or part of a long post.",
+                data_type=DataType.TEXT
+            ),
+            Property(
+                name="tokens",
+                description="Number of tokens in the chunk.",
+                data_type=DataType.INT
+            ),
+            Property(
+                name="first_post",
+                description="Index of the first post of the thread the chunk covers.",
+                data_type=DataType.INT
+            ),
+            Property(
+                name="last_post",
+                description="Index of the last post of the thread the chunk covers.",
+                data_type=DataType.INT
+            ),
+        ],
+        references=[
+            ReferenceProperty(name="post", target_collection=COLLECTION_NAME),
+        ],
+        vectorizer_config=[
+            Configure.NamedVectors.text2vec_weaviate(
+                name=name,
+                source_properties=source_properties
+            )
+            if not client_side_vectors
+            else Configure.NamedVectors.none(name=name)
+            for name, source_properties in CHUNK_NAMED_VECTORS.items()
+        ],
+        replication_config=Configure.replication(factor=3),
+        inverted_index_config=Configure.inverted_index(
+            index_timestamps=True,
+        )
     )
-)
 
-posts = client.collections.get(COLLECTION_NAME)
-
-with posts.batch.fixed_size(200) as batch:
-    # Add objects to the batch
-    for i, row in tqdm(enumerate(data)):
-        row["date_created"] = datetime.fromisoformat(row["date_created"]).replace(tzinfo=timezone.utc)
-        if len(row["conversation"]) > 20000:
-            row["conversation"] = row["conversation"][:10000] + '...' + row["conversation"][-10000:]
-        row["conversation_full"] = row["conversation"]
-        batch.add_object(
-            properties=row,
-            uuid=generate_uuid5(row["topic_id"])
+
+def chunk_objects(row, parent_uuid, max_tokens, count_tokens):
+    """Chunk objects of a thread, as (properties, uuid) pairs."""
+    from weaviate.util import generate_uuid5
+
+    return [
+        (
+            {
+                "topic_id": row["topic_id"],
+                "chunk_index": chunk.index,
+                "text": chunk.text,
+                "tokens": chunk.tokens,
+                "first_post": chunk.first_post,
+                "last_post": chunk.last_post,
+            },
+            generate_uuid5(f"{parent_uuid}:{chunk.index}"),
+        )
+        for chunk in chunk_conversation(row["conversation_full"], max_tokens, count_tokens)
+    ]
+
+
+def chunked(iterable, size):
+    chunk = []
+    for item in iterable:
+        chunk.append(item)
+        if len(chunk) == size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+@instrumented("populate")
+def main(argv=None):
+    args = parser.parse_args(argv)
+    # Imported here, so --help does not pay for the client and progress bar imports
+    from weaviate.classes.query import Filter
+    from weaviate.util import generate_uuid5
+    from tqdm import tqdm
+
+    with shared_client() as client:
+        vectorizer = chunk_vectorizer = None
+        if args.embedder != "server":
+            embedder = get_embedder(args.embedder, args.embedding_model)
+            embedding_cache = EmbeddingCache(args.embedding_cache)
+            vectorizer = CachedVectorizer(embedder, NAMED_VECTORS, embedding_cache)
+            chunk_vectorizer = CachedVectorizer(embedder, CHUNK_NAMED_VECTORS, embedding_cache)
+        count_tokens = get_token_counter(args.token_counter)
+
+        data = iter_posts(
+            "data/simplified_posts.json",
+            limit=20 if COLLECTION_NAME == "ForumPostSmall" else None,
         )
 
-if posts.batch.failed_objects:
-    for obj in posts.batch.failed_objects[:5]:
-        print(f"Failed to add object {obj['row_id']}: {obj.message}")
+        manifest = IngestManifest(args.manifest, collection_name=COLLECTION_NAME)
+        canonical = {}
+        if args.dedup:
+            from dedup import load_mapping
+            canonical = load_mapping(args.dedup)
+        duplicates = 0
+
+        client_side_vectors = vectorizer is not None
+        if args.mode == "incremental":
+            if not client.collections.exists(COLLECTION_NAME) or not client.collections.exists(CHUNK_COLLECTION_NAME):
+                # Nothing (or no chunks) on the server, so nothing in the manifest can be trusted
+                manifest.reset()
+                if not client.collections.exists(COLLECTION_NAME):
+                    create_collection(client, client_side_vectors=client_side_vectors)
+                if not client.collections.exists(CHUNK_COLLECTION_NAME):
+                    create_chunk_collection(client, client_side_vectors=client_side_vectors)
+        elif client.collections.exists(COLLECTION_NAME):
+            confirmation = "y" if args.yes else input(
+                f"Collection '{COLLECTION_NAME}' already exists. Do you want to delete it? (y/n): "
+            )
+            if confirmation.lower() == "y":
+                # Chunks reference the posts, so they go first
+                client.collections.delete(CHUNK_COLLECTION_NAME)
+                client.collections.delete(COLLECTION_NAME)
+            else:
+                print("Exiting without deleting the collection.")
+                return
+            manifest.reset()
+            create_collection(client, client_side_vectors=client_side_vectors)
+            create_chunk_collection(client, client_side_vectors=client_side_vectors)
+        else:
+            manifest.reset()
+            client.collections.delete(CHUNK_COLLECTION_NAME)
+            create_collection(client, client_side_vectors=client_side_vectors)
+            create_chunk_collection(client, client_side_vectors=client_side_vectors)
+
+        posts = client.collections.get(COLLECTION_NAME)
+        chunks = client.collections.get(CHUNK_COLLECTION_NAME)
+        chunk_parents = {}  # chunk uuid -> parent uuid
+
+        counts = {INSERT: 0, UPDATE: 0, SKIP: 0}
+        pending = {}
+
+        import_config = ImportConfig(
+            batch_size=args.batch_size,
+            concurrent_requests=args.concurrency,
+            requests_per_minute=args.requests_per_minute,
+            dynamic=args.dynamic,
+            max_retries=args.max_retries,
+            report_every=args.report_every,
+        )
+
+        # Switching embedders or chunking changes what is stored, so it counts as a change too
+        settings = {"_chunking": f"{args.chunk_tokens}:{args.token_counter}"}
+        if vectorizer is not None:
+            settings["_embedder"] = vectorizer.embedder.model
+
+        with BatchImporter(posts, import_config, report=tqdm.write) as batch, \
+                BatchImporter(chunks, import_config, report=tqdm.write) as chunk_batch, tqdm() as progress:
+            for rows in chunked(data, 64):
+                progress.update(len(rows))
+                to_import = []
+                updated_topics = []
+                with span("populate.classify", rows=len(rows)):
+                    for row in rows:
+                        canonical_topic_id = canonical.get(row["topic_id"])
+                        if canonical_topic_id is not None:
+                            duplicates += 1
+                            if args.duplicates == "skip":
+                                continue
+                            row["canonical_topic_id"] = canonical_topic_id
+                        obj_uuid = generate_uuid5(row["topic_id"])
+                        digest = hash_properties({**row, **settings})
+                        action = manifest.classify(obj_uuid, digest)
+                        counts[action] += 1
+                        if action != SKIP:
+                            to_import.append((row, obj_uuid, digest))
+                        if action == UPDATE:
+                            updated_topics.append(row["topic_id"])
+
+                if updated_topics:
+                    # A changed thread may now have fewer chunks; drop the old ones before re-adding
+                    with span("populate.delete_chunks", topics=len(updated_topics)):
+                        chunks.data.delete_many(where=Filter.by_property("topic_id").contains_any(updated_topics))
+
+                vectors = [None] * len(to_import)
+                if vectorizer is not None and to_import:
+                    with span("populate.vectorize", objects=len(to_import)):
+                        vectors = vectorizer.vectorize([row for row, _, _ in to_import])
+
+                # Add objects to the batch; blocks while all batch requests are in flight
+                with span("populate.submit", objects=len(to_import)):
+                    for (row, obj_uuid, digest), vector in zip(to_import, vectors):
+                        # Objects with an existing UUID are replaced, so updates go through the same batch.
+                        # This also drops stale Transformation Agent properties of changed threads.
+                        batch.add_object(
+                            properties=row,
+                            uuid=obj_uuid,
+                            vector=vector
+                        )
+                        pending[obj_uuid] = digest
+
+                # Chunks of the same threads, each referencing its parent
+                with span("populate.chunk", threads=len(to_import)):
+                    thread_chunks = [
+                        (props, chunk_uuid, obj_uuid)
+                        for row, obj_uuid, _ in to_import
+                        # Search finds a linked duplicate's content through its canonical thread's chunks
+                        if row.get("canonical_topic_id") is None
+                        for props, chunk_uuid in chunk_objects(row, obj_uuid, args.chunk_tokens, count_tokens)
+                    ]
+                chunk_vectors = [None] * len(thread_chunks)
+                if chunk_vectorizer is not None and thread_chunks:
+                    with span("populate.vectorize_chunks", chunks=len(thread_chunks)):
+                        chunk_vectors = chunk_vectorizer.vectorize([props for props, _, _ in thread_chunks])
+                with span("populate.submit_chunks", chunks=len(thread_chunks)):
+                    for (props, chunk_uuid, obj_uuid), chunk_vector in zip(thread_chunks, chunk_vectors):
+                        chunk_batch.add_object(
+                            properties=props,
+                            uuid=chunk_uuid,
+                            vector=chunk_vector,
+                            references={"post": obj_uuid},
+                        )
+                        chunk_parents[chunk_uuid] = obj_uuid
+
+        failed_uuids = {str(obj_uuid) for obj_uuid, _ in batch.failed_objects}
+        for obj_uuid, message in batch.failed_objects[:5]:
+            print(f"Failed to add object {obj_uuid}: {message}")
+        # A thread whose chunks did not all make it is retried as a whole next time
+        failed_uuids |= {str(chunk_parents[chunk_uuid]) for chunk_uuid, _ in chunk_batch.failed_objects}
+        for chunk_uuid, message in chunk_batch.failed_objects[:5]:
+            print(f"Failed to add chunk {chunk_uuid}: {message}")
+
+        for obj_uuid, digest in pending.items():
+            if obj_uuid in failed_uuids:
+                # Leave failed objects out of the manifest so the next run retries them
+                manifest.forget(obj_uuid)
+            else:
+                manifest.record(obj_uuid, digest)
+        manifest.save()
+
+        if pending or args.mode == "rebuild":
+            # Cached query results for the collection are stale now
+            invalidate(COLLECTION_NAME)
+
+        print(
+            f"Inserted: {counts[INSERT]}, Updated: {counts[UPDATE]}, "
+            f"Skipped: {counts[SKIP]}, Failed: {len(failed_uuids)}"
+        )
+        if canonical:
+            print(f"Duplicates {'skipped' if args.duplicates == 'skip' else 'linked'}: {duplicates}")
+
+        if vectorizer is not None:
+            print(f"Embedding cache hits: {vectorizer.cache.hits}, misses: {vectorizer.cache.misses}")
+            vectorizer.cache.close()
+
+        print(len(posts))
+        print(f"Chunks: {len(chunks)}")
 
-print(len(posts))
 
-client.close()
+if __name__ == "__main__":
+    main()
@@ -1,38 +1,104 @@
-import weaviate
-from weaviate.classes.init import Auth
-from weaviate.classes.generate import GenerativeConfig
-import os
-from dotenv import load_dotenv
-from helpers import COLLECTION_NAME
-
-weaviate_url = os.getenv("WEAVIATE_URL")
-weaviate_key = os.getenv("WEAVIATE_API_KEY")
-anthropic_key = os.getenv("ANTHROPIC_API_KEY")
-load_dotenv()
-
-client = weaviate.connect_to_weaviate_cloud(
-    cluster_url=weaviate_url,
-    auth_credentials=Auth.api_key(weaviate_key),
-    headers={
-        "X-Anthropic-Api-Key": anthropic_key,
-    }
-)
+from connection import shared_client
+from helpers import COLLECTION_NAME, NAMED_VECTORS
+from generation import Generator, GenerationCache, PROVIDERS, DEFAULT_CACHE_PATH, get_provider, select_objects
+from topic_clustering import discover_topics, TopicClusters, DEFAULT_CLUSTERS_PATH
+from vector_store import DEFAULT_STORE_DIR
+from instrumentation import instrumented
+from concurrent.futures import ThreadPoolExecutor
+import argparse
 
-collection = client.collections.get(COLLECTION_NAME)
-
-response = collection.generate.fetch_objects(
-    limit=30,
-    grouped_task="""
-    Using this sample of Weaviate Forum post conversations and common sense,
-    catagorize these forum posts for support topics into 5-10 categories.
-    We will use them on a larger dataset, so please make sure the categories are general enough.
-    Write each category also into a snake case format, like 'data_import'.
-    """,
-    generative_provider=GenerativeConfig.anthropic(
-        model="claude-3-7-sonnet-latest"
-    )
+parser = argparse.ArgumentParser(description="Suggest support topic categories from forum posts.")
+parser.add_argument("--provider", choices=list(PROVIDERS), default="anthropic", help="'fake' generates offline.")
+parser.add_argument("--refresh", action="store_true", help="Regenerate even if the same prompt and objects are cached.")
+parser.add_argument("--cache", default=DEFAULT_CACHE_PATH, help="Path to the generation cache.")
+parser.add_argument(
+    "--mode",
+    choices=["sample", "clusters"],
+    default="sample",
+    help="'sample' categorizes the first 30 objects; 'clusters' clusters the whole collection by vector "
+         "and names each cluster from its most central threads.",
+)
+parser.add_argument("--clusters", type=int, default=12, help="Number of k-means clusters (clusters mode).")
+parser.add_argument("--per-cluster", type=int, default=5, help="Central threads sent to the model per cluster (clusters mode).")
+parser.add_argument("--vector", choices=list(NAMED_VECTORS), default="default", help="Named vector to cluster on (clusters mode).")
+parser.add_argument("--seed", type=int, default=0, help="Seed of the k-means initialization (clusters mode).")
+parser.add_argument("--store", default=DEFAULT_STORE_DIR, help="Local vector store the vectors are exported to and clustered from (clusters mode).")
+parser.add_argument(
+    "--reuse-vectors",
+    action="store_true",
+    help="Cluster the vectors already in --store, e.g. from 62_export_vectors.py, instead of exporting them again.",
 )
+parser.add_argument("--output", default=DEFAULT_CLUSTERS_PATH, help="Where to save the cluster assignments (clusters mode).")
+parser.add_argument("--reuse", action="store_true", help="Name the clusters saved at --output instead of re-clustering.")
+
+CLUSTER_TASK = """
+These Weaviate Forum post conversations are the most representative threads of one cluster
+of {size} similar threads ({share:.1%} of the forum).
+Name the support topic they have in common in snake case, like 'data_import',
+and describe it in one sentence. Answer as 'name: description'.
+"""
+
+
+def name_clusters(collection, generator, clusters, refresh=False, max_concurrency=4):
+    """One cached grouped-task generation per cluster, over its central threads. Returns cluster -> text."""
+    from weaviate.classes.query import Filter
+
+    total = len(clusters.uuids)
+    sizes = clusters.sizes
+
+    def name(cluster):
+        central = clusters.representatives[cluster]
+        objects = select_objects(collection, filters=Filter.by_id().contains_any(central), limit=len(central))
+        task = CLUSTER_TASK.format(size=int(sizes[cluster]), share=sizes[cluster] / total)
+        return cluster, generator.grouped(objects, task=task, properties=["title", "conversation"], refresh=refresh)
+
+    with ThreadPoolExecutor(max_workers=max_concurrency) as executor:
+        return dict(executor.map(name, clusters.by_size()))
+
+
+@instrumented("topics")
+def main(argv=None):
+    args = parser.parse_args(argv)
+
+    with shared_client() as client:
+        collection = client.collections.get(COLLECTION_NAME)
+        generator = Generator(get_provider(args.provider, collection), GenerationCache(args.cache))
+
+        if args.mode == "clusters":
+            if args.reuse:
+                clusters = TopicClusters.load(args.output, per_cluster=args.per_cluster)
+            else:
+                clusters = discover_topics(
+                    collection,
+                    k=args.clusters,
+                    vector_name=args.vector,
+                    per_cluster=args.per_cluster,
+                    seed=args.seed,
+                    store_path=args.store,
+                    export=not args.reuse_vectors,
+                )
+                clusters.save(args.output)
+                print(f"Clustered {len(clusters.uuids)} objects by '{args.vector}' vector; saved to {args.output}")
+
+            names = name_clusters(collection, generator, clusters, refresh=args.refresh)
+            sizes, cohesion = clusters.sizes, clusters.cohesion()
+            for cluster, text in names.items():
+                print(f"[{cluster:>3}] {sizes[cluster]:>6} threads, cohesion {cohesion[cluster]:.2f}  {(text or '').strip()}")
+        else:
+            text = generator.grouped(
+                select_objects(collection, limit=30),
+                task="""
+                Using this sample of Weaviate Forum post conversations and common sense,
+                catagorize these forum posts for support topics into 5-10 categories.
+                We will use them on a larger dataset, so please make sure the categories are general enough.
+                Write each category also into a snake case format, like 'data_import'.
+                """,
+                refresh=args.refresh,
+            )
+
+            print(text)
+        generator.cache.close()
 
-print(response.generative.text)
 
-client.close()
+if __name__ == "__main__":
+    main()
@@ -1,23 +1,47 @@
-import weaviate
-from weaviate.classes.init import Auth
-from weaviate.classes.config import DataType
-from weaviate.agents.classes import Operations
-from weaviate.agents.transformation import TransformationAgent
-import os
-from dotenv import load_dotenv
 from helpers import COLLECTION_NAME, TECHNICAL_DOMAIN_CATEGORIES, ROOT_CAUSE_CATEGORIES, ACCESS_CONTEXT_CATEGORIES
-
-weaviate_url = os.getenv("WEAVIATE_URL")
-weaviate_key = os.getenv("WEAVIATE_API_KEY")
-load_dotenv()
-
-client = weaviate.connect_to_weaviate_cloud(
-    cluster_url=weaviate_url, auth_credentials=Auth.api_key(weaviate_key)
+from helpers import category_choices, category_definitions
+from connection import shared_client
+from instrumentation import instrumented, span
+from enrichment import EnrichmentCache, DEFAULT_CACHE_PATH, FAILED_STATES, harvest, link_duplicates, plan_delta, run_delta, seed_cache
+from enrichment import transformation_agent
+from query_cache import invalidate
+from workflow_monitor import BackgroundMonitor, WorkflowMonitor, UNREACHABLE, format_progress, property_progress
+from sharded_enrichment import run_sharded, topic_buckets, date_ranges
+from datetime import datetime, timezone
+import argparse
+import asyncio
+
+parser = argparse.ArgumentParser(description="Enrich forum posts with the Transformation Agent.")
+parser.add_argument(
+    "--incremental",
+    action="store_true",
+    help="Only run operations on objects whose inputs changed; reuse cached results for the rest. "
+         "Near-duplicate threads are then not sent to the agent at all (a full run enriches them and then "
+         "overwrites their labels with their canonical thread's).",
+)
+parser.add_argument(
+    "--trust-existing",
+    action="store_true",
+    help="With --incremental: treat values already on objects as up to date when they are not cached yet.",
 )
+parser.add_argument("--cache", default=DEFAULT_CACHE_PATH, help="Path to the enrichment result cache.")
+parser.add_argument(
+    "--resume",
+    action="store_true",
+    help="Only monitor workflows left unfinished by an earlier run, and harvest their staging collections.",
+)
+parser.add_argument("--shards", type=int, default=None, help="Split the work into this many topic_id buckets, run as parallel jobs.")
+parser.add_argument(
+    "--date-boundaries",
+    default=None,
+    help="Split the work into date_created ranges instead, e.g. '2024-01-01,2024-07-01'.",
+)
+parser.add_argument("--max-concurrency", type=int, default=4, help="Maximum number of sharded jobs running at once.")
+parser.add_argument("--max-retries", type=int, default=2, help="Retries per failed shard.")
 
-add_technical_complexity = Operations.append_property(
+add_technical_complexity = dict(
     property_name="technicalComplexity",
-    data_type=DataType.INT,
+    data_type="INT",
     view_properties=["conversation"],
     instruction="""
     Rate the technical complexity of the user's forum post query
@@ -25,70 +49,70 @@ add_technical_complexity = Operations.append_property(
     """,
 )
 
-add_technical_domain = Operations.append_property(
+add_technical_domain = dict(
     property_name="technicalDomain",
-    data_type=DataType.TEXT,
+    data_type="TEXT",
     view_properties=["conversation", "title"],
     instruction=f"""
     Identify the primary technical domain of the user's forum post query.
     The answer must be one of the following:
-    {TECHNICAL_DOMAIN_CATEGORIES.keys()}
+    {category_choices(TECHNICAL_DOMAIN_CATEGORIES)}
 
     The definitions of the categories are as follows:
-    {TECHNICAL_DOMAIN_CATEGORIES}
+    {category_definitions(TECHNICAL_DOMAIN_CATEGORIES)}
 
     Remember that the answer must be one of these categories:
-    {TECHNICAL_DOMAIN_CATEGORIES.keys()}
+    {category_choices(TECHNICAL_DOMAIN_CATEGORIES)}
     """,
 )
 
-add_root_cause_category = Operations.append_property(
+add_root_cause_category = dict(
     property_name="rootCauseCategory",
-    data_type=DataType.TEXT,
+    data_type="TEXT",
     view_properties=["conversation", "title"],
     instruction=f"""
     Based on the text, what was the fundamental issue behind the user's question? The answer must be one of the following categories:
-    {ROOT_CAUSE_CATEGORIES.keys()}
+    {category_choices(ROOT_CAUSE_CATEGORIES)}
 
     The definitions of the categories are as follows:
-    {ROOT_CAUSE_CATEGORIES}
+    {category_definitions(ROOT_CAUSE_CATEGORIES)}
     For example, if the user was confused about how to use a specific feature of Weaviate, the answer should be "conceptual_misunderstanding".
 
     Remember that the answer must be one of these categories:
-    {ROOT_CAUSE_CATEGORIES.keys()}
+    {category_choices(ROOT_CAUSE_CATEGORIES)}
     """,
 )
 
-add_access_context = Operations.append_property(
+add_access_context = dict(
     property_name="accessContext",
-    data_type=DataType.TEXT,
+    data_type="TEXT",
     view_properties=["conversation", "title"],
     instruction=f"""
     Based on the text, how was the user trying to access Weaviate? The answer must be one of the following categories:
 
-    {ACCESS_CONTEXT_CATEGORIES.keys()}
+    {category_choices(ACCESS_CONTEXT_CATEGORIES)}
 
     The definitions of the categories are as follows:
-    {ACCESS_CONTEXT_CATEGORIES}
+    {category_definitions(ACCESS_CONTEXT_CATEGORIES)}
     For example, if the user was using the Weaviate Python client library, the answer should be "python_client".
 
     Remember that the answer must be one of these categories:
-    {ACCESS_CONTEXT_CATEGORIES.keys()}
+    {category_choices(ACCESS_CONTEXT_CATEGORIES)}
     """,
 )
 
-was_it_caused_by_outdated_stack = Operations.append_property(
+was_it_caused_by_outdated_stack = dict(
     property_name="causedByOutdatedStack",
-    data_type=DataType.BOOL,
+    data_type="BOOL",
     view_properties=["conversation", "title"],
     instruction="""
     Based on the text, was the user's question caused by an outdated version of Weaviate or its components, such as the client library being used?
     """,
 )
 
-was_it_a_documentation_gap = Operations.append_property(
+was_it_a_documentation_gap = dict(
     property_name="isDocumentationGap",
-    data_type=DataType.BOOL,
+    data_type="BOOL",
     view_properties=["conversation", "title"],
     instruction="""
     Based on the text, identify whether the user's question was caused by a lack of documentation or unclear instructions regarding Weaviate.
@@ -103,73 +127,196 @@ was_it_a_documentation_gap = Operations.append_property(
     """,
 )
 
-create_summary = Operations.append_property(
+create_summary = dict(
     property_name="summary",
-    data_type=DataType.TEXT,
+    data_type="TEXT",
     view_properties=["conversation", "title"],
     instruction="""
     Briefly summarize the user's question and the resolution provided (if any) in a few sentences.
     """,
 )
 
-ta = TransformationAgent(
-    client=client,
-    collection=COLLECTION_NAME,
-    operations=[
-        add_technical_complexity,
-        add_technical_domain,
-        add_root_cause_category,
-        add_access_context,
-        was_it_caused_by_outdated_stack,
-        was_it_a_documentation_gap,
-        create_summary
-    ],
-)
-
-ta_response = ta.update_all()
-
-
-def get_ta_status(agent_instance, workflow_id):
-    # Rough code to check the status of the TA workflow
-    import time
-    from datetime import datetime, timezone
-
-    while True:
-        status = agent_instance.get_status(workflow_id=workflow_id)
-
-        if status["status"]["state"] != "running":
-            break
-
-        # Parse start_time and make it timezone-aware (assuming it's in UTC)
-        start = datetime.strptime(status["status"]["start_time"], "%Y-%m-%d %H:%M:%S")
-        start = start.replace(tzinfo=timezone.utc)
-
-        # Get current time in UTC
-        now = datetime.now(timezone.utc)
-
-        # Calculate elapsed time
-        elapsed = (now - start).total_seconds()
-
-        print(f"Waiting... Elapsed time: {elapsed:.2f} seconds")
-        time.sleep(10)
-
-    # Calculate total time
-    if status["status"]["total_duration"]:
-        total = status["status"]["total_duration"]
-    else:
-        start = datetime.strptime(status["status"]["start_time"], "%Y-%m-%d %H:%M:%S")
-        end = (
-            datetime.now()
-            if not status["status"]["end_time"]
-            else datetime.strptime(status["status"]["end_time"], "%Y-%m-%d %H:%M:%S")
+# Plain specs, so importing this script (e.g. for --help) does not import the agents client; see build_operations
+OPERATION_SPECS = [
+    add_technical_complexity,
+    add_technical_domain,
+    add_root_cause_category,
+    add_access_context,
+    was_it_caused_by_outdated_stack,
+    was_it_a_documentation_gap,
+    create_summary
+]
+
+
+def build_operations():
+    """The TransformationAgent `append_property` operations of `OPERATION_SPECS`."""
+    from weaviate.classes.config import DataType
+    from weaviate.agents.classes import Operations
+
+    return [Operations.append_property(**{**spec, "data_type": DataType[spec["data_type"]]}) for spec in OPERATION_SPECS]
+
+
+def agent_progress_fn(client, agent_instance):
+    # Count objects that already have the agent's last property, for when its status has no counters
+    collection_name = getattr(agent_instance, "collection", COLLECTION_NAME)
+    return property_progress(client.collections.get(collection_name), agent_instance.operations[-1].property_name)
+
+
+def staging_metadata(agent_instance):
+    # Workflows on a staging collection stay in the monitor state until their results are harvested
+    if agent_instance.collection == COLLECTION_NAME:
+        return None
+    return {"staging": agent_instance.collection, "operations": [op.property_name for op in agent_instance.operations]}
+
+
+def get_ta_status(background, agent_instance, workflow_id, label=None, progress_fn=None, metadata=None):
+    """
+    Monitor a TA workflow until it finishes, printing progress, and return its final status.
+
+    Args:
+        background (BackgroundMonitor): Shared by every workflow of the run, so concurrent
+            partitions are polled by one monitor and one writer of its state file
+    """
+    with span("enrich.wait", workflow_id=workflow_id, label=label or "") as wait_span:
+        final = background.wait(
+            workflow_id,
+            agent=agent_instance,
+            label=label,
+            metadata=metadata,
+            keep=metadata is not None,
+            progress_fn=progress_fn,
         )
-        total = (end - start).total_seconds()
-
-    print(f"Total time: {total:.2f} seconds")
-    print(status)
-
-
-get_ta_status(agent_instance=ta, workflow_id=ta_response.workflow_id)
-
-
-client.close()
+        wait_span.set(state=final.state)
+    if final.elapsed is not None:
+        print(f"[{label or workflow_id}] Total time: {final.elapsed:.2f} seconds")
+    print(final.status)
+    return final.status
+
+
+def resume_workflows(client, cache, operations):
+    """Monitor the workflows an earlier run left unfinished, then harvest the staging collections of those that succeeded."""
+    monitor = WorkflowMonitor()
+    persisted = monitor.persisted()
+    names = [op.property_name for op in operations]
+    agents = {}
+    for workflow_id, meta in persisted.items():
+        staging = meta.get("staging")
+        if staging and not client.collections.exists(staging):
+            # Harvested, failed or replaced by a retry after the entry was written
+            monitor.forget(workflow_id)
+            continue
+        agent_operations = [op for op in operations if op.property_name in meta.get("operations", names)]
+        agent_instance = agents[workflow_id] = transformation_agent(client, staging or COLLECTION_NAME, agent_operations)
+        monitor.track(
+            workflow_id,
+            agent=agent_instance,
+            label=meta.get("label"),
+            metadata={k: v for k, v in meta.items() if k not in ("label", "keep")},
+            keep=meta.get("keep", False),
+            progress_fn=agent_progress_fn(client, agent_instance),
+        )
+    if not agents:
+        print("No unfinished workflows to resume.")
+        return
+
+    final = asyncio.run(monitor.run(callback=lambda p: print(format_progress(p))))
+    source = client.collections.get(COLLECTION_NAME)
+    for workflow_id, progress in final.items():
+        staging = persisted[workflow_id].get("staging")
+        if staging is None:
+            continue
+        if progress.state == UNREACHABLE:
+            print(f"[{progress.label or workflow_id}] {progress.error}; left for the next --resume")
+            continue
+        if progress.state in FAILED_STATES:
+            print(f"[{progress.label or workflow_id}] {progress.state}; nothing to harvest from {staging}")
+        else:
+            n = harvest(client.collections.get(staging), source, agents[workflow_id].operations, None, cache)
+            print(f"[{progress.label or workflow_id}] harvested {n} objects from {staging}")
+        client.collections.delete(staging)
+        monitor.forget(workflow_id)
+
+
+@instrumented("enrich")
+def main(argv=None):
+    args = parser.parse_args(argv)
+    operations = build_operations()
+
+    with shared_client() as client, BackgroundMonitor(
+        WorkflowMonitor(), callback=lambda p: print(format_progress(p))
+    ) as background:
+        def wait(agent_instance, workflow_id, label=None):
+            progress_fn = agent_progress_fn(client, agent_instance)
+            metadata = staging_metadata(agent_instance)
+            return get_ta_status(
+                background, agent_instance, workflow_id, label=label, progress_fn=progress_fn, metadata=metadata
+            )
+
+        cache = EnrichmentCache(args.cache)
+
+        if args.resume:
+            # Pick up workflows submitted by an earlier run that stopped before they finished
+            resume_workflows(client, cache, operations)
+            cache.close()
+            invalidate(COLLECTION_NAME)
+            return
+
+        if args.shards or args.date_boundaries:
+            if args.date_boundaries:
+                assign = date_ranges([
+                    datetime.fromisoformat(d).replace(tzinfo=timezone.utc) for d in args.date_boundaries.split(",")
+                ])
+            else:
+                assign = topic_buckets(args.shards)
+
+            summary = run_sharded(
+                client,
+                COLLECTION_NAME,
+                operations,
+                cache,
+                assign,
+                max_concurrency=args.max_concurrency,
+                max_retries=args.max_retries,
+                incremental=args.incremental,
+                wait=lambda agent_instance, workflow_id: wait(agent_instance, workflow_id, label=agent_instance.collection),
+                on_release=WorkflowMonitor().forget,
+            )
+            for part in summary["partitions"]:
+                print(f"{part.name}: {part.state}, {part.objects} objects, {part.attempts} attempt(s), {part.error or ''}")
+            print(f"Done: {summary['done']}, Failed: {summary['failed']}, Enriched: {summary['enriched']}, From cache: {summary['from_cache']}, Linked: {summary['linked']}")
+        elif args.incremental:
+            summary = run_delta(
+                client,
+                COLLECTION_NAME,
+                operations,
+                cache,
+                trust_existing=args.trust_existing,
+                wait=wait,
+                on_release=WorkflowMonitor().forget,
+            )
+            print(summary)
+        else:
+            ta = transformation_agent(client, COLLECTION_NAME, operations)
+
+            ta_response = ta.update_all()
+
+            status = wait(ta, ta_response.workflow_id)
+
+            if status["status"]["state"] in FAILED_STATES:
+                print(f"Workflow {ta_response.workflow_id} ended in state '{status['status']['state']}'; cache not updated")
+            else:
+                source = client.collections.get(COLLECTION_NAME)
+                # update_all() enriches duplicates on their own; give them their canonical thread's labels as the other paths do
+                plan = plan_delta(source, operations, cache, force=True)
+                if plan.linked:
+                    print(f"Linked {link_duplicates(source, operations, plan)} duplicates to their canonical threads")
+                # Remember the results so later --incremental runs only pay for what changes
+                seed_cache(source, operations, cache)
+
+        cache.close()
+        # The agent and cache write-backs changed objects, so cached query results are stale
+        invalidate(COLLECTION_NAME)
+
+
+if __name__ == "__main__":
+    main()
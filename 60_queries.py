@@ -1,34 +1,82 @@
-import weaviate
-from weaviate.classes.init import Auth
-from weaviate.classes.generate import GenerativeConfig
-import os
-from dotenv import load_dotenv
+from connection import shared_client, shared_async_client
 from helpers import COLLECTION_NAME
+from async_queries import QuerySpec, run_queries, concurrency_sweep, format_stats
+from embeddings import EMBEDDERS, get_embedder
+from metrics import format_histogram
+import argparse
+import asyncio
+import json
 
-weaviate_url = os.getenv("WEAVIATE_URL")
-weaviate_key = os.getenv("WEAVIATE_API_KEY")
-anthropic_key = os.getenv("ANTHROPIC_API_KEY")
-load_dotenv()
-
-client = weaviate.connect_to_weaviate_cloud(
-    cluster_url=weaviate_url,
-    auth_credentials=Auth.api_key(weaviate_key),
-    headers={
-        "X-Anthropic-Api-Key": anthropic_key,
-    }
+# Mixed workload for --load-test, cycled to the requested number of queries
+SAMPLE_QUERIES = [
+    QuerySpec("fetch", limit=10),
+    QuerySpec("filtered", where={"has_accepted_answer": True}, limit=10),
+    QuerySpec("near_text", text="batch import is slow or fails", target_vector="default"),
+    QuerySpec("near_text", text="authentication with API keys", target_vector="title"),
+    QuerySpec("hybrid", text="hybrid search alpha parameter", target_vector="default"),
+    QuerySpec("hybrid", text="docker compose deployment", target_vector="title", where={"has_accepted_answer": True}),
+]
+
+parser = argparse.ArgumentParser(description="Query the forum posts collection.")
+parser.add_argument("--load-test", action="store_true", help="Run a batch of queries concurrently and report latency.")
+parser.add_argument("--queries", default=None, help="JSON Lines file of query specs (see async_queries.QuerySpec).")
+parser.add_argument("--count", type=int, default=200, help="Number of queries per batch, cycling through the specs.")
+parser.add_argument("--concurrency", type=int, default=50, help="Maximum queries in flight.")
+parser.add_argument("--sweep", default=None, help="Comma-separated concurrency levels to compare, e.g. '1,50,100,200'.")
+parser.add_argument(
+    "--embedder",
+    choices=list(EMBEDDERS),
+    default=None,
+    help="Embed query text client-side (for collections populated with --embedder).",
 )
+parser.add_argument("--embedding-model", default=None, help="Model name (or dimensionality for 'local') of the embedder.")
 
-collection = client.collections.get(COLLECTION_NAME)
 
-response = collection.query.fetch_objects(
-    limit=50,
-)
+def load_specs(path):
+    with open(path, "r", encoding="utf-8") as f:
+        return [QuerySpec.from_dict(json.loads(line)) for line in f if line.strip()]
+
+
+async def load_test(args):
+    specs = load_specs(args.queries) if args.queries else SAMPLE_QUERIES
+    batch = [specs[i % len(specs)] for i in range(args.count)]
+    embedder = get_embedder(args.embedder, args.embedding_model) if args.embedder else None
+
+    async with shared_async_client() as client:
+        if args.sweep:
+            levels = [int(level) for level in args.sweep.split(",")]
+            for stats in await concurrency_sweep(client, batch, levels, embedder=embedder):
+                print(format_stats(stats) + "\n")
+            return
+        results, stats = await run_queries(client, batch, concurrency=args.concurrency, embedder=embedder)
+
+    print(format_stats(stats))
+    print(format_histogram(stats["histogram"]))
+    for result in [r for r in results if r.error][:5]:
+        print(f"Failed {result.spec.name}: {result.error}")
+
+
+def main(argv=None):
+    args = parser.parse_args(argv)
+
+    if args.load_test:
+        asyncio.run(load_test(args))
+        return
+
+    with shared_client() as client:
+        collection = client.collections.get(COLLECTION_NAME)
+
+        response = collection.query.fetch_objects(
+            limit=50,
+        )
+
+        for o in response.objects:
+            print(f"\nObject ID: {o.uuid}")
+            for k, v in o.properties.items():
+                if "conversation" in k:
+                    v = v[:100] + "..."
+                print(f"{k}: {v}")
 
-for o in response.objects:
-    print(f"\nObject ID: {o.uuid}")
-    for k, v in o.properties.items():
-        if "conversation" in k:
-            v = v[:100] + "..."
-        print(f"{k}: {v}")
 
-client.close()
+if __name__ == "__main__":
+    main()
@@ -1,46 +1,63 @@
-import weaviate
-from weaviate.classes.init import Auth
-import os
-from dotenv import load_dotenv
-from helpers import COLLECTION_NAME
-import pandas as pd
-
-weaviate_url = os.getenv("WEAVIATE_URL")
-weaviate_key = os.getenv("WEAVIATE_API_KEY")
-anthropic_key = os.getenv("ANTHROPIC_API_KEY")
-load_dotenv()
-
-client = weaviate.connect_to_weaviate_cloud(
-    cluster_url=weaviate_url,
-    auth_credentials=Auth.api_key(weaviate_key),
-    headers={
-        "X-Anthropic-Api-Key": anthropic_key,
-    }
+from connection import shared_client
+from instrumentation import instrumented
+from helpers import COLLECTION_NAME, EXPORT_PROPERTIES
+from export_pipeline import export_parquet, export_incremental, DEFAULT_EXPORT_DIR
+import argparse
+
+parser = argparse.ArgumentParser(description="Export the enriched collection for offline analysis.")
+parser.add_argument(
+    "--format",
+    choices=["parquet", "csv"],
+    default="parquet",
+    help="'parquet' streams typed, chunked files in parallel; 'csv' writes a single CSV in memory.",
+)
+parser.add_argument("--output", default=None, help="Output directory (parquet) or file (csv).")
+parser.add_argument("--partitions", type=int, default=4, help="Parallel scans over UUID ranges (parquet).")
+parser.add_argument("--chunk-size", type=int, default=5000, help="Objects per Parquet file (parquet).")
+parser.add_argument("--resume", action="store_true", help="Continue an interrupted export from its checkpoint (parquet).")
+parser.add_argument(
+    "--incremental",
+    action="store_true",
+    help="Only fetch objects created or updated since the last export and merge them into the snapshot (parquet).",
 )
 
-collection = client.collections.get(COLLECTION_NAME)
-
-objs = []
-
-for o in collection.iterator(
-    return_properties=[
-        "title",
-        "date_created",
-        "has_accepted_answer",
-        "topic_id",
-        # Created by the Transformation Agent
-        "technicalComplexity",
-        "technicalDomain",
-        "rootCauseCategory",
-        "accessContext",
-        "causedByOutdatedStack",
-        "isDocumentationGap",
-        "summary"
-    ]
-):
-    objs.append(o.properties)
-
-df = pd.DataFrame(objs)
-df.to_csv("data/transformed_data.csv", index=False)
-
-client.close()
+
+@instrumented("export")
+def main(argv=None):
+    args = parser.parse_args(argv)
+
+    with shared_client() as client:
+        collection = client.collections.get(COLLECTION_NAME)
+
+        if args.format == "parquet" and args.incremental:
+            n = export_incremental(
+                collection,
+                output_dir=args.output or DEFAULT_EXPORT_DIR,
+                chunk_size=args.chunk_size,
+            )
+            print(f"Merged {n} changed objects into {args.output or DEFAULT_EXPORT_DIR}")
+        elif args.format == "parquet":
+            n = export_parquet(
+                collection,
+                output_dir=args.output or DEFAULT_EXPORT_DIR,
+                partitions=args.partitions,
+                chunk_size=args.chunk_size,
+                resume=args.resume,
+            )
+            print(f"Exported {n} objects to {args.output or DEFAULT_EXPORT_DIR}")
+        else:
+            import pandas as pd
+
+            objs = []
+
+            for o in collection.iterator(
+                return_properties=EXPORT_PROPERTIES
+            ):
+                objs.append(o.properties)
+
+            df = pd.DataFrame(objs)
+            df.to_csv(args.output or "data/transformed_data.csv", index=False)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,77 @@
+from vector_store import VectorStore, IVFIndex, export_store, DEFAULT_STORE_DIR, QUANTIZATIONS
+from helpers import COLLECTION_NAME, NAMED_VECTORS
+from instrumentation import instrumented
+import argparse
+import time
+
+parser = argparse.ArgumentParser(
+    description="Export the named vectors to a memory-mapped local store for offline similarity search."
+)
+parser.add_argument("--output", default=DEFAULT_STORE_DIR, help="Directory of the vector store.")
+parser.add_argument(
+    "--vectors",
+    default=",".join(NAMED_VECTORS),
+    help="Comma-separated named vectors to export.",
+)
+parser.add_argument("--quantize", choices=QUANTIZATIONS, default="none", help="'int8' stores 4x smaller vectors.")
+parser.add_argument("--ivf", action="store_true", help="Also build an IVF (k-means) index per vector for approximate search.")
+parser.add_argument("--lists", type=int, default=None, help="Number of IVF lists (default: sqrt of the object count).")
+parser.add_argument(
+    "--similar-to",
+    type=int,
+    default=None,
+    help="Skip the export and print the threads most similar to this topic_id, from the existing store.",
+)
+parser.add_argument("--vector", choices=list(NAMED_VECTORS), default="default", help="Vector to search with --similar-to.")
+parser.add_argument("--top-k", type=int, default=10, help="Number of results for --similar-to.")
+parser.add_argument("--n-probe", type=int, default=8, help="IVF lists scanned per query, if the store has an index.")
+
+
+def similar_to(args):
+    store = VectorStore.open(args.output)
+    row = store.row_of_topic(args.similar_to)
+    if row is None:
+        raise SystemExit(f"topic_id {args.similar_to} is not in {args.output}")
+    try:
+        index = IVFIndex.load(store, args.vector)
+    except FileNotFoundError:
+        index = None
+
+    start = time.perf_counter()
+    rows, scores = store.neighbors(args.vector, [row], k=args.top_k, index=index, n_probe=args.n_probe)
+    elapsed = time.perf_counter() - start
+    print(f"Most similar to topic_id {args.similar_to} by '{args.vector}' ({'IVF' if index else 'exact'}, {elapsed * 1000:.1f} ms):")
+    for r, score in zip(rows[0], scores[0]):
+        if r >= 0:
+            print(f"  {score:.3f}  topic_id {store.topic_ids[r]}  {store.uuid(r)}")
+
+
+@instrumented("export_vectors")
+def main(argv=None):
+    args = parser.parse_args(argv)
+
+    if args.similar_to is not None:
+        similar_to(args)
+        return
+
+    from connection import shared_client
+    with shared_client() as client:
+        vector_names = args.vectors.split(",")
+        n = export_store(
+            client.collections.get(COLLECTION_NAME),
+            args.output,
+            vector_names=vector_names,
+            quantize=args.quantize,
+        )
+    print(f"Exported {len(vector_names)} vectors of {n} objects to {args.output}")
+
+    if args.ivf:
+        store = VectorStore.open(args.output)
+        for name in vector_names:
+            index = IVFIndex.build(store, name, n_lists=args.lists)
+            index.save(store)
+            print(f"Built IVF index over '{name}' with {len(index.centers)} lists")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,49 +1,64 @@
-import pandas as pd
-import plotly.express as px
-from helpers import ROOT_CAUSE_CATEGORIES, TECHNICAL_DOMAIN_CATEGORIES, ACCESS_CONTEXT_CATEGORIES
-
-df = pd.read_csv("data/transformed_data.csv")
-
-# Group by 'rootCauseCategory' and then by 'technicalDomain' to get counts
-grouped_df = df.groupby(['rootCauseCategory', 'technicalDomain']).size().reset_index(name='counts')
-
-# Remove values of `rootCauseCategory` if not in the list of ROOT_CAUSE_CATEGORIES
-grouped_df = grouped_df[grouped_df['rootCauseCategory'].isin(ROOT_CAUSE_CATEGORIES.keys())]
-# Remove values of `technicalDomain` if not in the list of TECHNICAL_DOMAIN_CATEGORIES
-grouped_df = grouped_df[grouped_df['technicalDomain'].isin(TECHNICAL_DOMAIN_CATEGORIES.keys())]
-# # Remove values of `accessContext` if not in the list of ACCESS_CONTEXT_CATEGORIES
-# grouped_df = grouped_df[grouped_df['accessContext'].isin(ACCESS_CONTEXT_CATEGORIES.keys())]
-
-# Pivot the DataFrame to get 'technicalDomain' as columns and 'rootCauseCategory' as rows
-pivot_df = grouped_df.pivot(index='rootCauseCategory', columns='technicalDomain', values='counts').fillna(0)
-
-# Reset the index to make 'rootCauseCategory' a column again
-pivot_df.reset_index(inplace=True)
-
-# Print the pivoted DataFrame
-print(pivot_df)
-
-# Print the heatmap with plotly, with x axis as technicalDomain and y axis as rootCauseCategory
-# Create the heatmap with plotly
-fig = px.imshow(
-    pivot_df.set_index('rootCauseCategory'),
-    labels=dict(x="Technical Domain", y="Root Cause Category", color="Count"),
-    x=pivot_df.columns[1:],  # Use all columns except the first one (rootCauseCategory)
-    y=pivot_df['rootCauseCategory'],
-    color_continuous_scale="YlOrRd",
-    aspect="auto",
-    title="Heatmap of Root Cause Categories by Technical Domain"
-)
+from instrumentation import instrumented
+import argparse
 
-# Customize the layout
-fig.update_layout(
-    xaxis=dict(side="bottom"),
-    yaxis=dict(tickmode="linear"),
-    coloraxis_colorbar=dict(title="Count")
+parser = argparse.ArgumentParser(description="Cross-tabulate the enriched properties and render heatmaps.")
+parser.add_argument("--input", default=None, help="Parquet export or CSV (defaults to the latest export).")
+parser.add_argument("--output-dir", default=None, help="Directory for cross-tab CSVs and heatmaps (defaults to data/analysis).")
+parser.add_argument("--time-freq", default="M", help="Pandas period for bucketing date_created, e.g. 'M' or 'Q'.")
+parser.add_argument("--no-heatmaps", action="store_true", help="Only write the cross-tab CSVs.")
+parser.add_argument(
+    "--repair-labels",
+    action="store_true",
+    help="Map near-miss labels ('Queries', '3/5') to valid values before analysis instead of dropping them "
+         "(see 66_validate_labels.py to fix them in Weaviate).",
 )
+parser.add_argument("--show", action="store_true", help="Also open the main heatmap in a browser.")
+
+
+@instrumented("analyze")
+def main(argv=None):
+    args = parser.parse_args(argv)
+    # Imported here, so --help does not pay for pandas
+    from analysis import load_snapshot, run_analysis, render_heatmap, DEFAULT_OUTPUT_DIR
+    args.output_dir = args.output_dir or DEFAULT_OUTPUT_DIR
+
+    df = load_snapshot(args.input)
+    if args.repair_labels:
+        from label_validation import validate_frame, repair_frame
+        report = validate_frame(df)
+        df = repair_frame(df, report)
+        for prop, r in report.properties.items():
+            if r.repaired:
+                print(f"Repaired values of {prop}: {r.repaired}")
+
+    # Validates labels against helpers.py up front, then computes every pairwise cross-tab at once
+    tables, invalid = run_analysis(
+        df,
+        output_dir=args.output_dir,
+        time_freq=args.time_freq,
+        heatmaps=not args.no_heatmaps,
+    )
+
+    for prop, count in invalid.items():
+        print(f"Invalid values of {prop}: {count}")
+
+    # 'technicalDomain' as columns and 'rootCauseCategory' as rows, leaving out empty categories
+    pivot_df = tables[("technicalDomain", "rootCauseCategory")].T
+    pivot_df = pivot_df.loc[pivot_df.sum(axis=1) > 0, pivot_df.sum(axis=0) > 0].sort_index().sort_index(axis=1)
+
+    # Print the pivoted DataFrame
+    print(pivot_df)
+
+    fig = render_heatmap(
+        pivot_df,
+        f"{args.output_dir}/heatmap_root_cause_by_domain.html",
+        title="Heatmap of Root Cause Categories by Technical Domain",
+    )
+    if args.show:
+        fig.show()
 
-# Show the plot
-fig.show()
+    pivot_df.reset_index().to_csv("data/heatmap_data.csv", index=False)
 
-pivot_df.to_csv("data/heatmap_data.csv", index=False)
 
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,84 @@
+from helpers import COLLECTION_NAME
+from instrumentation import instrumented, span
+import argparse
+import os
+import runpy
+
+parser = argparse.ArgumentParser(
+    description="Check every enriched label against helpers.py, report invalid-label rates and repair near misses."
+)
+parser.add_argument(
+    "--input",
+    default=None,
+    help="Parquet export or CSV to check instead of scanning the collection (report only, unless it has a uuid column).",
+)
+parser.add_argument(
+    "--threshold",
+    type=float,
+    default=None,
+    help="Minimum trigram similarity (0-1) for mapping an invalid label to a category (defaults to 0.5).",
+)
+parser.add_argument("--write-back", action="store_true", help="Write the repaired values onto the objects in Weaviate.")
+parser.add_argument(
+    "--cache",
+    default=None,
+    help="Enrichment cache (see 50_transformation_agent.py --cache) to update with the repairs on --write-back, "
+         "so --incremental runs keep them and re-generate only the unrepairable labels.",
+)
+parser.add_argument("--report", default=None, help="JSON file for the per-property report (defaults to data/label_validation.json).")
+parser.add_argument("--max-workers", type=int, default=8, help="Concurrent update requests on --write-back.")
+
+
+@instrumented("validate")
+def main(argv=None):
+    args = parser.parse_args(argv)
+    # Imported here, so --help does not pay for pandas
+    from label_validation import (
+        LabelValidator, validate_frame, scan_collection, apply_repairs, sync_enrichment_cache,
+        write_report, format_report, DEFAULT_REPORT_PATH, DEFAULT_THRESHOLD,
+    )
+    args.report = args.report or DEFAULT_REPORT_PATH
+    validator = LabelValidator(threshold=DEFAULT_THRESHOLD if args.threshold is None else args.threshold)
+
+    if args.input is not None:
+        from analysis import load_snapshot
+        df = load_snapshot(args.input)
+        if args.write_back and "uuid" not in df:
+            parser.error(f"--write-back needs a uuid column, which {args.input} does not have")
+        report = validate_frame(df, validator)
+    else:
+        from connection import shared_client
+        with shared_client() as client:
+            with span("validate.scan"):
+                df = scan_collection(client.collections.get(COLLECTION_NAME))
+            report = validate_frame(df, validator)
+
+    print(format_report(report))
+    write_report(report, args.report)
+    print(f"Report written to {args.report}")
+
+    if not args.write_back:
+        return
+
+    from connection import shared_client
+    from query_cache import invalidate
+    with shared_client() as client:
+        collection = client.collections.get(COLLECTION_NAME)
+        with span("validate.write_back"):
+            n = apply_repairs(collection, report, max_workers=args.max_workers)
+        print(f"Repaired labels on {n} objects")
+
+        if args.cache:
+            from enrichment import EnrichmentCache
+            agent_script = os.path.join(os.path.dirname(os.path.abspath(__file__)), "50_transformation_agent.py")
+            operations = runpy.run_path(agent_script, run_name="operations")["build_operations"]()
+            cache = EnrichmentCache(args.cache)
+            for prop, (updated, dropped) in sync_enrichment_cache(collection, operations, cache, report).items():
+                print(f"Enrichment cache, {prop}: {updated} repaired, {dropped} dropped for re-enrichment")
+            cache.close()
+    # The repairs changed objects, so cached query results are stale
+    invalidate(COLLECTION_NAME)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,134 +1,178 @@
-import weaviate
-from weaviate.classes.init import Auth
-from weaviate.classes.aggregate import GroupByAggregate
-from weaviate.classes.generate import GenerativeConfig
-from weaviate.classes.query import Filter
 import os
-from dotenv import load_dotenv
-from helpers import COLLECTION_NAME
+from helpers import COLLECTION_NAME, ANALYSIS_PROPERTIES
+from connection import shared_client
+from query_cache import CachedCollection, QueryCache
+from query_cache import DEFAULT_CACHE_PATH as QUERY_CACHE_PATH
+from generation import Generator, GenerationCache, PROVIDERS, get_provider, select_objects
+from generation import DEFAULT_CACHE_PATH as GENERATION_CACHE_PATH
+from columnar_snapshot import ColumnarSnapshot, DEFAULT_SNAPSHOT_PATH
+from instrumentation import instrumented, span
+import argparse
 import re
-from colorama import init, Fore, Style
-
-# Initialize colorama for colored terminal output
-init()
-
-weaviate_url = os.getenv("WEAVIATE_URL")
-weaviate_key = os.getenv("WEAVIATE_API_KEY")
-anthropic_key = os.getenv("ANTHROPIC_API_KEY")
-load_dotenv()
-
-client = weaviate.connect_to_weaviate_cloud(
-    cluster_url=weaviate_url,
-    auth_credentials=Auth.api_key(weaviate_key),
-    headers={
-        "X-Anthropic-Api-Key": anthropic_key,
-    }
-)
-
-collection = client.collections.get(COLLECTION_NAME)
-
-analysis_props = [
-    "technicalComplexity",
-    "technicalDomain",
-    "rootCauseCategory",
-    "accessContext",
-    "causedByOutdatedStack",
-    "isDocumentationGap"
-]
-
-for prop in analysis_props:
-
-    response = collection.aggregate.over_all(
-        group_by=GroupByAggregate(prop=prop)
-    )
-    print(f"\nProperty: {prop}")
-    for group in response.groups:
-        print(f"Value: {group.grouped_by} Count: {group.total_count}")
-
 
-prop = "technicalDomain"
-response = collection.aggregate.over_all(
-    group_by=GroupByAggregate(prop=prop),
-    filters=Filter.by_property(name="rootCauseCategory").equal("conceptual_misunderstanding")
+parser = argparse.ArgumentParser(description="Analyse the enriched forum posts.")
+parser.add_argument(
+    "--local",
+    action="store_true",
+    help="Answer group-by counts from a local columnar snapshot instead of one aggregate query per slice.",
 )
-
-print(f"\nProperty: {prop}")
-for group in response.groups:
-    print(f"Value: {group.grouped_by} Count: {group.total_count}")
-
-
-response = collection.generate.fetch_objects(
-    filters=(
-        Filter.by_property(name="rootCauseCategory").equal("conceptual_misunderstanding") &
-        Filter.by_property(name="technicalDomain").equal("queries")
-    ),
-    limit=100,
-    generative_provider=GenerativeConfig.anthropic(model="claude-3-7-sonnet-latest"),
-    grouped_task="""
-    From these Weaviate Forum post conversations, identify 3-5 most common things
-    that we can help users to understand better about Weaviate queries.
-    If possible, also provide a count of each type in the sample.
-    """,
-    grouped_properties=["summary", "title"]
+parser.add_argument("--refresh", action="store_true", help="With --local: rebuild the snapshot from the collection.")
+parser.add_argument("--snapshot", default=DEFAULT_SNAPSHOT_PATH, help="Path to the local snapshot.")
+parser.add_argument("--no-cache", action="store_true", help="Always query the cluster instead of the query result cache.")
+parser.add_argument("--cache-ttl", type=float, default=3600.0, help="Seconds a cached query result stays valid.")
+parser.add_argument("--provider", choices=list(PROVIDERS), default="anthropic", help="'fake' generates offline.")
+parser.add_argument("--refresh-generation", action="store_true", help="Regenerate even if cached.")
+parser.add_argument("--generation-cache", default=GENERATION_CACHE_PATH, help="Path to the generation cache.")
+parser.add_argument(
+    "--doc-gaps",
+    type=int,
+    default=0,
+    help="Also generate documentation suggestions for this many documentation-gap posts, one per post.",
 )
 
-print(f"\n{response.generative.text}")
-
-
-
-
-
-
-# response = collection.generate.fetch_objects(
-#     filters=(
-#         Filter.by_property(name="isDocumentationGap").equal(True)
-#     ),
-#     limit=5,
-#     generative_provider=GenerativeConfig.anthropic(
-#         model="claude-3-7-sonnet-latest",
-#     ),
-#     single_prompt="""
-#     For this query, what update to the documentation would have helped the user to solve their problem
-#     before asking the question?
-
-#     Here is the conversation:
-#     {conversation}
-#     """
-# )
-
-# print("Examples:")
-# for o in response.objects:
-#     print("\n" + "-" * 50)
-#     print(f"Object ID: {o.uuid}")
-#     print(f"Title: {Fore.CYAN}{o.properties['title']}{Style.RESET_ALL}")
-
-#     print(f"{Fore.GREEN}\n== ANALYSIS =={Style.RESET_ALL}")
-#     print(f"Technical Complexity: {o.properties['technicalComplexity']}")
-#     print(f"Root Cause Category: {o.properties['rootCauseCategory']}")
-#     print(f"Access Context: {o.properties['accessContext']}")
-#     print(f"Caused By Outdated Stack: {o.properties['causedByOutdatedStack']}")
-#     print(f"Is Documentation Gap: {o.properties['isDocumentationGap']}")
-
-#     print(f"{Fore.GREEN}\n== SUMMARY =={Style.RESET_ALL}")
-#     print(f"{Fore.LIGHTMAGENTA_EX}{o.generative.text}{Style.RESET_ALL}")
-
-#     conversation = o.properties['conversation']
-
-#     # First normalize all types of line endings
-#     conversation = conversation.replace('\r\n', '\n').replace('\r', '\n')
-
-#     # Clean up excess whitespace around newlines without removing paragraph breaks
-#     conversation = re.sub(r'[ \t]+\n', '\n', conversation)  # Remove trailing spaces before newlines
-#     conversation = re.sub(r'\n[ \t]+', '\n', conversation)  # Remove leading spaces after newlines
-
-#     # Replace sequences of 3 or more newlines with exactly two newlines
-#     conversation = re.sub(r'\n{3,}', '\n\n', conversation)
-
-#     # Remove new lines at the beginning and end
-#     conversation = conversation.strip()
-
-#     limit = 200
-#     print(f"{Fore.GREEN}\nConversation (first {limit} chars):{Style.RESET_ALL}")
-#     print(f"{Fore.LIGHTBLACK_EX}{conversation[:limit]}{Style.RESET_ALL}...")
 
-client.close()
+@instrumented("insights")
+def main(argv=None):
+    args = parser.parse_args(argv)
+
+    from weaviate.classes.aggregate import GroupByAggregate
+    from weaviate.classes.query import Filter
+    from colorama import init, Fore, Style
+
+    # Initialize colorama for colored terminal output
+    init()
+
+    with shared_client() as client:
+        collection = client.collections.get(COLLECTION_NAME)
+        query_cache = None
+        if not args.no_cache:
+            # Repeated aggregates and lookups are served locally until the collection is written to
+            query_cache = QueryCache(ttl=args.cache_ttl, path=QUERY_CACHE_PATH)
+            collection = CachedCollection(collection, query_cache)
+
+        analysis_props = ANALYSIS_PROPERTIES
+
+        if args.local:
+            # Pull the enriched properties once, then slice locally
+            if args.refresh or not os.path.exists(args.snapshot):
+                with span("snapshot.build"):
+                    snapshot = ColumnarSnapshot.from_collection(collection, analysis_props)
+                snapshot.save(args.snapshot)
+            else:
+                snapshot = ColumnarSnapshot.load(args.snapshot)
+
+            for prop in analysis_props:
+                print(f"\nProperty: {prop}")
+                for value, count in snapshot.group_by(prop):
+                    print(f"Value: {value} Count: {count}")
+
+            prop = "technicalDomain"
+            print(f"\nProperty: {prop}")
+            for value, count in snapshot.group_by(prop, where={"rootCauseCategory": "conceptual_misunderstanding"}):
+                print(f"Value: {value} Count: {count}")
+
+        else:
+            for prop in analysis_props:
+
+                with span("aggregate.over_all", group_by=prop):
+                    response = collection.aggregate.over_all(
+                        group_by=GroupByAggregate(prop=prop)
+                    )
+                print(f"\nProperty: {prop}")
+                for group in response.groups:
+                    print(f"Value: {group.grouped_by} Count: {group.total_count}")
+
+
+            prop = "technicalDomain"
+            with span("aggregate.over_all", group_by=prop, filtered=True):
+                response = collection.aggregate.over_all(
+                    group_by=GroupByAggregate(prop=prop),
+                    filters=Filter.by_property(name="rootCauseCategory").equal("conceptual_misunderstanding")
+                )
+
+            print(f"\nProperty: {prop}")
+            for group in response.groups:
+                print(f"Value: {group.grouped_by} Count: {group.total_count}")
+
+
+        generator = Generator(get_provider(args.provider, collection), GenerationCache(args.generation_cache))
+
+        filters = (
+            Filter.by_property(name="rootCauseCategory").equal("conceptual_misunderstanding") &
+            Filter.by_property(name="technicalDomain").equal("queries")
+        )
+        text = generator.grouped(
+            select_objects(collection, filters=filters, limit=100, properties=["summary", "title"]),
+            task="""
+            From these Weaviate Forum post conversations, identify 3-5 most common things
+            that we can help users to understand better about Weaviate queries.
+            If possible, also provide a count of each type in the sample.
+            """,
+            properties=["summary", "title"],
+            refresh=args.refresh_generation,
+        )
+
+        print(f"\n{text}")
+
+        if args.doc_gaps:
+            objects = select_objects(
+                collection,
+                filters=Filter.by_property(name="isDocumentationGap").equal(True),
+                limit=args.doc_gaps,
+            )
+            # One generation per object, batched and run concurrently; unchanged objects come from the cache
+            texts = generator.single(
+                objects,
+                prompt="""
+                For this query, what update to the documentation would have helped the user to solve their problem
+                before asking the question?
+
+                Here is the conversation:
+                {conversation}
+                """,
+                refresh=args.refresh_generation,
+            )
+
+            print("Examples:")
+            for o in objects:
+                print("\n" + "-" * 50)
+                print(f"Object ID: {o.uuid}")
+                print(f"Title: {Fore.CYAN}{o.properties['title']}{Style.RESET_ALL}")
+
+                print(f"{Fore.GREEN}\n== ANALYSIS =={Style.RESET_ALL}")
+                print(f"Technical Complexity: {o.properties['technicalComplexity']}")
+                print(f"Root Cause Category: {o.properties['rootCauseCategory']}")
+                print(f"Access Context: {o.properties['accessContext']}")
+                print(f"Caused By Outdated Stack: {o.properties['causedByOutdatedStack']}")
+                print(f"Is Documentation Gap: {o.properties['isDocumentationGap']}")
+
+                print(f"{Fore.GREEN}\n== SUMMARY =={Style.RESET_ALL}")
+                print(f"{Fore.LIGHTMAGENTA_EX}{texts[str(o.uuid)]}{Style.RESET_ALL}")
+
+                conversation = o.properties['conversation']
+
+                # First normalize all types of line endings
+                conversation = conversation.replace('\r\n', '\n').replace('\r', '\n')
+
+                # Clean up excess whitespace around newlines without removing paragraph breaks
+                conversation = re.sub(r'[ \t]+\n', '\n', conversation)  # Remove trailing spaces before newlines
+                conversation = re.sub(r'\n[ \t]+', '\n', conversation)  # Remove leading spaces after newlines
+
+                # Replace sequences of 3 or more newlines with exactly two newlines
+                conversation = re.sub(r'\n{3,}', '\n\n', conversation)
+
+                # Remove new lines at the beginning and end
+                conversation = conversation.strip()
+
+                limit = 200
+                print(f"{Fore.GREEN}\nConversation (first {limit} chars):{Style.RESET_ALL}")
+                print(f"{Fore.LIGHTBLACK_EX}{conversation[:limit]}{Style.RESET_ALL}...")
+
+        generator.cache.close()
+        if query_cache is not None:
+            query_cache.save()
+            print(f"\nQuery cache hits: {query_cache.hits}, misses: {query_cache.misses}")
+
+
+if __name__ == "__main__":
+    main()
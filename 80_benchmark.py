@@ -0,0 +1,97 @@
+from benchmark import (
+    STAGES, DEFAULT_SIZES, DEFAULT_SOURCE, DEFAULT_WORK_DIR, DEFAULT_RESULTS_PATH,
+    run_benchmarks, write_results, load_runs, compare,
+)
+from import_engine import ImportConfig
+import argparse
+import sys
+
+parser = argparse.ArgumentParser(
+    description="Benchmark load, import, aggregate, export and analysis on synthetic corpora of increasing size."
+)
+parser.add_argument(
+    "--target",
+    choices=["fake", "local", "cloud", "env"],
+    default="fake",
+    help="'fake' runs against the in-process fake_weaviate client; 'local'/'cloud' connect as connection.py does; "
+         "'env' uses WEAVIATE_MODE. Real targets use a scratch collection that is deleted afterwards.",
+)
+parser.add_argument(
+    "--sizes",
+    default=",".join(str(s) for s in DEFAULT_SIZES),
+    help="Comma-separated corpus sizes (threads).",
+)
+parser.add_argument("--stages", default=",".join(STAGES), help=f"Comma-separated subset of: {', '.join(STAGES)}.")
+parser.add_argument("--source", default=DEFAULT_SOURCE, help="Real export the synthetic corpora are modelled on (see 02_generate_corpus.py).")
+parser.add_argument("--work-dir", default=DEFAULT_WORK_DIR, help="Directory for corpora and exports.")
+parser.add_argument("--results", default=DEFAULT_RESULTS_PATH, help="JSON Lines file each run is appended to.")
+parser.add_argument("--seed", type=int, default=0, help="Seed of the synthetic corpora.")
+parser.add_argument("--batch-size", type=int, default=200, help="Objects per import batch request.")
+parser.add_argument("--concurrency", type=int, default=2, help="Import batch requests in flight at once.")
+parser.add_argument("--partitions", type=int, default=4, help="Parallel export scans.")
+parser.add_argument("--repeats", type=int, default=5, help="Repetitions of each aggregate query.")
+parser.add_argument("--keep", action="store_true", help="Keep the scratch collection of the last size.")
+parser.add_argument(
+    "--regression-threshold",
+    type=float,
+    default=0.2,
+    help="Report stages whose throughput dropped by more than this fraction since the last run on the same target.",
+)
+parser.add_argument("--fail-on-regression", action="store_true", help="Exit with status 1 if a regression is found.")
+
+
+def main(argv=None):
+    args = parser.parse_args(argv)
+
+    sizes = [int(s) for s in args.sizes.split(",")]
+    stages = args.stages.split(",")
+    import_config = ImportConfig(batch_size=args.batch_size, concurrent_requests=args.concurrency)
+    previous = [run for run in load_runs(args.results) if run.get("target") == args.target]
+
+    def run(client):
+        return run_benchmarks(
+            client,
+            sizes=sizes,
+            stages=stages,
+            source=args.source,
+            work_dir=args.work_dir,
+            seed=args.seed,
+            import_config=import_config,
+            partitions=args.partitions,
+            repeats=args.repeats,
+            keep=args.keep,
+        )
+
+    if args.target == "fake":
+        from fake_weaviate import FakeClient
+        results = run(FakeClient(server={}))
+    else:
+        from connection import ConnectionSettings, shared_client
+        settings = ConnectionSettings.from_env(mode=None if args.target == "env" else args.target)
+        with shared_client(settings) as client:
+            results = run(client)
+
+    write_results(
+        results,
+        args.results,
+        target=args.target,
+        seed=args.seed,
+        batch_size=args.batch_size,
+        concurrency=args.concurrency,
+        partitions=args.partitions,
+    )
+    print(f"Results appended to {args.results}")
+
+    if previous:
+        regressions = compare(previous[-1], results, args.regression_threshold)
+        for r in regressions:
+            print(
+                f"Regression: {r['stage']} at {r['size']} threads: {r['previous']:.1f}/s -> "
+                f"{r['current']:.1f}/s ({r['change']:+.0%}) since {previous[-1].get('commit')}"
+            )
+        if regressions and args.fail_on_regression:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
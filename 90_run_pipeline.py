@@ -0,0 +1,37 @@
+from pipeline import Pipeline, PipelineState, DEFAULT_STAGES, DEFAULT_STATE_PATH, DEFAULT_REPORT_PATH, format_report, write_report
+from instrumentation import instrumented
+import argparse
+import time
+
+parser = argparse.ArgumentParser(description="Run load -> populate -> enrich -> export -> analyze, skipping unchanged stages.")
+parser.add_argument(
+    "--stages",
+    default=None,
+    help=f"Comma-separated subset of stages to run: {', '.join(s.name for s in DEFAULT_STAGES)}.",
+)
+parser.add_argument("--force", action="store_true", help="Run the selected stages even if their inputs are unchanged.")
+parser.add_argument("--dry-run", action="store_true", help="Only report which stages would run.")
+parser.add_argument("--max-workers", type=int, default=2, help="Independent stages to run at once.")
+parser.add_argument("--state", default=DEFAULT_STATE_PATH, help="Path to the stage fingerprint state.")
+parser.add_argument("--report", default=DEFAULT_REPORT_PATH, help="Path to the per-stage timing report.")
+
+
+@instrumented("pipeline")
+def main(argv=None):
+    args = parser.parse_args(argv)
+
+    pipeline = Pipeline(DEFAULT_STAGES, state=PipelineState(args.state), max_workers=args.max_workers)
+    start = time.monotonic()
+    results = pipeline.run(
+        only=args.stages.split(",") if args.stages else None,
+        force=args.force,
+        dry_run=args.dry_run,
+    )
+    write_report(results, args.report, total=time.monotonic() - start)
+
+    print(format_report(results))
+    print(f"Report written to {args.report}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,164 @@
+import os
+from itertools import combinations
+
+import numpy as np
+import pandas as pd
+
+import instrumentation
+from helpers import ANALYSIS_PROPERTIES, CATEGORY_DICTS
+
+DEFAULT_CSV_PATH = "data/transformed_data.csv"
+DEFAULT_OUTPUT_DIR = "data/analysis"
+COMPLEXITY_RANGE = (1, 5)
+BOOLEAN_PROPERTIES = ["has_accepted_answer", "causedByOutdatedStack", "isDocumentationGap"]
+
+
+@instrumentation.traced("analysis.load")
+def load_snapshot(path=None):
+    """
+    Load an export with typed columns: categoricals from `helpers.py`, nullable ints and bools, UTC dates.
+
+    Args:
+        path (str | None): Parquet directory/file or CSV file. Defaults to the Parquet export
+            from `61_export_data.py` if it exists, else `data/transformed_data.csv`.
+
+    Returns:
+        pd.DataFrame
+    """
+    if path is None:
+        from export_pipeline import DEFAULT_EXPORT_DIR
+        path = DEFAULT_EXPORT_DIR if os.path.isdir(DEFAULT_EXPORT_DIR) else DEFAULT_CSV_PATH
+
+    if os.path.isdir(path) or path.endswith(".parquet"):
+        df = pd.read_parquet(path)
+    else:
+        df = pd.read_csv(path)
+
+    if "date_created" in df:
+        df["date_created"] = pd.to_datetime(df["date_created"], utc=True, format="ISO8601")
+    for prop in BOOLEAN_PROPERTIES:
+        if prop in df:
+            df[prop] = df[prop].astype("boolean")
+    # Labels are validated in `validate_categories`; keep them as plain strings until then
+    for prop in CATEGORY_DICTS:
+        if prop in df:
+            df[prop] = df[prop].astype("string")
+    return df
+
+
+def validate_categories(df):
+    """
+    Check every enriched label against its allowed values in one vectorized pass per column.
+
+    Invalid labels (and `technicalComplexity` outside 1-5) become missing values, and the
+    category columns get a `CategoricalDtype` with exactly the `helpers.py` categories.
+
+    Returns:
+        tuple: (cleaned DataFrame, {property: number of invalid values})
+    """
+    df = df.copy()
+    invalid = {}
+    for prop, categories in CATEGORY_DICTS.items():
+        if prop not in df:
+            continue
+        valid = df[prop].isin(list(categories))
+        invalid[prop] = int((df[prop].notna() & ~valid).sum())
+        df[prop] = df[prop].where(valid).astype(pd.CategoricalDtype(categories=list(categories)))
+
+    if "technicalComplexity" in df:
+        values = pd.to_numeric(df["technicalComplexity"], errors="coerce")
+        low, high = COMPLEXITY_RANGE
+        valid = values.between(low, high) & (values == values.round())
+        invalid["technicalComplexity"] = int((df["technicalComplexity"].notna() & ~valid).sum())
+        df["technicalComplexity"] = pd.Categorical(
+            values.where(valid).astype("Int64"), categories=list(range(low, high + 1))
+        )
+    return df, invalid
+
+
+def add_time_bucket(df, freq="M", column="period"):
+    """Add a categorical column bucketing `date_created` by `freq` (e.g. 'M', 'Q', 'Y')."""
+    periods = df["date_created"].dt.tz_localize(None).dt.to_period(freq)
+    df[column] = pd.Categorical(periods.astype("string"), categories=sorted(periods.dropna().astype(str).unique()))
+    return df
+
+
+def _encode(series):
+    """Integer codes (-1 for missing) and labels of a column, without copying categoricals."""
+    if isinstance(series.dtype, pd.CategoricalDtype):
+        return series.cat.codes.to_numpy(), list(series.cat.categories)
+    codes, labels = pd.factorize(series, sort=True)
+    return codes, list(labels)
+
+
+def crosstabs(df, dimensions=None):
+    """
+    Counts for every pair of `dimensions`.
+
+    Each column is encoded to integer codes once; every pair is then a single `np.bincount`.
+
+    Returns:
+        dict: (row dimension, column dimension) -> DataFrame of counts
+    """
+    dimensions = dimensions or [d for d in ANALYSIS_PROPERTIES if d in df]
+    encoded = {d: _encode(df[d]) for d in dimensions}
+    tables = {}
+    for row_dim, col_dim in combinations(dimensions, 2):
+        (rows, row_labels), (cols, col_labels) = encoded[row_dim], encoded[col_dim]
+        keep = (rows >= 0) & (cols >= 0)
+        flat = rows[keep].astype(np.int64) * len(col_labels) + cols[keep]
+        counts = np.bincount(flat, minlength=len(row_labels) * len(col_labels))
+        tables[(row_dim, col_dim)] = pd.DataFrame(
+            counts.reshape(len(row_labels), len(col_labels)),
+            index=pd.Index(row_labels, name=row_dim),
+            columns=pd.Index(col_labels, name=col_dim),
+        )
+    return tables
+
+
+def render_heatmap(table, path, title=None):
+    """Write a heatmap of a cross-tab to an HTML file, without opening a browser."""
+    import plotly.express as px
+
+    fig = px.imshow(
+        table,
+        labels=dict(x=table.columns.name, y=table.index.name, color="Count"),
+        x=[str(c) for c in table.columns],
+        y=[str(i) for i in table.index],
+        color_continuous_scale="YlOrRd",
+        aspect="auto",
+        title=title or f"Heatmap of {table.index.name} by {table.columns.name}",
+    )
+    fig.update_layout(
+        xaxis=dict(side="bottom"),
+        yaxis=dict(tickmode="linear"),
+        coloraxis_colorbar=dict(title="Count")
+    )
+    fig.write_html(path, include_plotlyjs="cdn")
+    return fig
+
+
+def run_analysis(df, output_dir=DEFAULT_OUTPUT_DIR, time_freq="M", heatmaps=True):
+    """
+    Validate, cross-tabulate all enriched dimensions (plus a time bucket) and write CSVs and heatmaps.
+
+    Returns:
+        tuple: (cross-tabs dict, invalid label counts)
+    """
+    with instrumentation.span("analysis.validate", rows=len(df)):
+        df, invalid = validate_categories(df)
+    dimensions = [d for d in ANALYSIS_PROPERTIES if d in df]
+    if time_freq and "date_created" in df:
+        add_time_bucket(df, time_freq)
+        dimensions.append("period")
+
+    with instrumentation.span("analysis.crosstabs", dimensions=len(dimensions)):
+        tables = crosstabs(df, dimensions)
+    os.makedirs(output_dir, exist_ok=True)
+    with instrumentation.span("analysis.write", tables=len(tables), heatmaps=heatmaps):
+        for (row_dim, col_dim), table in tables.items():
+            name = f"{row_dim}__{col_dim}"
+            table.to_csv(os.path.join(output_dir, f"{name}.csv"))
+            if heatmaps:
+                render_heatmap(table, os.path.join(output_dir, f"{name}.html"))
+    return tables, invalid
@@ -0,0 +1,169 @@
+import asyncio
+import time
+from dataclasses import dataclass, field
+
+from helpers import COLLECTION_NAME, NAMED_VECTORS
+from metrics import LatencyRecorder
+
+FETCH = "fetch"
+FILTERED = "filtered"
+NEAR_TEXT = "near_text"
+HYBRID = "hybrid"
+QUERY_KINDS = [FETCH, FILTERED, NEAR_TEXT, HYBRID]
+
+
+@dataclass
+class QuerySpec:
+    """
+    One query of a batch.
+
+    Args:
+        kind: One of `QUERY_KINDS`
+        text: Query text for `near_text` and `hybrid`
+        where: Property -> value (or list of values, matching any), ANDed; used by every kind
+        target_vector: Named vector to search, see `helpers.NAMED_VECTORS`
+    """
+
+    kind: str
+    text: str | None = None
+    where: dict = field(default_factory=dict)
+    target_vector: str = "default"
+    limit: int = 10
+    alpha: float = 0.5
+    return_properties: list | None = None
+    label: str | None = None
+
+    @classmethod
+    def from_dict(cls, values):
+        return cls(**values)
+
+    @property
+    def name(self):
+        if self.label:
+            return self.label
+        if self.kind in (NEAR_TEXT, HYBRID):
+            return f"{self.kind}:{self.target_vector}"
+        return self.kind
+
+
+@dataclass
+class QueryResult:
+    spec: QuerySpec
+    objects: list
+    latency: float
+    error: str | None = None
+
+
+def where_filter(where):
+    """Build a Weaviate filter from a property -> value (or list of values) dict."""
+    from weaviate.classes.query import Filter
+
+    filters = None
+    for prop, wanted in (where or {}).items():
+        if isinstance(wanted, (list, tuple, set)):
+            condition = Filter.by_property(prop).contains_any(list(wanted))
+        else:
+            condition = Filter.by_property(prop).equal(wanted)
+        filters = condition if filters is None else filters & condition
+    return filters
+
+
+async def execute(collection, spec, embedder=None):
+    """Run one query on an async collection. Returns the response objects."""
+    if spec.kind not in QUERY_KINDS:
+        raise ValueError(f"Unknown query kind '{spec.kind}', expected one of {QUERY_KINDS}")
+    if spec.target_vector not in NAMED_VECTORS:
+        raise ValueError(f"Unknown named vector '{spec.target_vector}', expected one of {list(NAMED_VECTORS)}")
+    kwargs = {"limit": spec.limit, "filters": where_filter(spec.where), "return_properties": spec.return_properties}
+
+    if spec.kind in (FETCH, FILTERED):
+        response = await collection.query.fetch_objects(**kwargs)
+    else:
+        vector = None
+        if embedder is not None:
+            # Collections populated with client-side vectors have no server vectorizer
+            vector = (await asyncio.to_thread(embedder.embed, [spec.text]))[0]
+        if spec.kind == HYBRID:
+            response = await collection.query.hybrid(
+                query=spec.text, alpha=spec.alpha, vector=vector, target_vector=spec.target_vector, **kwargs
+            )
+        elif vector is not None:
+            response = await collection.query.near_vector(near_vector=vector, target_vector=spec.target_vector, **kwargs)
+        else:
+            response = await collection.query.near_text(query=spec.text, target_vector=spec.target_vector, **kwargs)
+    return response.objects
+
+
+async def run_queries(client, specs, concurrency=50, collection_name=COLLECTION_NAME, embedder=None):
+    """
+    Run a batch of queries concurrently on an async client, at most `concurrency` in flight.
+
+    Args:
+        client: A connected `WeaviateAsyncClient`, e.g. from `connection.shared_async_client()`
+        specs (list[QuerySpec]): Queries to run; failures are recorded, not raised
+        embedder: Optional client-side embedder from `embeddings.py`, for collections without
+            a server-side vectorizer
+
+    Returns:
+        tuple: (list[QueryResult] in input order, stats dict from `query_stats`)
+    """
+    collection = client.collections.get(collection_name)
+    semaphore = asyncio.BoundedSemaphore(concurrency)
+
+    async def run_one(spec):
+        async with semaphore:
+            start = time.perf_counter()
+            try:
+                objects = await execute(collection, spec, embedder)
+                return QueryResult(spec, objects, time.perf_counter() - start)
+            except Exception as e:
+                return QueryResult(spec, [], time.perf_counter() - start, error=f"{type(e).__name__}: {e}")
+
+    start = time.perf_counter()
+    results = await asyncio.gather(*(run_one(spec) for spec in specs))
+    return results, query_stats(results, time.perf_counter() - start, concurrency)
+
+
+def query_stats(results, wall_seconds, concurrency=None):
+    """Latency percentiles and histogram overall and per query kind, plus throughput and errors."""
+    overall, by_kind = LatencyRecorder(), {}
+    for result in results:
+        if result.error is None:
+            overall.add(result.latency)
+            by_kind.setdefault(result.spec.name, LatencyRecorder()).add(result.latency)
+    return {
+        "concurrency": concurrency,
+        "queries": len(results),
+        "errors": sum(r.error is not None for r in results),
+        "wall_seconds": wall_seconds,
+        "throughput": len(overall) / wall_seconds if wall_seconds else None,
+        "latency": overall.summary(),
+        "histogram": overall.histogram(),
+        "by_kind": {name: recorder.summary() for name, recorder in sorted(by_kind.items())},
+    }
+
+
+async def concurrency_sweep(client, specs, levels=(1, 50, 100, 200), **kwargs):
+    """Run the same batch at each concurrency level. Returns the stats of each run."""
+    sweep = []
+    for level in levels:
+        _, stats = await run_queries(client, specs, concurrency=level, **kwargs)
+        sweep.append(stats)
+    return sweep
+
+
+def _ms(seconds):
+    return "-" if seconds is None else f"{seconds * 1000:.1f}"
+
+
+def format_stats(stats):
+    latency = stats["latency"]
+    lines = [
+        f"Concurrency: {stats['concurrency']} | Queries: {stats['queries']} | Errors: {stats['errors']} | "
+        f"Wall: {stats['wall_seconds']:.2f}s | Throughput: {stats['throughput'] or 0:.1f} q/s",
+        f"Latency ms: p50 {_ms(latency['p50'])} | p95 {_ms(latency['p95'])} | "
+        f"p99 {_ms(latency['p99'])} | max {_ms(latency.get('max'))}",
+    ]
+    for name, summary in stats["by_kind"].items():
+        lines.append(f"  {name:<20} n={summary['count']:<5} p50 {_ms(summary['p50'])} p95 {_ms(summary['p95'])}")
+    return "\n".join(lines)
@@ -0,0 +1,374 @@
+import json
+import os
+import platform
+import subprocess
+import sys
+import threading
+import time
+from dataclasses import asdict, dataclass, field
+from datetime import datetime, timezone
+
+from forum_data import iter_posts
+from helpers import ANALYSIS_PROPERTIES, COLLECTION_NAME
+from import_engine import BatchImporter, ImportConfig
+from metrics import LatencyRecorder
+from synthetic_corpus import CorpusProfile, write_corpus
+
+DEFAULT_SOURCE = "data/simplified_posts.json"
+DEFAULT_WORK_DIR = "data/.cache/benchmark"
+DEFAULT_RESULTS_PATH = "data/benchmarks/results.jsonl"
+BENCHMARK_COLLECTION = f"{COLLECTION_NAME}Benchmark"
+DEFAULT_SIZES = [597, 10_000, 100_000]
+
+LOAD = "load"
+IMPORT = "import"
+AGGREGATE = "aggregate"
+EXPORT = "export"
+ANALYSIS = "analysis"
+STAGES = [LOAD, IMPORT, AGGREGATE, EXPORT, ANALYSIS]
+# Stages that need the output of another one in the same run
+STAGE_DEPENDENCIES = {AGGREGATE: [IMPORT], EXPORT: [IMPORT], ANALYSIS: [EXPORT]}
+
+
+def current_rss():
+    """Resident set size of this process in bytes, or `None` where it cannot be read."""
+    try:
+        with open("/proc/self/statm", "r") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, AttributeError):
+        return peak_rss()
+
+
+def peak_rss():
+    """Peak resident set size of this process so far in bytes, or `None` without `resource` (Windows)."""
+    try:
+        import resource
+    except ImportError:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Kilobytes on Linux, bytes on macOS
+    return peak if sys.platform == "darwin" else peak * 1024
+
+
+class RssSampler:
+    """Samples the process RSS in a background thread to find the peak while a block runs."""
+
+    def __init__(self, interval=0.01):
+        self.interval = interval
+        self.start = self.peak = None
+        self._stop = threading.Event()
+        self._thread = None
+
+    def _sample(self):
+        while not self._stop.wait(self.interval):
+            self._observe()
+
+    def _observe(self):
+        rss = current_rss()
+        if rss is not None and (self.peak is None or rss > self.peak):
+            self.peak = rss
+
+    def __enter__(self):
+        self.start = current_rss()
+        self.peak = self.start
+        self._thread = threading.Thread(target=self._sample, daemon=True)
+        self._thread.start()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self._stop.set()
+        self._thread.join()
+        self._observe()
+
+
+@dataclass
+class BenchmarkResult:
+    """
+    One stage at one corpus size.
+
+    `throughput` is items per second: records, objects, queries or rows depending on the stage.
+    `latency` summarizes per-item (load), per-batch (import) or per-query (aggregate) times in seconds.
+    """
+
+    stage: str
+    size: int
+    items: int
+    seconds: float
+    throughput: float | None
+    latency: dict | None = None
+    peak_rss_mb: float | None = None
+    rss_growth_mb: float | None = None
+    extra: dict = field(default_factory=dict)
+
+
+def _mb(n_bytes):
+    return None if n_bytes is None else n_bytes / (1024 * 1024)
+
+
+def measure(stage, size, fn):
+    """
+    Run `fn()` under a timer and RSS sampler.
+
+    Args:
+        fn: Returns (items processed, `LatencyRecorder` or None, dict of extra values)
+
+    Returns:
+        BenchmarkResult
+    """
+    with RssSampler() as rss:
+        start = time.perf_counter()
+        items, recorder, extra = fn()
+        seconds = time.perf_counter() - start
+    return BenchmarkResult(
+        stage=stage,
+        size=size,
+        items=items,
+        seconds=seconds,
+        throughput=items / seconds if seconds else None,
+        latency=recorder.summary() if recorder is not None else None,
+        peak_rss_mb=_mb(rss.peak),
+        rss_growth_mb=_mb(rss.peak - rss.start) if rss.peak is not None and rss.start is not None else None,
+        extra=extra,
+    )
+
+
+def corpus_path(work_dir, size, seed):
+    return os.path.join(work_dir, f"corpus-{size}-{seed}.jsonl")
+
+
+def build_corpus(source, size, path, seed=0):
+    """
+    Generate a labelled synthetic corpus of `size` threads (see `synthetic_corpus.py`), unless it exists.
+
+    Returns:
+        str: `path`
+    """
+    if not os.path.exists(path):
+        write_corpus(path, size, CorpusProfile.from_file(source), seed=seed, labels=True)
+    return path
+
+
+def create_benchmark_collection(client, name=BENCHMARK_COLLECTION):
+    """(Re)create the scratch collection, without a vectorizer so only Weaviate itself is measured."""
+    from weaviate.classes.config import Configure
+
+    if client.collections.exists(name):
+        client.collections.delete(name)
+    return client.collections.create(
+        name,
+        vectorizer_config=Configure.Vectorizer.none(),
+        inverted_index_config=Configure.inverted_index(index_null_state=True, index_timestamps=True),
+    )
+
+
+def bench_load(corpus):
+    """Parse and normalize every post, timing each record."""
+    recorder = LatencyRecorder()
+    n = 0
+    last = time.perf_counter()
+    for _ in iter_posts(corpus):
+        now = time.perf_counter()
+        recorder.add(now - last)
+        last, n = now, n + 1
+    return n, recorder, {"megabytes": _mb(os.path.getsize(corpus))}
+
+
+def bench_import(collection, corpus, config=None):
+    """Import the corpus, labels included (parsing too, as in `10_populate_weaviate.py`)."""
+    from weaviate.util import generate_uuid5
+
+    with BatchImporter(collection, config or ImportConfig(), report=lambda line: None) as importer:
+        for row in iter_posts(corpus):
+            importer.add_object(row, uuid=generate_uuid5(row["topic_id"]))
+    snapshot = importer.metrics.snapshot()
+    return snapshot["objects"], importer.metrics.latency, {
+        "batches": snapshot["batches"],
+        "failed": snapshot["failed"],
+        "retried": snapshot["retried"],
+        "megabytes_per_sec": _mb(snapshot["bytes_per_sec"]),
+    }
+
+
+def bench_aggregate(collection, repeats=5):
+    """Grouped counts over every analysis property, `repeats` times each."""
+    from weaviate.classes.aggregate import GroupByAggregate
+
+    recorder, by_property = LatencyRecorder(), {}
+    for prop in ANALYSIS_PROPERTIES:
+        per_property = by_property[prop] = LatencyRecorder()
+        for _ in range(repeats):
+            start = time.perf_counter()
+            collection.aggregate.over_all(group_by=GroupByAggregate(prop=prop, limit=100), total_count=True)
+            elapsed = time.perf_counter() - start
+            recorder.add(elapsed)
+            per_property.add(elapsed)
+    return len(recorder), recorder, {"p50_by_property": {p: r.summary()["p50"] for p, r in by_property.items()}}
+
+
+def bench_export(collection, output_dir, partitions=4, chunk_size=5000):
+    from export_pipeline import export_parquet
+
+    n = export_parquet(collection, output_dir, partitions=partitions, chunk_size=chunk_size)
+    size = sum(
+        os.path.getsize(os.path.join(output_dir, name)) for name in os.listdir(output_dir) if name.endswith(".parquet")
+    )
+    return n, None, {"megabytes": _mb(size)}
+
+
+def bench_analysis(export_dir, output_dir):
+    """Load the Parquet export and cross-tabulate it as `65_pandas_analysis.py` does (without heatmaps)."""
+    from analysis import load_snapshot, run_analysis
+
+    start = time.perf_counter()
+    df = load_snapshot(export_dir)
+    loaded = time.perf_counter()
+    tables, _ = run_analysis(df, output_dir=output_dir, heatmaps=False)
+    return len(df), None, {
+        "load_seconds": loaded - start,
+        "analysis_seconds": time.perf_counter() - loaded,
+        "tables": len(tables),
+    }
+
+
+def with_dependencies(stages):
+    """The selected stages plus those they depend on, in `STAGES` order."""
+    wanted = set(stages)
+    for stage in list(wanted):
+        pending = [stage]
+        while pending:
+            for dep in STAGE_DEPENDENCIES.get(pending.pop(), []):
+                if dep not in wanted:
+                    wanted.add(dep)
+                    pending.append(dep)
+    unknown = wanted - set(STAGES)
+    if unknown:
+        raise ValueError(f"Unknown stages {sorted(unknown)}, expected some of {STAGES}")
+    return [s for s in STAGES if s in wanted]
+
+
+def run_benchmarks(
+    client,
+    sizes=DEFAULT_SIZES,
+    stages=STAGES,
+    source=DEFAULT_SOURCE,
+    work_dir=DEFAULT_WORK_DIR,
+    seed=0,
+    import_config=None,
+    partitions=4,
+    repeats=5,
+    collection_name=BENCHMARK_COLLECTION,
+    keep=False,
+    report=print,
+):
+    """
+    Run the selected stages on corpora of each size against `client`.
+
+    Each size gets a fresh scratch collection, deleted afterwards unless `keep`. Corpora and
+    exports are written under `work_dir`; corpora are generated once per (size, seed) and reused.
+
+    Returns:
+        list[BenchmarkResult]
+    """
+    stages = with_dependencies(stages)
+    results = []
+    for size in sizes:
+        corpus = build_corpus(source, size, corpus_path(work_dir, size, seed), seed)
+        export_dir = os.path.join(work_dir, f"export-{size}")
+        collection = create_benchmark_collection(client, collection_name) if IMPORT in stages else None
+        runs = {
+            LOAD: lambda: bench_load(corpus),
+            IMPORT: lambda: bench_import(collection, corpus, import_config),
+            AGGREGATE: lambda: bench_aggregate(collection, repeats),
+            EXPORT: lambda: bench_export(collection, export_dir, partitions),
+            ANALYSIS: lambda: bench_analysis(export_dir, os.path.join(work_dir, f"analysis-{size}")),
+        }
+        try:
+            for stage in stages:
+                result = measure(stage, size, runs[stage])
+                results.append(result)
+                report(format_result(result))
+        finally:
+            if collection is not None and not keep:
+                client.collections.delete(collection_name)
+    return results
+
+
+def _git_commit():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def write_results(results, path=DEFAULT_RESULTS_PATH, **metadata):
+    """
+    Append one run (environment, settings and every result) as a JSON line to `path`.
+
+    Returns:
+        dict: The run record
+    """
+    run = {
+        "finished": datetime.now(timezone.utc).isoformat(),
+        "commit": _git_commit(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpus": os.cpu_count(),
+        "max_rss_mb": _mb(peak_rss()),
+        **metadata,
+        "results": [asdict(r) for r in results],
+    }
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    with open(path, "a", encoding="utf-8") as f:
+        f.write(json.dumps(run) + "\n")
+    return run
+
+
+def load_runs(path=DEFAULT_RESULTS_PATH):
+    if not os.path.exists(path):
+        return []
+    with open(path, "r", encoding="utf-8") as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def compare(previous, results, threshold=0.2):
+    """
+    Stages whose throughput dropped by more than `threshold` against a previous run.
+
+    Args:
+        previous (dict): A run record from `load_runs`
+        results (list[BenchmarkResult]): The current results
+
+    Returns:
+        list[dict]: stage, size, previous and current throughput, relative change
+    """
+    before = {(r["stage"], r["size"]): r["throughput"] for r in previous["results"]}
+    regressions = []
+    for result in results:
+        old = before.get((result.stage, result.size))
+        if not old or result.throughput is None:
+            continue
+        change = result.throughput / old - 1
+        if change < -threshold:
+            regressions.append({
+                "stage": result.stage,
+                "size": result.size,
+                "previous": old,
+                "current": result.throughput,
+                "change": change,
+            })
+    return regressions
+
+
+def _ms(seconds):
+    return "-" if seconds is None else f"{seconds * 1000:.2f}"
+
+
+def format_result(result):
+    latency = result.latency or {}
+    return (
+        f"{result.stage:<10} {result.size:>8} {result.items:>8} {result.seconds:>9.2f}s "
+        f"{result.throughput or 0:>11.1f}/s  p50 {_ms(latency.get('p50'))} p95 {_ms(latency.get('p95'))} "
+        f"p99 {_ms(latency.get('p99'))} ms  peak {result.peak_rss_mb or 0:.0f} MB"
+    )
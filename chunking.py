@@ -0,0 +1,157 @@
+import re
+from dataclasses import dataclass
+
+MAX_CHUNK_TOKENS = 512
+# Token budget of the truncated `conversation` view given to the Transformation Agent (see `approximate_tokens`)
+MAX_VIEW_TOKENS = 5000
+VIEW_SEPARATOR = "\n\n...\n\n"
+
+# Each post in a thread starts with "[username (2024-07-18T05:06:53.683Z)]: "
+POST_HEADER = re.compile(r"^\[[^\]\n]+ \(\d{4}-\d\d-\d\dT[^)\n]*\)\]: ", re.MULTILINE)
+# Coarsest first: paragraphs, lines, sentences, words
+_SEPARATORS = ["\n\n", "\n", ". ", " "]
+_TOKEN = re.compile(r"\w+|[^\w\s]")
+
+
+def approximate_tokens(text):
+    """Dependency-free token estimate: words and punctuation marks, close to BPE counts for forum text."""
+    return len(_TOKEN.findall(text))
+
+
+def tiktoken_counter(encoding="cl100k_base"):
+    """Exact token counter from `tiktoken` (optional dependency)."""
+    try:
+        import tiktoken
+    except ImportError as e:
+        raise ImportError("tiktoken_counter requires `pip install tiktoken`") from e
+    encoder = tiktoken.get_encoding(encoding)
+
+    def count(text):
+        return len(encoder.encode(text, disallowed_special=()))
+    return count
+
+
+TOKEN_COUNTERS = {
+    "approximate": lambda: approximate_tokens,
+    "tiktoken": tiktoken_counter,
+}
+
+
+def get_token_counter(name="approximate"):
+    if name not in TOKEN_COUNTERS:
+        raise ValueError(f"Unknown token counter '{name}', expected one of {list(TOKEN_COUNTERS)}")
+    return TOKEN_COUNTERS[name]()
+
+
+@dataclass
+class Chunk:
+    index: int
+    text: str
+    tokens: int
+    # Character offsets into the conversation, and the posts (0-based) the chunk covers
+    start: int
+    end: int
+    first_post: int
+    last_post: int
+
+
+def post_spans(conversation):
+    """(start, end) character offsets of each post in a thread; text before the first header is its own post."""
+    starts = [m.start() for m in POST_HEADER.finditer(conversation)]
+    if not starts or starts[0] != 0:
+        starts.insert(0, 0)
+    return list(zip(starts, starts[1:] + [len(conversation)]))
+
+
+def _split_span(text, start, end, max_tokens, count_tokens, level=0):
+    """Split text[start:end] at the coarsest separator that yields pieces within `max_tokens`."""
+    if count_tokens(text[start:end]) <= max_tokens:
+        return [(start, end)]
+    if level == len(_SEPARATORS):
+        # A single "word" over budget (e.g. a base64 blob): cut it by characters
+        step = max(1, max_tokens * 2)
+        return [(i, min(i + step, end)) for i in range(start, end, step)]
+
+    separator = _SEPARATORS[level]
+    cuts = [start]
+    i = text.find(separator, start, end)
+    while i != -1:
+        cuts.append(i + len(separator))
+        i = text.find(separator, i + len(separator), end)
+    cuts.append(end)
+
+    spans, current, current_tokens = [], None, 0
+    for a, b in zip(cuts, cuts[1:]):
+        if a == b:
+            continue
+        tokens = count_tokens(text[a:b])
+        if tokens > max_tokens:
+            if current:
+                spans.append(current)
+                current, current_tokens = None, 0
+            spans.extend(_split_span(text, a, b, max_tokens, count_tokens, level + 1))
+        elif current and current_tokens + tokens <= max_tokens:
+            current, current_tokens = (current[0], b), current_tokens + tokens
+        else:
+            if current:
+                spans.append(current)
+            current, current_tokens = (a, b), tokens
+    if current:
+        spans.append(current)
+    return spans
+
+
+def chunk_conversation(conversation, max_tokens=MAX_CHUNK_TOKENS, count_tokens=approximate_tokens):
+    """
+    Split a thread into chunks of at most `max_tokens`, respecting post boundaries.
+
+    Whole posts are packed together while they fit. A post over budget is split at
+    paragraph, then line, sentence and word boundaries. Chunks are contiguous and
+    non-overlapping, so joining their texts gives back the conversation.
+
+    Returns:
+        list[Chunk]
+    """
+    pieces = []  # (start, end, post index, tokens)
+    for post, (start, end) in enumerate(post_spans(conversation)):
+        for a, b in _split_span(conversation, start, end, max_tokens, count_tokens):
+            pieces.append((a, b, post, count_tokens(conversation[a:b])))
+
+    chunks = []
+    for a, b, post, tokens in pieces:
+        last = chunks[-1] if chunks else None
+        if last is not None and last.tokens + tokens <= max_tokens:
+            last.end, last.tokens, last.last_post = b, last.tokens + tokens, post
+        else:
+            chunks.append(Chunk(len(chunks), "", tokens, a, b, post, post))
+    for chunk in chunks:
+        chunk.text = conversation[chunk.start:chunk.end]
+    return chunks
+
+
+def conversation_view(conversation, chunks=None, max_tokens=MAX_VIEW_TOKENS, count_tokens=approximate_tokens):
+    """
+    Bounded view of a thread: its leading and trailing chunks within `max_tokens`.
+
+    Threads within budget are returned unchanged (the same string). Longer ones keep about
+    half the budget from each end, cut at chunk boundaries, joined by `VIEW_SEPARATOR`.
+    """
+    # Every token is at least one character, so short threads need no counting
+    if len(conversation) <= max_tokens:
+        return conversation
+    if chunks is None:
+        chunks = chunk_conversation(conversation, count_tokens=count_tokens)
+    if sum(c.tokens for c in chunks) <= max_tokens:
+        return conversation
+
+    head, budget = 0, max_tokens // 2
+    while head < len(chunks) and chunks[head].tokens <= budget:
+        budget -= chunks[head].tokens
+        head += 1
+    tail, budget = len(chunks), max_tokens - max_tokens // 2
+    while tail > head and chunks[tail - 1].tokens <= budget:
+        budget -= chunks[tail - 1].tokens
+        tail -= 1
+    head_end = chunks[head - 1].end if head else 0
+    tail_start = chunks[tail].start if tail < len(chunks) else len(conversation)
+    return conversation[:head_end] + VIEW_SEPARATOR + conversation[tail_start:]
@@ -0,0 +1,137 @@
+import json
+import os
+from array import array
+
+import numpy as np
+
+from helpers import ANALYSIS_PROPERTIES, CATEGORY_DICTS
+
+DEFAULT_SNAPSHOT_PATH = "data/.cache/analysis_snapshot.npz"
+_NULL = -1
+
+
+class _ColumnBuilder:
+    """Dictionary-encodes one column as it streams in."""
+
+    def __init__(self, known=None):
+        self.dictionary = list(known or [])
+        self.n_known = len(self.dictionary)
+        self.lookup = {value: code for code, value in enumerate(self.dictionary)}
+        self.codes = array("h")
+
+    def append(self, value):
+        if value is None:
+            self.codes.append(_NULL)
+            return
+        code = self.lookup.get(value)
+        if code is None:
+            code = self.lookup[value] = len(self.dictionary)
+            self.dictionary.append(value)
+        self.codes.append(code)
+
+    def finish(self):
+        codes = np.frombuffer(self.codes, dtype=np.int16).copy()
+        if self.n_known:
+            # Known categories keep their helpers.py order; unexpected values follow
+            return codes, self.dictionary, self.n_known
+        # Without a category dict, sort the dictionary so output is deterministic
+        order = sorted(range(len(self.dictionary)), key=lambda i: (str(type(self.dictionary[i])), self.dictionary[i]))
+        remap = np.empty(len(order) + 1, dtype=np.int16)
+        remap[-1] = _NULL
+        remap[np.array(order, dtype=np.int64)] = np.arange(len(order), dtype=np.int16)
+        return remap[codes], [self.dictionary[i] for i in order], len(order)
+
+
+class ColumnarSnapshot:
+    """
+    Dictionary-encoded, in-memory copy of the enriched properties, for local aggregation.
+
+    Every column is an `int16` array of codes into a per-column dictionary (`-1` for null).
+    Categorical columns use the category dicts in `helpers.py` as their dictionary, with any
+    unexpected values appended after the `n_known[prop]` valid ones.
+    """
+
+    def __init__(self, columns, dictionaries, n_known):
+        self.columns = columns
+        self.dictionaries = dictionaries
+        self.n_known = n_known
+
+    def __len__(self):
+        return len(next(iter(self.columns.values()))) if self.columns else 0
+
+    @classmethod
+    def from_records(cls, records, properties=ANALYSIS_PROPERTIES):
+        builders = {p: _ColumnBuilder(CATEGORY_DICTS.get(p)) for p in properties}
+        for record in records:
+            for p, builder in builders.items():
+                builder.append(record.get(p))
+        columns, dictionaries, n_known = {}, {}, {}
+        for p, builder in builders.items():
+            columns[p], dictionaries[p], n_known[p] = builder.finish()
+        return cls(columns, dictionaries, n_known)
+
+    @classmethod
+    def from_collection(cls, collection, properties=ANALYSIS_PROPERTIES):
+        """Pull `properties` for every object in one pass of the collection iterator."""
+        return cls.from_records(
+            (o.properties for o in collection.iterator(return_properties=list(properties))),
+            properties,
+        )
+
+    def save(self, path=DEFAULT_SNAPSHOT_PATH):
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        meta = {"dictionaries": self.dictionaries, "n_known": self.n_known}
+        np.savez_compressed(path, __meta__=np.array(json.dumps(meta)), **self.columns)
+
+    @classmethod
+    def load(cls, path=DEFAULT_SNAPSHOT_PATH):
+        with np.load(path) as data:
+            meta = json.loads(str(data["__meta__"]))
+            columns = {name: data[name] for name in data.files if name != "__meta__"}
+        return cls(columns, meta["dictionaries"], meta["n_known"])
+
+    def mask(self, where=None):
+        """
+        Boolean row mask for `where`, a dict of property -> value (or list of values), ANDed together.
+        """
+        result = np.ones(len(self), dtype=bool)
+        for prop, wanted in (where or {}).items():
+            values = wanted if isinstance(wanted, (list, tuple, set)) else [wanted]
+            lookup = {v: i for i, v in enumerate(self.dictionaries[prop])}
+            codes = [lookup[v] for v in values if v in lookup]
+            result &= np.isin(self.columns[prop], codes)
+        return result
+
+    def group_by(self, prop, where=None):
+        """
+        Count objects per value of `prop`, like `aggregate.over_all(group_by=...)`.
+
+        Returns:
+            list[tuple]: (value, count) pairs for non-null values, most frequent first
+        """
+        codes = self.columns[prop]
+        if where:
+            codes = codes[self.mask(where)]
+        counts = np.bincount(codes[codes != _NULL], minlength=len(self.dictionaries[prop]))
+        order = np.argsort(-counts, kind="stable")
+        return [(self.dictionaries[prop][i], int(counts[i])) for i in order if counts[i]]
+
+    def crosstab(self, row_prop, col_prop, where=None):
+        """
+        Counts for every (row value, column value) combination.
+
+        Returns:
+            tuple: (row values, column values, 2-D `int64` array of counts)
+        """
+        rows, cols = self.columns[row_prop], self.columns[col_prop]
+        keep = (rows != _NULL) & (cols != _NULL)
+        if where:
+            keep &= self.mask(where)
+        n_rows, n_cols = len(self.dictionaries[row_prop]), len(self.dictionaries[col_prop])
+        flat = rows[keep].astype(np.int64) * n_cols + cols[keep]
+        matrix = np.bincount(flat, minlength=n_rows * n_cols).reshape(n_rows, n_cols)
+        return self.dictionaries[row_prop], self.dictionaries[col_prop], matrix
+
+    def invalid_count(self, prop):
+        """Number of non-null values outside the known categories of `prop`."""
+        return int(np.count_nonzero(self.columns[prop] >= self.n_known[prop]))
@@ -0,0 +1,198 @@
+import asyncio
+import importlib
+import os
+import threading
+import weakref
+from contextlib import asynccontextmanager, contextmanager
+from dataclasses import dataclass, field
+
+from dotenv import load_dotenv
+
+CLOUD = "cloud"
+LOCAL = "local"
+STUB = "stub"
+MODES = [CLOUD, LOCAL, STUB]
+
+
+@dataclass
+class ConnectionSettings:
+    """
+    Where and how to connect. `from_env` reads these from the environment (and `.env`).
+
+    Modes:
+        cloud: Weaviate Cloud at `url` with `api_key` (`WEAVIATE_URL`, `WEAVIATE_API_KEY`)
+        local: A local container at `host`:`port` / `grpc_port`
+        stub: Calls `stub` ("module:attribute") with the settings to build a client-like object
+    """
+
+    mode: str = CLOUD
+    url: str | None = None
+    api_key: str | None = None
+    host: str = "localhost"
+    port: int = 8080
+    grpc_port: int = 50051
+    stub: str | None = None
+    headers: dict = field(default_factory=dict)
+    # Seconds
+    init_timeout: float = 10
+    query_timeout: float = 60
+    insert_timeout: float = 120
+    # HTTP keep-alive pool
+    pool_connections: int = 20
+    pool_maxsize: int = 100
+    pool_max_retries: int = 3
+    pool_timeout: int = 5
+
+    @classmethod
+    def from_env(cls, **overrides):
+        load_dotenv()
+        env = os.environ
+        headers = {}
+        if env.get("ANTHROPIC_API_KEY"):
+            headers["X-Anthropic-Api-Key"] = env["ANTHROPIC_API_KEY"]
+        settings = cls(
+            mode=env.get("WEAVIATE_MODE", CLOUD),
+            url=env.get("WEAVIATE_URL"),
+            api_key=env.get("WEAVIATE_API_KEY"),
+            host=env.get("WEAVIATE_HOST", "localhost"),
+            port=int(env.get("WEAVIATE_HTTP_PORT", 8080)),
+            grpc_port=int(env.get("WEAVIATE_GRPC_PORT", 50051)),
+            stub=env.get("WEAVIATE_STUB"),
+            headers=headers,
+            init_timeout=float(env.get("WEAVIATE_INIT_TIMEOUT", 10)),
+            query_timeout=float(env.get("WEAVIATE_QUERY_TIMEOUT", 60)),
+            insert_timeout=float(env.get("WEAVIATE_INSERT_TIMEOUT", 120)),
+        )
+        for key, value in overrides.items():
+            if value is not None:
+                setattr(settings, key, value)
+        if settings.mode not in MODES:
+            raise ValueError(f"Unknown connection mode '{settings.mode}', expected one of {MODES}")
+        return settings
+
+    def additional_config(self):
+        from weaviate.classes.init import AdditionalConfig, Timeout
+        from weaviate.config import ConnectionConfig
+
+        return AdditionalConfig(
+            timeout=Timeout(init=self.init_timeout, query=self.query_timeout, insert=self.insert_timeout),
+            connection=ConnectionConfig(
+                session_pool_connections=self.pool_connections,
+                session_pool_maxsize=self.pool_maxsize,
+                session_pool_max_retries=self.pool_max_retries,
+                session_pool_timeout=self.pool_timeout,
+            ),
+        )
+
+    def _client_kwargs(self):
+        from weaviate.classes.init import Auth
+
+        kwargs = {"headers": self.headers or None, "additional_config": self.additional_config()}
+        if self.mode == CLOUD:
+            if not self.url:
+                raise ValueError("WEAVIATE_URL is not set; set it in the environment or .env, or use WEAVIATE_MODE=local")
+            kwargs.update(cluster_url=self.url, auth_credentials=Auth.api_key(self.api_key) if self.api_key else None)
+        else:
+            kwargs.update(
+                host=self.host,
+                port=self.port,
+                grpc_port=self.grpc_port,
+                auth_credentials=Auth.api_key(self.api_key) if self.api_key else None,
+            )
+        return kwargs
+
+
+def _load_stub(settings):
+    if not settings.stub:
+        raise ValueError("WEAVIATE_MODE=stub needs WEAVIATE_STUB='module:attribute'")
+    module_name, _, attribute = settings.stub.partition(":")
+    return getattr(importlib.import_module(module_name), attribute)(settings)
+
+
+def connect(settings=None):
+    """
+    Open a new, unshared sync client. Prefer `shared_client` unless the client must be private.
+
+    The Weaviate client library is imported here rather than with this module, so scripts
+    that never open a client (help, local-only modes, stubs) skip its ~1 s import.
+    """
+    settings = settings or ConnectionSettings.from_env()
+    if settings.mode == STUB:
+        return _load_stub(settings)
+    import weaviate
+
+    if settings.mode == CLOUD:
+        return weaviate.connect_to_weaviate_cloud(**settings._client_kwargs())
+    return weaviate.connect_to_local(**settings._client_kwargs())
+
+
+async def connect_async(settings=None):
+    """Open a new, unshared async client."""
+    settings = settings or ConnectionSettings.from_env()
+    if settings.mode == STUB:
+        return _load_stub(settings)
+    import weaviate
+
+    if settings.mode == CLOUD:
+        client = weaviate.use_async_with_weaviate_cloud(**settings._client_kwargs())
+    else:
+        client = weaviate.use_async_with_local(**settings._client_kwargs())
+    await client.connect()
+    return client
+
+
+_lock = threading.Lock()
+_shared = {"client": None, "refs": 0}
+_shared_async = weakref.WeakKeyDictionary()
+
+
+@contextmanager
+def shared_client(settings=None):
+    """
+    Context-managed sync client shared by everything in the process.
+
+    The first caller connects; nested or later callers reuse the same warm client while any
+    caller still holds it, and the last one out closes it. Holding an outer `shared_client()`
+    around several pipeline stages therefore costs a single connection. `settings` only
+    apply when this call is the one that connects.
+
+        with shared_client() as client:
+            posts = client.collections.get(COLLECTION_NAME)
+    """
+    with _lock:
+        if _shared["client"] is None:
+            _shared["client"] = connect(settings)
+        _shared["refs"] += 1
+        client = _shared["client"]
+    try:
+        yield client
+    finally:
+        with _lock:
+            _shared["refs"] -= 1
+            if _shared["refs"] == 0:
+                _shared["client"] = None
+                client.close()
+
+
+@asynccontextmanager
+async def shared_async_client(settings=None):
+    """Async counterpart of `shared_client`, shared within the running event loop."""
+    loop = asyncio.get_running_loop()
+    entry = _shared_async.get(loop)
+    if entry is None:
+        entry = _shared_async[loop] = {"client": None, "refs": 0, "lock": asyncio.Lock()}
+    async with entry["lock"]:
+        if entry["client"] is None:
+            entry["client"] = await connect_async(settings)
+        entry["refs"] += 1
+        client = entry["client"]
+    try:
+        yield client
+    finally:
+        async with entry["lock"]:
+            entry["refs"] -= 1
+            if entry["refs"] == 0:
+                entry["client"] = None
+                result = client.close()
+                if asyncio.iscoroutine(result):
+                    await result
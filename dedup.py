@@ -0,0 +1,321 @@
+import json
+import os
+import re
+import zlib
+from collections import defaultdict
+from dataclasses import dataclass, field
+from datetime import datetime, timezone
+
+import numpy as np
+
+import instrumentation
+
+DEFAULT_SOURCE = "data/simplified_posts.json"
+DEFAULT_MAPPING_PATH = "data/canonical_topics.json"
+DEFAULT_THRESHOLD = 0.8
+
+_TOKEN = re.compile(r"\w+")
+# '[username (2024-07-18T05:06:53.683Z)]:' headers differ between reposts of the same question
+_POST_HEADER = re.compile(r"\[[^\]\n]*\(\d{4}-\d\d-\d\dT[^)\n]*\)\]:")
+_MASK = np.uint64(0xFFFFFFFF)
+_SHIFT = np.uint64(32)
+
+
+def thread_text(record):
+    """Title and conversation of a raw record, without per-post author/timestamp headers."""
+    return f"{record.get('title') or ''}\n{_POST_HEADER.sub(' ', record.get('conversation') or '')}"
+
+
+class _TokenIds(dict):
+    def __missing__(self, token):
+        token_id = self[token] = zlib.crc32(token.encode("utf-8"))
+        return token_id
+
+
+class ShingleHasher:
+    """
+    Word `size`-shingles of a text as a set of 32-bit hashes.
+
+    Tokens get a stable CRC32 id (memoized, the memo is cleared past `max_vocabulary` entries to
+    bound memory), and shingle hashes are rolled from the ids in NumPy.
+    """
+
+    def __init__(self, size=5, max_vocabulary=1_000_000):
+        self.size = size
+        self.max_vocabulary = max_vocabulary
+        self._ids = _TokenIds()
+
+    def _token_ids(self, tokens):
+        if len(self._ids) > self.max_vocabulary:
+            self._ids.clear()
+        return np.fromiter(map(self._ids.__getitem__, tokens), dtype=np.uint64, count=len(tokens))
+
+    def __call__(self, text):
+        ids = self._token_ids(_TOKEN.findall(text.lower()))
+        if len(ids) < self.size:
+            return np.unique(ids) if len(ids) else np.zeros(1, dtype=np.uint64)
+        hashes = np.zeros(len(ids) - self.size + 1, dtype=np.uint64)
+        for offset in range(self.size):
+            hashes = (hashes * np.uint64(1000003) + ids[offset:len(ids) - self.size + 1 + offset]) & _MASK
+        return np.unique(hashes)
+
+
+class MinHasher:
+    """
+    `num_perm` MinHash values of a hash set.
+
+    Uses multiply-shift hashing, (a * h + b) mod 2**64 >> 32 with odd random 64-bit `a`: a
+    universal family that needs no modulo, so it runs at NumPy's uint64 multiply speed.
+    """
+
+    def __init__(self, num_perm=128, seed=0, chunk_size=2048):
+        rng = np.random.default_rng(seed)
+        self.num_perm = num_perm
+        self.chunk_size = chunk_size
+        self._a = rng.integers(0, np.iinfo(np.uint64).max, size=(num_perm, 1), dtype=np.uint64, endpoint=True) | np.uint64(1)
+        self._b = rng.integers(0, np.iinfo(np.uint64).max, size=(num_perm, 1), dtype=np.uint64, endpoint=True)
+
+    def __call__(self, hashes):
+        signature = np.full(self.num_perm, np.iinfo(np.uint32).max, dtype=np.uint64)
+        # In chunks, so a very long thread needs at most num_perm * chunk_size values at once
+        for start in range(0, len(hashes), self.chunk_size):
+            chunk = hashes[None, start:start + self.chunk_size]
+            np.minimum(signature, ((self._a * chunk + self._b) >> _SHIFT).min(axis=1), out=signature)
+        return signature.astype(np.uint32)
+
+
+def lsh_params(threshold, num_perm):
+    """
+    Bands and rows per band (bands * rows == num_perm) whose S-curve threshold (1/bands)^(1/rows)
+    is closest to, but not above, `threshold`, so few true duplicates are missed.
+    """
+    best = (num_perm, 1)
+    for rows in range(1, num_perm + 1):
+        if num_perm % rows:
+            continue
+        bands = num_perm // rows
+        if (1 / bands) ** (1 / rows) <= threshold:
+            best = (bands, rows)
+    return best
+
+
+class LSHIndex:
+    """
+    Banded locality-sensitive hashing over MinHash signatures.
+
+    Each signature is split into `bands` bands of `rows` values; documents sharing any band
+    are candidates. Buckets keep at most `max_bucket` members, which bounds the work on
+    degenerate buckets (e.g. empty threads) to a constant per document.
+    """
+
+    def __init__(self, bands, rows, max_bucket=64):
+        self.bands = bands
+        self.rows = rows
+        self.max_bucket = max_bucket
+        self._buckets = [defaultdict(list) for _ in range(bands)]
+
+    def add(self, doc, signature):
+        """Index `doc` and return the earlier documents sharing a band with it."""
+        candidates = set()
+        for band, buckets in enumerate(self._buckets):
+            key = signature[band * self.rows:(band + 1) * self.rows].tobytes()
+            members = buckets[key]
+            candidates.update(members)
+            if len(members) < self.max_bucket:
+                members.append(doc)
+        return candidates
+
+
+class UnionFind:
+    def __init__(self):
+        self.parent = {}
+
+    def find(self, x):
+        root = self.parent.setdefault(x, x)
+        while self.parent[root] != root:
+            root = self.parent[root]
+        while x != root:
+            self.parent[x], x = root, self.parent[x]
+        return root
+
+    def union(self, a, b):
+        self.parent[self.find(a)] = self.find(b)
+
+    def groups(self):
+        groups = defaultdict(list)
+        for x in self.parent:
+            groups[self.find(x)].append(x)
+        return [members for members in groups.values() if len(members) > 1]
+
+
+@dataclass
+class DedupResult:
+    """Duplicate clusters of a corpus, each with one canonical thread."""
+
+    threads: int = 0
+    # Each cluster's topic_ids, canonical first
+    clusters: list = field(default_factory=list)
+    # duplicate topic_id -> (canonical topic_id, similarity to it, 'minhash' or 'vector')
+    duplicates: dict = field(default_factory=dict)
+    params: dict = field(default_factory=dict)
+
+    @property
+    def duplicate_rate(self):
+        return len(self.duplicates) / self.threads if self.threads else 0.0
+
+    def mapping(self):
+        """duplicate topic_id -> canonical topic_id"""
+        return {dup: canonical for dup, (canonical, _, _) in self.duplicates.items()}
+
+
+def _canonical_key(meta):
+    # Prefer a thread with an accepted answer, then the earliest, then the lowest topic_id
+    has_answer, date_created, topic_id = meta
+    return (not has_answer, date_created or "~", topic_id)
+
+
+class DuplicateFinder:
+    """
+    Streaming near-duplicate detection: one pass, one MinHash signature per thread.
+
+    Memory grows with the number of threads (signature plus a few fields each), not with
+    their text. Candidate pairs from LSH are confirmed by their estimated Jaccard
+    similarity, and confirmed pairs are merged into clusters with union-find.
+    """
+
+    def __init__(self, threshold=DEFAULT_THRESHOLD, num_perm=128, shingle_size=5, seed=0, max_bucket=64):
+        self.threshold = threshold
+        self.bands, self.rows = lsh_params(threshold, num_perm)
+        self.shingles = ShingleHasher(shingle_size)
+        self.minhash = MinHasher(num_perm, seed)
+        self.index = LSHIndex(self.bands, self.rows, max_bucket)
+        self.params = {
+            "threshold": threshold, "num_perm": num_perm, "shingle_size": shingle_size,
+            "bands": self.bands, "rows": self.rows, "seed": seed,
+        }
+        self.signatures = np.empty((1024, num_perm), dtype=np.uint32)
+        self.topic_ids = []
+        self.meta = []
+        self.pairs = UnionFind()
+        self.similarity = {}
+        self._docs = None
+        self._vector_pairs = set()
+
+    def add(self, record):
+        doc = len(self.topic_ids)
+        if doc == len(self.signatures):
+            self.signatures = np.concatenate([self.signatures, np.empty_like(self.signatures)])
+        signature = self.minhash(self.shingles(thread_text(record)))
+        self.signatures[doc] = signature
+        topic_id = int(record["topic_id"])
+        self.topic_ids.append(topic_id)
+        self.meta.append((bool(record.get("has_accepted_answer")), record.get("date_created"), topic_id))
+
+        candidates = self.index.add(doc, signature)
+        if candidates:
+            candidates = np.fromiter(candidates, dtype=np.int64, count=len(candidates))
+            estimates = (self.signatures[candidates] == signature).mean(axis=1)
+            for other, estimate in zip(candidates[estimates >= self.threshold], estimates[estimates >= self.threshold]):
+                self.pairs.union(doc, int(other))
+                self.similarity[(int(other), doc)] = float(estimate)
+
+    def add_pair(self, topic_a, topic_b, similarity):
+        """Merge two threads found by other means (e.g. vector similarity)."""
+        docs = self._docs_by_topic()
+        if topic_a in docs and topic_b in docs and topic_a != topic_b:
+            a, b = sorted((docs[topic_a], docs[topic_b]))
+            self.pairs.union(a, b)
+            self.similarity.setdefault((a, b), float(similarity))
+            self._vector_pairs.add((a, b))
+
+    def _docs_by_topic(self):
+        if self._docs is None or len(self._docs) != len(self.topic_ids):
+            self._docs = {t: i for i, t in enumerate(self.topic_ids)}
+        return self._docs
+
+    def result(self):
+        result = DedupResult(threads=len(self.topic_ids), params=self.params)
+        for members in self.pairs.groups():
+            members.sort(key=lambda d: _canonical_key(self.meta[d]))
+            canonical = members[0]
+            result.clusters.append([self.topic_ids[d] for d in members])
+            for d in members[1:]:
+                a, b = sorted((canonical, d))
+                estimate = float((self.signatures[canonical] == self.signatures[d]).mean())
+                method = "vector" if (a, b) in self._vector_pairs and estimate < self.threshold else "minhash"
+                similarity = self.similarity.get((a, b), estimate) if method == "vector" else estimate
+                result.duplicates[self.topic_ids[d]] = (self.topic_ids[canonical], similarity, method)
+        result.clusters.sort(key=lambda c: (-len(c), c[0]))
+        return result
+
+
+def find_duplicates(records, threshold=DEFAULT_THRESHOLD, num_perm=128, shingle_size=5, seed=0, finder=None):
+    """
+    Returns:
+        DuplicateFinder: With every record added; call `.result()` (after any `add_vector_pairs`)
+    """
+    finder = finder or DuplicateFinder(threshold, num_perm, shingle_size, seed)
+    n = 0
+    with instrumentation.span("dedup.minhash") as minhash_span:
+        for record in records:
+            finder.add(record)
+            n += 1
+        minhash_span.set(threads=n)
+    return finder
+
+
+def add_vector_pairs(finder, store, vector_name="default", threshold=0.95, k=5, index=None, n_probe=8):
+    """
+    Also merge threads whose vectors in a `vector_store.VectorStore` have cosine similarity >= `threshold`.
+
+    Catches reposts that are reworded too much for shingles to match. Threads missing from the
+    store (e.g. not imported yet) only take part through MinHash.
+
+    Returns:
+        int: Pairs found
+    """
+    found = 0
+    with instrumentation.span("dedup.vectors", vector=vector_name):
+        rows, scores = store.neighbors(vector_name, np.arange(len(store)), k=k, index=index, n_probe=n_probe)
+        for row, (neighbor_rows, neighbor_scores) in enumerate(zip(rows, scores)):
+            for other, score in zip(neighbor_rows, neighbor_scores):
+                if other > row and score >= threshold:
+                    finder.add_pair(int(store.topic_ids[row]), int(store.topic_ids[other]), score)
+                    found += 1
+    return found
+
+
+def write_mapping(result, path=DEFAULT_MAPPING_PATH, source=None):
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    payload = {
+        "created": datetime.now(timezone.utc).isoformat(),
+        "source": source,
+        "params": result.params,
+        "threads": result.threads,
+        "clusters": len(result.clusters),
+        "duplicates": {
+            str(dup): {"canonical": canonical, "similarity": round(similarity, 4), "method": method}
+            for dup, (canonical, similarity, method) in sorted(result.duplicates.items())
+        },
+    }
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(payload, f, indent=2)
+    return payload
+
+
+def load_mapping(path=DEFAULT_MAPPING_PATH):
+    """
+    Returns:
+        dict: duplicate topic_id -> canonical topic_id
+    """
+    with open(path, "r", encoding="utf-8") as f:
+        payload = json.load(f)
+    return {int(dup): entry["canonical"] for dup, entry in payload["duplicates"].items()}
+
+
+def canonical_uuids(mapping):
+    """The topic_id mapping as object UUIDs, as `10_populate_weaviate.py` generates them."""
+    from weaviate.util import generate_uuid5
+
+    return {str(generate_uuid5(dup)): str(generate_uuid5(canonical)) for dup, canonical in mapping.items()}
+
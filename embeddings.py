@@ -0,0 +1,190 @@
+import hashlib
+import math
+import os
+import re
+import sqlite3
+import threading
+from array import array
+
+DEFAULT_CACHE_PATH = "data/.cache/embeddings.sqlite"
+
+
+class HashingEmbedder:
+    """
+    Deterministic, dependency-free embedder based on feature hashing of word unigrams and bigrams.
+
+    Not a semantic model, but stable across runs and machines, so the client-side
+    vectorization path (cache, import, queries) can be exercised offline.
+    """
+
+    _token_pattern = re.compile(r"\w+")
+
+    def __init__(self, dimensions=256):
+        self.dimensions = dimensions
+        self.model = f"local-hashing-{dimensions}"
+
+    def embed(self, texts):
+        return [self._embed_one(text) for text in texts]
+
+    def _embed_one(self, text):
+        vector = [0.0] * self.dimensions
+        tokens = self._token_pattern.findall(text.lower())
+        features = tokens + [a + " " + b for a, b in zip(tokens, tokens[1:])]
+        for feature in features:
+            digest = hashlib.blake2b(feature.encode("utf-8"), digest_size=8).digest()
+            bucket = int.from_bytes(digest[:4], "little") % self.dimensions
+            sign = 1.0 if digest[4] & 1 else -1.0
+            vector[bucket] += sign
+        norm = math.sqrt(sum(v * v for v in vector)) or 1.0
+        return [v / norm for v in vector]
+
+
+class SentenceTransformerEmbedder:
+    """Embedder backed by a local `sentence-transformers` model (optional dependency)."""
+
+    def __init__(self, model_name="all-MiniLM-L6-v2", batch_size=32):
+        try:
+            from sentence_transformers import SentenceTransformer
+        except ImportError as e:
+            raise ImportError(
+                "SentenceTransformerEmbedder requires `pip install sentence-transformers`"
+            ) from e
+        self.model = f"sentence-transformers/{model_name}"
+        self.batch_size = batch_size
+        self._model = SentenceTransformer(model_name)
+
+    def embed(self, texts):
+        vectors = self._model.encode(
+            list(texts), batch_size=self.batch_size, normalize_embeddings=True
+        )
+        return [v.tolist() for v in vectors]
+
+
+EMBEDDERS = {
+    "local": HashingEmbedder,
+    "sentence-transformers": SentenceTransformerEmbedder,
+}
+
+
+def get_embedder(name, model=None):
+    """
+    Build an embedder by name.
+
+    Args:
+        name (str): One of `EMBEDDERS`
+        model (str | None): Model name / dimensionality, passed to the embedder
+
+    Returns:
+        An object with a `model` attribute and an `embed(texts) -> list[list[float]]` method
+    """
+    if name not in EMBEDDERS:
+        raise ValueError(f"Unknown embedder '{name}', expected one of {sorted(EMBEDDERS)}")
+    if model is None:
+        return EMBEDDERS[name]()
+    if name == "local":
+        return HashingEmbedder(dimensions=int(model))
+    return EMBEDDERS[name](model)
+
+
+def source_text(row, source_properties):
+    """Text a named vector is computed from: its source property values, in order."""
+    return "\n".join(str(row.get(p) or "") for p in source_properties)
+
+
+class EmbeddingCache:
+    """
+    On-disk vector cache keyed by (model, source properties, content hash).
+
+    Backed by SQLite so lookups stay cheap and memory use stays flat for large corpora.
+    """
+
+    def __init__(self, path=DEFAULT_CACHE_PATH):
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self.path = path
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._lock = threading.Lock()
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS vectors (
+                model TEXT NOT NULL,
+                source TEXT NOT NULL,
+                digest TEXT NOT NULL,
+                vector BLOB NOT NULL,
+                PRIMARY KEY (model, source, digest)
+            )
+            """
+        )
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def key(model, source_properties, text):
+        digest = hashlib.sha256(text.encode("utf-8")).hexdigest()
+        return model, ",".join(source_properties), digest
+
+    def get(self, key):
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT vector FROM vectors WHERE model = ? AND source = ? AND digest = ?", key
+            ).fetchone()
+        if row is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return array("f", row[0]).tolist()
+
+    def put_many(self, items):
+        rows = [(*key, array("f", vector).tobytes()) for key, vector in items]
+        with self._lock, self._conn:
+            self._conn.executemany("INSERT OR REPLACE INTO vectors VALUES (?, ?, ?, ?)", rows)
+
+    def close(self):
+        self._conn.close()
+
+
+class CachedVectorizer:
+    """
+    Computes named vectors for rows client-side, reusing cached vectors for unchanged text.
+
+    Args:
+        embedder: See `get_embedder`
+        named_vectors (dict[str, list[str]]): Named vector -> source properties
+        cache (EmbeddingCache)
+    """
+
+    def __init__(self, embedder, named_vectors, cache):
+        self.embedder = embedder
+        self.named_vectors = named_vectors
+        self.cache = cache
+
+    def vectorize(self, rows):
+        """
+        Args:
+            rows (list[dict]): Normalized objects
+
+        Returns:
+            list[dict[str, list[float]]]: One `{vector name: vector}` dict per row
+        """
+        results = [{} for _ in rows]
+        missing = {}  # cache key -> (text, [(row index, vector name), ...])
+        for i, row in enumerate(rows):
+            for name, source_properties in self.named_vectors.items():
+                text = source_text(row, source_properties)
+                key = EmbeddingCache.key(self.embedder.model, source_properties, text)
+                if key in missing:
+                    missing[key][1].append((i, name))
+                    continue
+                vector = self.cache.get(key)
+                if vector is None:
+                    missing[key] = (text, [(i, name)])
+                else:
+                    results[i][name] = vector
+
+        if missing:
+            keys = list(missing)
+            vectors = self.embedder.embed([missing[k][0] for k in keys])
+            self.cache.put_many(zip(keys, vectors))
+            for key, vector in zip(keys, vectors):
+                for i, name in missing[key][1]:
+                    results[i][name] = vector
+        return results
@@ -0,0 +1,477 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+
+from import_engine import BatchImporter, ImportConfig
+
+DEFAULT_CACHE_PATH = "data/.cache/enrichment.sqlite"
+FAILED_STATES = {"failed", "error", "cancelled", "canceled"}
+_FETCH_CHUNK = 100
+
+
+def _data_type_name(data_type):
+    return str(getattr(data_type, "value", data_type))
+
+
+def operation_fingerprint(operation):
+    """Hash of everything about an `append_property` operation that affects its output."""
+    payload = json.dumps(
+        [
+            operation.property_name,
+            _data_type_name(operation.data_type),
+            list(operation.view_properties),
+            operation.instruction,
+        ]
+    )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def input_hash(operation, properties, fingerprint=None):
+    """
+    Hash of the inputs one operation sees for one object.
+
+    Args:
+        operation: A TransformationAgent `append_property` operation
+        properties (dict): The object's properties (at least `operation.view_properties`)
+        fingerprint (str | None): Precomputed `operation_fingerprint(operation)`
+
+    Returns:
+        str: Hex SHA-256 digest
+    """
+    fingerprint = fingerprint or operation_fingerprint(operation)
+    values = [properties.get(p) for p in operation.view_properties]
+    payload = json.dumps([fingerprint, values], ensure_ascii=False, default=str)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class EnrichmentCache:
+    """SQLite store of generated values, keyed by (property name, input hash)."""
+
+    def __init__(self, path=DEFAULT_CACHE_PATH):
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._lock = threading.Lock()
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS results (
+                property_name TEXT NOT NULL,
+                input_hash TEXT NOT NULL,
+                value TEXT NOT NULL,
+                PRIMARY KEY (property_name, input_hash)
+            )
+            """
+        )
+
+    def get_many(self, property_name, hashes):
+        found = {}
+        hashes = list(hashes)
+        for i in range(0, len(hashes), 500):
+            chunk = hashes[i:i + 500]
+            placeholders = ",".join("?" * len(chunk))
+            with self._lock:
+                rows = self._conn.execute(
+                    f"SELECT input_hash, value FROM results WHERE property_name = ? AND input_hash IN ({placeholders})",
+                    [property_name, *chunk],
+                ).fetchall()
+            found.update((h, json.loads(v)) for h, v in rows)
+        return found
+
+    def put_many(self, property_name, items):
+        rows = [(property_name, h, json.dumps(v)) for h, v in items]
+        with self._lock, self._conn:
+            self._conn.executemany("INSERT OR REPLACE INTO results VALUES (?, ?, ?)", rows)
+
+    def delete_many(self, property_name, hashes):
+        rows = [(property_name, h) for h in hashes]
+        with self._lock, self._conn:
+            self._conn.executemany("DELETE FROM results WHERE property_name = ? AND input_hash = ?", rows)
+
+    def close(self):
+        self._conn.close()
+
+
+@dataclass
+class DeltaPlan:
+    """What an incremental enrichment run has to do, per operation."""
+
+    # (property name, uuid) -> input hash, for every object and operation
+    input_hashes: dict = field(default_factory=dict)
+    # property name -> set of uuids whose inputs have no cached result
+    pending: dict = field(default_factory=dict)
+    # uuid -> {property name: cached value} where the stored value is missing or stale
+    writeback: dict = field(default_factory=dict)
+    # Near-duplicates (canonical_topic_id set on import): uuid -> canonical uuid; they copy its results
+    linked: dict = field(default_factory=dict)
+    # uuid -> {property name: stored value} of the linked objects
+    linked_values: dict = field(default_factory=dict)
+    unchanged: int = 0
+
+    @property
+    def pending_uuids(self):
+        return set().union(*self.pending.values()) if self.pending else set()
+
+    def summary(self):
+        return {
+            "pending": {name: len(uuids) for name, uuids in self.pending.items()},
+            "from_cache": sum(len(v) for v in self.writeback.values()),
+            "unchanged": self.unchanged,
+            "linked": len(self.linked),
+        }
+
+
+def plan_delta(collection, operations, cache, trust_existing=False, force=False):
+    """
+    Work out, per object and operation, whether an LLM call is needed.
+
+    Only hashes are kept in memory, not the (potentially large) view properties. Objects
+    imported as near-duplicates (`canonical_topic_id`, see `05_dedup_posts.py`) whose canonical
+    thread is in the collection need none: they are linked and copy its results instead.
+
+    Args:
+        collection: Source collection
+        operations (list): `append_property` operations
+        cache (EnrichmentCache)
+        trust_existing (bool): Seed the cache from values already stored on objects
+            that have no cache entry, instead of regenerating them. Use once, right
+            after a full `update_all()` run with the same operations.
+        force (bool): Ignore the cache and mark every object as pending
+
+    Returns:
+        DeltaPlan
+    """
+    from weaviate.util import generate_uuid5
+
+    fingerprints = {op.property_name: operation_fingerprint(op) for op in operations}
+    view_properties = sorted({p for op in operations for p in op.view_properties})
+    # Properties that have never been generated do not exist in the schema yet
+    existing = {p.name for p in collection.config.get().properties}
+    target_properties = [op.property_name for op in operations if op.property_name in existing]
+    link_properties = ["canonical_topic_id"] if "canonical_topic_id" in existing else []
+
+    plan = DeltaPlan(pending={op.property_name: set() for op in operations})
+    current = {}
+    links = {}
+    for o in collection.iterator(return_properties=view_properties + target_properties + link_properties):
+        obj_uuid = str(o.uuid)
+        if o.properties.get("canonical_topic_id") is not None:
+            links[obj_uuid] = str(generate_uuid5(o.properties["canonical_topic_id"]))
+        for op in operations:
+            plan.input_hashes[(op.property_name, obj_uuid)] = input_hash(
+                op, o.properties, fingerprints[op.property_name]
+            )
+            current[(op.property_name, obj_uuid)] = o.properties.get(op.property_name)
+
+    # A duplicate whose canonical thread is missing (or itself a duplicate) is enriched as usual
+    seen = {obj_uuid for _, obj_uuid in current}
+    plan.linked = {u: c for u, c in links.items() if c in seen and c not in links}
+    for obj_uuid in plan.linked:
+        plan.linked_values[obj_uuid] = {op.property_name: current[(op.property_name, obj_uuid)] for op in operations}
+
+    for op in operations:
+        name = op.property_name
+        keys = [k for k in plan.input_hashes if k[0] == name and k[1] not in plan.linked]
+        cached = {} if force else cache.get_many(name, {plan.input_hashes[k] for k in keys})
+        seeds = []
+        for key in keys:
+            obj_uuid = key[1]
+            digest = plan.input_hashes[key]
+            value = current[key]
+            if digest in cached:
+                if value == cached[digest]:
+                    plan.unchanged += 1
+                else:
+                    plan.writeback.setdefault(obj_uuid, {})[name] = cached[digest]
+            elif trust_existing and not force and value is not None:
+                seeds.append((digest, value))
+                plan.unchanged += 1
+            else:
+                plan.pending[name].add(obj_uuid)
+        if seeds:
+            cache.put_many(name, seeds)
+
+    plan.pending = {name: uuids for name, uuids in plan.pending.items() if uuids}
+    return plan
+
+
+def link_duplicates(collection, operations, plan, max_workers=8):
+    """
+    Copy each linked duplicate's canonical results onto it, where they differ from what it has.
+
+    Run after the canonical objects are enriched.
+
+    Returns:
+        int: Number of duplicates updated
+    """
+    from weaviate.classes.query import Filter
+
+    names = [op.property_name for op in operations]
+    canonicals = sorted(set(plan.linked.values()))
+    results = {}
+    for i in range(0, len(canonicals), _FETCH_CHUNK):
+        chunk = canonicals[i:i + _FETCH_CHUNK]
+        response = collection.query.fetch_objects(
+            filters=Filter.by_id().contains_any(chunk), return_properties=names, limit=len(chunk)
+        )
+        results.update((str(o.uuid), o.properties) for o in response.objects)
+
+    updates = {}
+    for obj_uuid, canonical_uuid in plan.linked.items():
+        stored = plan.linked_values.get(obj_uuid, {})
+        values = {
+            name: value for name, value in results.get(canonical_uuid, {}).items()
+            if value is not None and stored.get(name) != value
+        }
+        if values:
+            updates[obj_uuid] = values
+    write_back(collection, updates, max_workers=max_workers)
+    return len(updates)
+
+
+def ensure_properties(collection, operations):
+    """
+    Add the properties of `operations` that the collection's schema does not have yet, with their data types.
+
+    Values written back onto a missing property would otherwise rely on auto-schema, which
+    infers NUMBER for the INT ratings and is disabled on some clusters.
+
+    Returns:
+        list[str]: Names of the added properties
+    """
+    from weaviate.classes.config import Property
+
+    existing = {p.name for p in collection.config.get().properties}
+    added = []
+    for op in operations:
+        if op.property_name not in existing and op.property_name not in added:
+            collection.config.add_property(Property(name=op.property_name, data_type=op.data_type))
+            added.append(op.property_name)
+    return added
+
+
+def write_back(collection, updates, max_workers=8):
+    """
+    Write property values onto existing objects without replacing them.
+
+    Args:
+        collection: Target collection
+        updates (dict): uuid -> {property name: value}
+        max_workers (int): Concurrent update requests
+    """
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        list(executor.map(
+            lambda item: collection.data.update(uuid=item[0], properties=item[1]),
+            updates.items(),
+        ))
+
+
+def create_staging_collection(client, name, view_properties):
+    """
+    (Re)create an unvectorized collection that holds only the view properties of a subset of objects.
+
+    The TransformationAgent works on whole collections, so this is how a subset is targeted.
+    """
+    from weaviate.classes.config import Configure, DataType, Property
+
+    if client.collections.exists(name):
+        client.collections.delete(name)
+    client.collections.create(
+        name,
+        description="Temporary staging collection for incremental Transformation Agent runs.",
+        properties=[Property(name=p, data_type=DataType.TEXT) for p in view_properties],
+        vectorizer_config=Configure.Vectorizer.none(),
+    )
+    return client.collections.get(name)
+
+
+def stage_objects(source, staging, uuids, view_properties):
+    """Copy the view properties of `uuids` from `source` into `staging`, keeping their UUIDs."""
+    from weaviate.classes.query import Filter
+
+    uuids = sorted(uuids)
+    with BatchImporter(staging, ImportConfig(report_every=float("inf")), report=lambda _: None) as importer:
+        for i in range(0, len(uuids), _FETCH_CHUNK):
+            chunk = uuids[i:i + _FETCH_CHUNK]
+            response = source.query.fetch_objects(
+                filters=Filter.by_id().contains_any(chunk),
+                return_properties=view_properties,
+                limit=len(chunk),
+            )
+            for o in response.objects:
+                importer.add_object(properties=o.properties, uuid=o.uuid)
+    if importer.failed_objects:
+        raise RuntimeError(f"Failed to stage {len(importer.failed_objects)} objects: {importer.failed_objects[:3]}")
+
+
+def harvest(staging, source, operations, plan, cache):
+    """
+    Copy generated values from `staging` back onto `source`, and record them in the cache.
+
+    Args:
+        plan (DeltaPlan | None): The plan the objects were staged for; without one (a resumed
+            workflow), input hashes are computed from the staged view properties
+
+    Returns:
+        int: Number of objects updated on `source`
+    """
+    from label_validation import LabelValidator
+
+    names = [op.property_name for op in operations]
+    fingerprints = {op.property_name: operation_fingerprint(op) for op in operations}
+    view_properties = [] if plan is not None else sorted({p for op in operations for p in op.view_properties})
+    validator = LabelValidator()
+    updates = {}
+    cached = {name: [] for name in names}
+    for o in staging.iterator(return_properties=names + view_properties):
+        obj_uuid = str(o.uuid)
+        # Near-miss labels ('Queries', '3/5') are repaired before they are stored or cached
+        values = {name: validator.clean(name, o.properties.get(name)) for name in names}
+        values = {name: value for name, value in values.items() if value is not None}
+        for op in operations:
+            name = op.property_name
+            if name not in values:
+                continue
+            if plan is not None:
+                digest = plan.input_hashes.get((name, obj_uuid))
+            else:
+                digest = input_hash(op, o.properties, fingerprints[name])
+            if digest is not None:
+                cached[name].append((digest, values[name]))
+        if values:
+            updates[obj_uuid] = values
+    ensure_properties(source, operations)
+    write_back(source, updates)
+    for name, items in cached.items():
+        cache.put_many(name, items)
+    return len(updates)
+
+
+def seed_cache(collection, operations, cache):
+    """Record the values currently stored in `collection` as the results for their current inputs."""
+    fingerprints = {op.property_name: operation_fingerprint(op) for op in operations}
+    existing = {p.name for p in collection.config.get().properties}
+    return_properties = sorted(
+        {p for op in operations for p in op.view_properties} | (set(fingerprints) & existing)
+    )
+    values = {name: [] for name in fingerprints}
+    for o in collection.iterator(return_properties=return_properties):
+        for op in operations:
+            value = o.properties.get(op.property_name)
+            if value is not None:
+                digest = input_hash(op, o.properties, fingerprints[op.property_name])
+                values[op.property_name].append((digest, value))
+    for name, items in values.items():
+        cache.put_many(name, items)
+
+
+def wait_for_workflow(agent, workflow_id, poll_interval=10):
+    """Block until a TransformationAgent workflow is no longer running, and return its final status."""
+    while True:
+        status = agent.get_status(workflow_id=workflow_id)
+        if status["status"]["state"] != "running":
+            return status
+        time.sleep(poll_interval)
+
+
+def transformation_agent(client, collection, operations):
+    """
+    A TransformationAgent for `collection` of `client`.
+
+    In-process clients (`fake_weaviate.FakeClient`) provide a stub agent, so enrichment can run offline.
+    """
+    factory = getattr(client, "transformation_agent", None)
+    if factory is not None:
+        return factory(collection=collection, operations=operations)
+    from weaviate.agents.transformation import TransformationAgent
+
+    return TransformationAgent(client=client, collection=collection, operations=operations)
+
+
+def enrich_subset(client, source, operations, uuids, plan, cache, staging_name, wait=wait_for_workflow, on_submit=None,
+                  on_release=None, workflow_id=None):
+    """
+    Run `operations` over the objects `uuids` of `source` through a staging collection.
+
+    Once the agent accepted the job, the staging collection is only deleted after its results
+    are harvested or the workflow failed, so a driver that stops while waiting leaves it for
+    `harvest` to pick up on resume.
+
+    Args:
+        workflow_id (str | None): A workflow already submitted on `staging_name` by an earlier
+            attempt whose wait failed; it is waited for again instead of staging and submitting anew
+        on_submit (callable | None): Called with the workflow ID once the agent accepted the job
+        on_release (callable | None): Called with the workflow ID once its staging collection is deleted
+
+    Returns:
+        tuple: (final workflow status, number of objects updated on `source`)
+    """
+    view_properties = sorted({p for op in operations for p in op.view_properties})
+    agent = transformation_agent(client, staging_name, operations)
+    if workflow_id is not None:
+        staging = client.collections.get(staging_name)
+        keep = True
+    else:
+        staging = create_staging_collection(client, staging_name, view_properties)
+        keep = False
+    try:
+        if workflow_id is None:
+            stage_objects(source, staging, uuids, view_properties)
+            workflow_id = agent.update_all().workflow_id
+            keep = True
+            if on_submit is not None:
+                on_submit(workflow_id)
+        status = wait(agent, workflow_id)
+        if status["status"]["state"] in FAILED_STATES:
+            keep = False
+            raise RuntimeError(f"Workflow {workflow_id} ended in state '{status['status']['state']}'")
+        updated = harvest(staging, source, operations, plan, cache)
+        keep = False
+        return status, updated
+    finally:
+        if not keep:
+            client.collections.delete(staging_name)
+            if workflow_id is not None and on_release is not None:
+                on_release(workflow_id)
+
+
+def run_delta(client, collection_name, operations, cache, trust_existing=False, wait=wait_for_workflow, staging_name=None,
+              on_release=None):
+    """
+    Enrich only what changed since the last run.
+
+    Cached results are written back directly. Objects whose inputs have no cached
+    result are copied into a staging collection, enriched there by the
+    TransformationAgent with only the operations that have pending objects, and the
+    results copied back and cached.
+
+    Returns:
+        dict: Summary of the plan, plus the final workflow status if one ran
+    """
+    source = client.collections.get(collection_name)
+    plan = plan_delta(source, operations, cache, trust_existing=trust_existing)
+    summary = plan.summary()
+    ensure_properties(source, operations)
+
+    if plan.writeback:
+        write_back(source, plan.writeback)
+
+    pending_ops = [op for op in operations if op.property_name in plan.pending]
+    if pending_ops:
+        summary["status"], summary["enriched"] = enrich_subset(
+            client,
+            source,
+            pending_ops,
+            plan.pending_uuids,
+            plan,
+            cache,
+            staging_name or f"{collection_name}Delta",
+            wait=wait,
+            on_release=on_release,
+        )
+    if plan.linked:
+        summary["linked_updated"] = link_duplicates(source, operations, plan)
+    return summary
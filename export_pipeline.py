@@ -0,0 +1,318 @@
+import contextvars
+import glob
+import json
+import os
+import shutil
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta, timezone
+
+import instrumentation
+from helpers import CATEGORY_DICTS, EXPORT_PROPERTIES
+
+DEFAULT_EXPORT_DIR = "data/transformed_data"
+CHECKPOINT_FILE = "_checkpoint.json"
+STATE_FILE = "_export_state.json"
+# Subtracted from the scan start when it becomes the high-water mark, for clock differences with the server
+CLOCK_SKEW = timedelta(seconds=60)
+
+
+def column_types():
+    """Arrow types of the exported properties; anything not listed is exported as a string."""
+    import pyarrow as pa
+
+    category_type = pa.dictionary(pa.int32(), pa.string())
+    return {
+        "uuid": pa.string(),
+        "title": pa.string(),
+        "date_created": pa.timestamp("us", tz="UTC"),
+        "has_accepted_answer": pa.bool_(),
+        "topic_id": pa.int64(),
+        "technicalComplexity": pa.int64(),
+        "causedByOutdatedStack": pa.bool_(),
+        "isDocumentationGap": pa.bool_(),
+        "summary": pa.string(),
+        **{prop: category_type for prop in CATEGORY_DICTS},
+    }
+
+
+def export_schema(properties=EXPORT_PROPERTIES):
+    import pyarrow as pa
+
+    types = column_types()
+    return pa.schema([("uuid", pa.string())] + [(p, types.get(p, pa.string())) for p in properties])
+
+
+def to_table(rows, schema):
+    """Build a typed Arrow table from a list of property dicts (plus `uuid`)."""
+    import pyarrow as pa
+
+    arrays = []
+    for field in schema:
+        values = [row.get(field.name) for row in rows]
+        if pa.types.is_dictionary(field.type):
+            arrays.append(pa.array(values, type=pa.string()).dictionary_encode())
+        else:
+            arrays.append(pa.array(values, type=field.type))
+    return pa.Table.from_arrays(arrays, schema=schema)
+
+
+def uuid_partitions(n):
+    """
+    Split the UUID space into `n` contiguous ranges.
+
+    Returns:
+        list[tuple]: (lower, upper) bounds as UUID strings, `None` for open ends
+    """
+    bounds = [None] + [f"{i * 16 ** 8 // n:08x}-0000-0000-0000-000000000000" for i in range(1, n)] + [None]
+    return list(zip(bounds[:-1], bounds[1:]))
+
+
+def _tmp_path(path):
+    # A leading underscore hides partial files from pd.read_parquet(output_dir) until they are renamed
+    directory, name = os.path.split(path)
+    return os.path.join(directory, f"_{name}.tmp")
+
+
+def _scan_start():
+    return (datetime.now(timezone.utc) - CLOCK_SKEW).isoformat()
+
+
+class ExportCheckpoint:
+    """
+    Per-partition cursor (last exported UUID), chunk count and row count, stored next to the output.
+
+    Also records when the export first started, which stays the same across resumes.
+    """
+
+    def __init__(self, output_dir, partitions):
+        self.path = os.path.join(output_dir, CHECKPOINT_FILE)
+        self._lock = threading.Lock()
+        self.state = {"partitions": partitions, "parts": {}, "started": _scan_start()}
+        if os.path.exists(self.path):
+            with open(self.path, "r", encoding="utf-8") as f:
+                self.state = json.load(f)
+        if self.state["partitions"] != partitions:
+            raise ValueError(
+                f"Checkpoint in {output_dir} was written with {self.state['partitions']} partitions; "
+                f"resume with the same number or start over"
+            )
+
+    def get(self, partition):
+        return self.state["parts"].get(str(partition), {"cursor": None, "chunks": 0, "rows": 0, "done": False})
+
+    def update(self, partition, **values):
+        with self._lock:
+            self.state["parts"][str(partition)] = {**self.get(partition), **values}
+            tmp_path = self.path + ".tmp"
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(self.state, f, indent=2)
+            os.replace(tmp_path, self.path)
+
+
+def _write_chunk(rows, schema, output_dir, partition, chunk):
+    import pyarrow.parquet as pq
+
+    path = os.path.join(output_dir, f"part-{partition:03d}-{chunk:05d}.parquet")
+    tmp_path = _tmp_path(path)
+    with instrumentation.span("export.write_chunk", partition=partition, rows=len(rows)):
+        pq.write_table(to_table(rows, schema), tmp_path, compression="zstd")
+        os.replace(tmp_path, path)
+
+
+def export_partition(collection, partition, bounds, schema, output_dir, checkpoint, chunk_size=5000):
+    """
+    Stream one UUID range of the collection into Parquet files of at most `chunk_size` rows.
+
+    Resumes after the checkpointed cursor, so a chunk is never written twice.
+    """
+    state = checkpoint.get(partition)
+    if state["done"]:
+        return state["rows"]
+    lower, upper = bounds
+    cursor = state["cursor"] or lower
+    chunk, total = state["chunks"], state["rows"]
+    properties = [f.name for f in schema if f.name != "uuid"]
+
+    rows = []
+    last_uuid = cursor
+    objects = collection.iterator(return_properties=properties, after=cursor)
+    # Time spent waiting on iterator pages, separate from writing
+    for o in instrumentation.timed(objects, "export.iterator"):
+        obj_uuid = str(o.uuid)
+        if upper is not None and obj_uuid >= upper:
+            break
+        rows.append({"uuid": obj_uuid, **o.properties})
+        last_uuid = obj_uuid
+        if len(rows) >= chunk_size:
+            _write_chunk(rows, schema, output_dir, partition, chunk)
+            chunk, total = chunk + 1, total + len(rows)
+            checkpoint.update(partition, cursor=last_uuid, chunks=chunk, rows=total)
+            rows = []
+
+    if rows:
+        _write_chunk(rows, schema, output_dir, partition, chunk)
+        chunk, total = chunk + 1, total + len(rows)
+    checkpoint.update(partition, cursor=last_uuid, chunks=chunk, rows=total, done=True)
+    return total
+
+
+def export_parquet(
+    collection,
+    output_dir=DEFAULT_EXPORT_DIR,
+    properties=EXPORT_PROPERTIES,
+    partitions=4,
+    chunk_size=5000,
+    resume=False,
+):
+    """
+    Export the collection to a directory of typed Parquet files, in bounded memory.
+
+    The UUID space is split into `partitions` ranges that are scanned in parallel. Each scan
+    flushes every `chunk_size` objects and checkpoints its cursor, so an interrupted export
+    continues where it stopped when `resume=True`. Read the result with
+    `pd.read_parquet(output_dir)`.
+
+    Returns:
+        int: Number of exported objects
+    """
+    if not resume and os.path.exists(output_dir):
+        shutil.rmtree(output_dir)
+    os.makedirs(output_dir, exist_ok=True)
+
+    checkpoint = ExportCheckpoint(output_dir, partitions)
+    for stale in glob.glob(os.path.join(output_dir, "*.tmp")):
+        os.remove(stale)
+
+    schema = export_schema(properties)
+    context = contextvars.copy_context()
+    with ThreadPoolExecutor(max_workers=partitions) as executor:
+        total = sum(executor.map(
+            lambda item: context.copy().run(
+                export_partition, collection, item[0], item[1], schema, output_dir, checkpoint, chunk_size
+            ),
+            enumerate(uuid_partitions(partitions)),
+        ))
+
+    # Objects updated after the scan started may have been read before the update, so the
+    # next incremental export starts from there (the newest update seen could be past them)
+    _save_state(output_dir, high_water_mark=checkpoint.state.get("started") or _scan_start())
+    return total
+
+
+def _load_state(output_dir):
+    path = os.path.join(output_dir, STATE_FILE)
+    if not os.path.exists(path):
+        return {}
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def _save_state(output_dir, **values):
+    path = os.path.join(output_dir, STATE_FILE)
+    state = {**_load_state(output_dir), **values}
+    with open(path + ".tmp", "w", encoding="utf-8") as f:
+        json.dump(state, f, indent=2)
+    os.replace(path + ".tmp", path)
+
+
+def fetch_changed_since(collection, since, properties, page_size=1000):
+    """
+    Yield objects created or updated at or after `since`, oldest first.
+
+    Pages are ordered by (update time, UUID). Objects sharing the boundary timestamp of
+    the previous page are skipped with an offset, so no object is returned twice.
+    Objects last updated exactly at `since` were part of the previous export and are skipped.
+    Needs `index_timestamps=True` on the collection.
+    """
+    from weaviate.classes.query import Filter, MetadataQuery, Sort
+
+    cursor_time, seen_at_cursor = since, 0
+    while True:
+        if cursor_time == since:
+            filters = Filter.by_update_time().greater_than(cursor_time)
+        else:
+            filters = Filter.by_update_time().greater_or_equal(cursor_time)
+        with instrumentation.span("export.fetch_page", offset=seen_at_cursor):
+            response = collection.query.fetch_objects(
+                filters=filters,
+                sort=Sort.by_update_time(ascending=True).by_id(ascending=True),
+                limit=page_size,
+                offset=seen_at_cursor,
+                return_properties=properties,
+                return_metadata=MetadataQuery(last_update_time=True),
+            )
+        if not response.objects:
+            return
+        for o in response.objects:
+            updated = o.metadata.last_update_time
+            if updated == cursor_time and cursor_time != since:
+                seen_at_cursor += 1
+            else:
+                cursor_time, seen_at_cursor = updated, 1
+            yield o
+        if len(response.objects) < page_size:
+            return
+
+
+def _remove_uuids(path, uuids):
+    """Rewrite a Parquet file without the rows whose `uuid` is in `uuids`. Returns rows removed."""
+    import pyarrow.compute as pc
+    import pyarrow.parquet as pq
+
+    ids = pq.read_table(path, columns=["uuid"]).column("uuid")
+    drop = pc.is_in(ids, value_set=uuids)
+    removed = pc.sum(drop).as_py() or 0
+    if removed:
+        table = pq.read_table(path).filter(pc.invert(drop))
+        pq.write_table(table, _tmp_path(path), compression="zstd")
+        os.replace(_tmp_path(path), path)
+    return removed
+
+
+def export_incremental(collection, output_dir=DEFAULT_EXPORT_DIR, properties=EXPORT_PROPERTIES, chunk_size=5000):
+    """
+    Refresh a Parquet snapshot written by `export_parquet` with only what changed since the last export.
+
+    Objects created or updated since the recorded high-water mark are written as new
+    `delta-*` files, and their old rows are dropped from the existing files (only files
+    that contain them are rewritten). Deleted objects are not detected; run a full
+    export now and then to drop them.
+
+    Returns:
+        int: Number of changed objects merged into the snapshot
+    """
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    mark = _load_state(output_dir).get("high_water_mark")
+    if mark is None:
+        return export_parquet(collection, output_dir, properties)
+
+    schema = export_schema(properties)
+    stamp = datetime.now(timezone.utc).strftime("%Y%m%dT%H%M%S")
+    high_water_mark = _scan_start()
+    written, changed, rows = [], [], []
+
+    def flush():
+        path = os.path.join(output_dir, f"delta-{stamp}-{len(written):05d}.parquet")
+        pq.write_table(to_table(rows, schema), _tmp_path(path), compression="zstd")
+        os.replace(_tmp_path(path), path)
+        written.append(path)
+
+    for o in fetch_changed_since(collection, datetime.fromisoformat(mark), list(properties)):
+        rows.append({"uuid": str(o.uuid), **o.properties})
+        changed.append(str(o.uuid))
+        if len(rows) >= chunk_size:
+            flush()
+            rows = []
+    if rows:
+        flush()
+
+    if changed:
+        value_set = pa.array(changed, type=pa.string())
+        for path in sorted(glob.glob(os.path.join(output_dir, "*.parquet"))):
+            if path not in written:
+                _remove_uuids(path, value_set)
+    _save_state(output_dir, high_water_mark=high_water_mark)
+    return len(changed)
@@ -0,0 +1,439 @@
+import bisect
+import fnmatch
+import re
+import threading
+import zlib
+import time
+import uuid as uuid_lib
+from datetime import datetime, timezone
+from types import SimpleNamespace
+
+from weaviate.collections.classes.aggregate import AggregateGroup, AggregateGroupByReturn, AggregateReturn, GroupedBy
+from weaviate.collections.classes.batch import BatchObjectReturn, DeleteManyReturn
+from weaviate.collections.classes.filters import _Operator
+from weaviate.collections.classes.internal import MetadataReturn, Object, QueryReturn
+
+_ID = "_id"
+_CREATION_TIME = "_creationTimeUnix"
+_UPDATE_TIME = "_lastUpdateTimeUnix"
+
+
+class _Record:
+    __slots__ = ("uuid", "properties", "vector", "references", "created", "updated")
+
+    def __init__(self, obj_uuid, properties, vector, references, created):
+        self.uuid = obj_uuid
+        self.properties = properties
+        self.vector = vector
+        self.references = references
+        self.created = created
+        self.updated = created
+
+
+def _now():
+    return datetime.now(timezone.utc)
+
+
+def _as_uuid(value):
+    return value if isinstance(value, uuid_lib.UUID) else uuid_lib.UUID(str(value))
+
+
+def _field(record, target):
+    if target == _ID:
+        return str(record.uuid)
+    if target == _CREATION_TIME:
+        return record.created
+    if target == _UPDATE_TIME:
+        return record.updated
+    if isinstance(target, str):
+        return record.properties.get(target)
+    raise NotImplementedError(f"Filters on {target!r} are not supported by the fake client")
+
+
+def _comparable(value):
+    if isinstance(value, uuid_lib.UUID):
+        return str(value)
+    if isinstance(value, datetime) and value.tzinfo is None:
+        return value.replace(tzinfo=timezone.utc)
+    return value
+
+
+def matches(filters, record):
+    """Evaluate a v4 filter (`Filter.by_property(...)`, `by_id`, `by_update_time`, `&`, `|`) on a record."""
+    if filters is None:
+        return True
+    operator = filters.operator
+    if operator == _Operator.AND:
+        return all(matches(f, record) for f in filters.filters)
+    if operator == _Operator.OR:
+        return any(matches(f, record) for f in filters.filters)
+
+    actual = _comparable(_field(record, filters.target))
+    wanted = filters.value
+    if operator == _Operator.IS_NULL:
+        return (actual is None) == bool(wanted)
+    if operator in (_Operator.CONTAINS_ANY, _Operator.CONTAINS_ALL):
+        wanted = {_comparable(v) for v in wanted}
+        present = set(actual) if isinstance(actual, (list, tuple)) else {actual}
+        return bool(present & wanted) if operator == _Operator.CONTAINS_ANY else wanted <= present
+    if actual is None:
+        return False
+    wanted = _comparable(wanted)
+    if operator == _Operator.EQUAL:
+        return actual == wanted
+    if operator == _Operator.NOT_EQUAL:
+        return actual != wanted
+    if operator == _Operator.LIKE:
+        return fnmatch.fnmatchcase(str(actual), str(wanted))
+    if operator == _Operator.LESS_THAN:
+        return actual < wanted
+    if operator == _Operator.LESS_THAN_EQUAL:
+        return actual <= wanted
+    if operator == _Operator.GREATER_THAN:
+        return actual > wanted
+    if operator == _Operator.GREATER_THAN_EQUAL:
+        return actual >= wanted
+    raise NotImplementedError(f"Operator {operator} is not supported by the fake client")
+
+
+class FakeCollection:
+    """One collection of a `FakeClient`: data, query, aggregate and iterator over an in-memory dict."""
+
+    def __init__(self, name, properties=None):
+        self.name = name
+        self._records = {}
+        self._lock = threading.Lock()
+        self._order = None  # sorted UUID strings, rebuilt after writes
+        self._properties = [SimpleNamespace(name=p.name) for p in properties or []]
+        self.data = _Data(self)
+        self.query = _Query(self)
+        self.aggregate = _Aggregate(self)
+        self.config = SimpleNamespace(
+            get=lambda: SimpleNamespace(name=self.name, properties=self._property_list()),
+            add_property=self._add_property,
+        )
+
+    def __len__(self):
+        return len(self._records)
+
+    def _add_property(self, prop):
+        with self._lock:
+            if any(p.name == prop.name for p in self._properties):
+                raise ValueError(f"Property '{prop.name}' already exists in {self.name}")
+            self._properties.append(SimpleNamespace(name=prop.name, data_type=prop.dataType))
+
+    def _property_list(self):
+        names = {p.name for p in self._properties}
+        with self._lock:
+            for record in self._records.values():
+                for name in record.properties.keys() - names:
+                    names.add(name)
+                    self._properties.append(SimpleNamespace(name=name))
+        return list(self._properties)
+
+    def _snapshot(self, filters=None):
+        with self._lock:
+            records = list(self._records.values())
+        return [r for r in records if matches(filters, r)]
+
+    def _to_object(self, record, return_properties=None, include_vector=False):
+        properties = record.properties
+        if return_properties is not None:
+            properties = {p: properties[p] for p in return_properties if p in properties}
+        return Object(
+            uuid=record.uuid,
+            metadata=MetadataReturn(creation_time=record.created, last_update_time=record.updated),
+            properties=dict(properties),
+            references=None,
+            vector=dict(record.vector or {}) if include_vector else {},
+            collection=self.name,
+        )
+
+    def _write(self, apply):
+        with self._lock:
+            apply(self._records)
+            self._order = None
+
+    def iterator(self, include_vector=False, return_properties=None, return_metadata=None, after=None, cache_size=None):
+        """Objects in UUID order, resuming after `after`, like the real cursor API."""
+        cursor = str(after) if after is not None else ""
+        while True:
+            with self._lock:
+                if self._order is None:
+                    self._order = sorted(str(k) for k in self._records)
+                start = bisect.bisect_right(self._order, cursor)
+                keys = self._order[start:start + (cache_size or 1000)]
+                page = [self._records.get(uuid_lib.UUID(k)) for k in keys]
+            if not keys:
+                return
+            for record in page:
+                if record is not None:
+                    yield self._to_object(record, return_properties, include_vector)
+            cursor = keys[-1]
+
+
+class _Data:
+    def __init__(self, collection):
+        self._collection = collection
+
+    def _put(self, properties, obj_uuid=None, vector=None, references=None):
+        obj_uuid = _as_uuid(obj_uuid) if obj_uuid is not None else uuid_lib.uuid4()
+        if vector is not None and not isinstance(vector, dict):
+            vector = {"default": vector}
+        record = _Record(obj_uuid, dict(properties), vector, references, _now())
+        self._collection._write(lambda records: records.__setitem__(obj_uuid, record))
+        return obj_uuid
+
+    def insert(self, properties, uuid=None, vector=None, references=None):
+        return self._put(properties, uuid, vector, references)
+
+    def insert_many(self, objects):
+        start = time.perf_counter()
+        uuids = {i: self._put(o.properties, o.uuid, o.vector, o.references) for i, o in enumerate(objects)}
+        return BatchObjectReturn(
+            _all_responses=list(uuids.values()),
+            elapsed_seconds=time.perf_counter() - start,
+            uuids=uuids,
+        )
+
+    def update(self, uuid, properties=None, vector=None, references=None):
+        with self._collection._lock:
+            record = self._collection._records[_as_uuid(uuid)]
+            record.properties.update(properties or {})
+            if vector is not None:
+                record.vector = vector if isinstance(vector, dict) else {"default": vector}
+            record.updated = _now()
+
+    def replace(self, uuid, properties, vector=None, references=None):
+        self._put(properties, uuid, vector, references)
+
+    def exists(self, uuid):
+        return _as_uuid(uuid) in self._collection._records
+
+    def delete_by_id(self, uuid):
+        existed = self.exists(uuid)
+        self._collection._write(lambda records: records.pop(_as_uuid(uuid), None))
+        return existed
+
+    def delete_many(self, where, verbose=False, dry_run=False):
+        doomed = [r.uuid for r in self._collection._snapshot(where)]
+        if not dry_run:
+            def apply(records):
+                for obj_uuid in doomed:
+                    records.pop(obj_uuid, None)
+            self._collection._write(apply)
+        return DeleteManyReturn(failed=0, matches=len(doomed), objects=None, successful=len(doomed))
+
+
+class _Query:
+    def __init__(self, collection):
+        self._collection = collection
+
+    def fetch_objects(
+        self,
+        limit=None,
+        offset=None,
+        after=None,
+        filters=None,
+        sort=None,
+        include_vector=False,
+        return_metadata=None,
+        return_properties=None,
+        **kwargs,
+    ):
+        records = self._collection._snapshot(filters)
+        records.sort(key=lambda r: str(r.uuid))
+        if after is not None:
+            records = [r for r in records if str(r.uuid) > str(after)]
+        # Stable sorts applied last-key-first give a multi-key sort
+        for s in reversed(getattr(sort, "sorts", None) or ([sort] if sort is not None else [])):
+            present = [r for r in records if _field(r, s.prop) is not None]
+            missing = [r for r in records if _field(r, s.prop) is None]
+            present.sort(key=lambda r: _comparable(_field(r, s.prop)), reverse=not s.ascending)
+            records = present + missing
+        records = records[offset or 0:]
+        if limit is not None:
+            records = records[:limit]
+        return QueryReturn(
+            objects=[self._collection._to_object(r, return_properties, include_vector) for r in records]
+        )
+
+    def fetch_object_by_id(self, uuid, include_vector=False, return_properties=None, **kwargs):
+        record = self._collection._records.get(_as_uuid(uuid))
+        return None if record is None else self._collection._to_object(record, return_properties, include_vector)
+
+
+class _Aggregate:
+    def __init__(self, collection):
+        self._collection = collection
+
+    def over_all(self, filters=None, group_by=None, total_count=True, return_metrics=None, **kwargs):
+        """Counts only: `total_count`, optionally per `group_by` value (list values count once per element)."""
+        records = self._collection._snapshot(filters)
+        if group_by is None:
+            return AggregateReturn(properties={}, total_count=len(records))
+
+        prop = group_by if isinstance(group_by, str) else group_by.prop
+        limit = None if isinstance(group_by, str) else group_by.limit
+        counts = {}
+        for record in records:
+            value = record.properties.get(prop)
+            for v in value if isinstance(value, list) else [value]:
+                if v is not None:
+                    counts[v] = counts.get(v, 0) + 1
+        ordered = sorted(counts.items(), key=lambda item: (-item[1], str(item[0])))[:limit]
+        return AggregateGroupByReturn(groups=[
+            AggregateGroup(grouped_by=GroupedBy(prop=prop, value=v), properties={}, total_count=n)
+            for v, n in ordered
+        ])
+
+
+class _Collections:
+    def __init__(self, server):
+        self._server = server
+
+    def exists(self, name):
+        return name in self._server
+
+    def create(self, name, properties=None, references=None, **config):
+        with _server_lock:
+            if name not in self._server:
+                self._server[name] = FakeCollection(name, properties)
+            return self._server[name]
+
+    def get(self, name):
+        if name not in self._server:
+            # Like the real client, a handle can be taken before the collection exists
+            return self.create(name)
+        return self._server[name]
+
+    def delete(self, name):
+        for n in [name] if isinstance(name, str) else name:
+            self._server.pop(n, None)
+
+    def list_all(self, simple=True):
+        return {name: SimpleNamespace(name=name) for name in self._server}
+
+
+_server_lock = threading.Lock()
+# Collections shared by every client of this process, like a server
+_default_server = {}
+
+
+_workflows = {}
+_workflow_lock = threading.Lock()
+
+
+def _fake_value(operation, properties):
+    """Deterministic stand-in for a generated value, derived from the object's view properties."""
+    text = " ".join(str(properties.get(p) or "") for p in operation.view_properties)
+    digest = zlib.crc32(text.encode("utf-8"))
+    data_type = str(getattr(operation.data_type, "value", operation.data_type))
+    if data_type == "int":
+        return 1 + digest % 5
+    if data_type == "boolean":
+        return digest % 2 == 0
+    # Categorical prompts list their choices as '"a", "b"'
+    choices = re.findall(r'"(\w+)"', operation.instruction)
+    if choices:
+        return choices[digest % len(choices)]
+    return text.strip()[:120]
+
+
+class FakeTransformationAgent:
+    """
+    Stub `TransformationAgent` over a `FakeClient` collection, for offline enrichment runs.
+
+    `update_all` starts a workflow that reports "running" for `polls` calls of `get_status`,
+    then writes a deterministic value (see `_fake_value`) for every operation onto every
+    object and reports "completed". Workflows are shared process-wide, like the collections.
+    """
+
+    def __init__(self, client, collection, operations, polls=2):
+        self.client = client
+        self.collection = collection
+        self.operations = operations
+        self.polls = polls
+
+    def update_all(self):
+        workflow_id = f"fake-{uuid_lib.uuid4()}"
+        with _workflow_lock:
+            _workflows[workflow_id] = {
+                "collection": self.client.collections.get(self.collection),
+                "operations": self.operations,
+                "polls": self.polls,
+                "start": _now(),
+                "state": "running",
+            }
+        return SimpleNamespace(workflow_id=workflow_id, collection=self.collection)
+
+    def get_status(self, workflow_id):
+        with _workflow_lock:
+            workflow = _workflows[workflow_id]
+            workflow["polls"] -= 1
+            if workflow["state"] == "running" and workflow["polls"] < 0:
+                collection = workflow["collection"]
+                for o in list(collection.iterator()):
+                    collection.data.update(
+                        uuid=o.uuid,
+                        properties={op.property_name: _fake_value(op, o.properties) for op in workflow["operations"]},
+                    )
+                workflow["state"] = "completed"
+                workflow["end"] = _now()
+            total = len(workflow["collection"])
+        start = workflow["start"]
+        return {
+            "workflow_id": workflow_id,
+            "status": {
+                "state": workflow["state"],
+                "start_time": f"{start:%Y-%m-%d %H:%M:%S}",
+                "total_duration": (workflow["end"] - start).total_seconds() if "end" in workflow else None,
+                "total_items": total,
+                "items_processed": total if workflow["state"] == "completed" else 0,
+            },
+        }
+
+
+class FakeClient:
+    """
+    In-process stand-in for the synchronous v4 `WeaviateClient`, for benchmarks and offline runs.
+
+    Supports what the scripts use: `collections.exists/create/get/delete`, `data.insert_many`,
+    `update` and `delete_many`, `query.fetch_objects` with filters and sorting, `iterator`, and
+    counting `aggregate.over_all` (optionally grouped). The Transformation Agent is replaced by
+    `FakeTransformationAgent` (see `enrichment.transformation_agent`); vector search and
+    generation are not available. Clients share the process-wide collections unless given
+    their own `server` dict.
+
+        WEAVIATE_MODE=stub WEAVIATE_STUB=fake_weaviate:connect python 61_export_data.py
+    """
+
+    def __init__(self, server=None):
+        self._server = _default_server if server is None else server
+        self.collections = _Collections(self._server)
+
+    def transformation_agent(self, collection, operations):
+        return FakeTransformationAgent(self, collection, operations)
+
+    def connect(self):
+        pass
+
+    def is_connected(self):
+        return True
+
+    def is_ready(self):
+        return True
+
+    def close(self):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+
+def connect(settings=None):
+    """Stub factory for `connection.py` (`WEAVIATE_STUB=fake_weaviate:connect`)."""
+    return FakeClient()
@@ -0,0 +1,174 @@
+import json
+import time
+from datetime import datetime, timezone
+from itertools import islice
+
+import instrumentation
+from chunking import MAX_VIEW_TOKENS, conversation_view
+
+_CHUNK_SIZE = 1 << 20
+_WHITESPACE = " \t\r\n"
+# Characters that can follow a complete array element
+_ELEMENT_END = _WHITESPACE + ",]"
+
+
+def iter_records(file_path, chunk_size=_CHUNK_SIZE):
+    """
+    Stream records from a JSON array file or a JSON Lines file, one at a time.
+
+    Only the record currently being decoded is held in memory, so memory use is
+    bounded by the largest single record rather than the size of the file.
+
+    Args:
+        file_path (str): Path to a `.json` (array of objects) or `.jsonl` file
+        chunk_size (int): Number of characters to read from disk at a time
+
+    Yields:
+        dict: One raw record per element / line
+    """
+    with open(file_path, "r", encoding="utf-8") as f:
+        head = f.read(chunk_size)
+        stripped = head.lstrip(_WHITESPACE)
+        if stripped.startswith("["):
+            yield from _iter_json_array(f, stripped[1:], chunk_size)
+        else:
+            yield from _iter_json_lines(f, head, chunk_size)
+
+
+def _iter_json_array(f, buffer, chunk_size):
+    decoder = json.JSONDecoder()
+    eof = False
+    pos = 0
+    expect_value = True
+
+    while True:
+        # Skip whitespace and separators between elements
+        while True:
+            while pos < len(buffer) and buffer[pos] in _WHITESPACE:
+                pos += 1
+            if pos < len(buffer) or eof:
+                break
+            buffer, pos = _refill(f, buffer, pos, chunk_size)
+            eof = pos == 0 and not buffer
+
+        if pos >= len(buffer):
+            raise ValueError("Unexpected end of file: JSON array is not closed")
+        if buffer[pos] == "]":
+            return
+        if not expect_value:
+            if buffer[pos] != ",":
+                raise ValueError(f"Expected ',' or ']' in JSON array, got {buffer[pos]!r}")
+            pos += 1
+            expect_value = True
+            continue
+
+        # Decode the next element, reading more data until it is complete
+        while True:
+            try:
+                record, end = decoder.raw_decode(buffer, pos)
+            except json.JSONDecodeError:
+                if eof:
+                    raise
+            else:
+                # A scalar cut off by the buffer ('2' of '2.5') decodes too: only trust a value
+                # once the character after it is read and ends it
+                if eof or (end < len(buffer) and buffer[end] in _ELEMENT_END):
+                    break
+            more = f.read(chunk_size)
+            eof = not more
+            buffer = buffer[pos:] + more
+            pos = 0
+
+        yield record
+        pos = end
+        expect_value = False
+
+
+def _refill(f, buffer, pos, chunk_size):
+    more = f.read(chunk_size)
+    if not more:
+        return "", 0
+    return buffer[pos:] + more, 0
+
+
+def _iter_json_lines(f, head, chunk_size):
+    pending = head
+    while True:
+        *lines, pending = pending.split("\n")
+        for line in lines:
+            if line.strip():
+                yield json.loads(line)
+        more = f.read(chunk_size)
+        if not more:
+            break
+        pending += more
+    if pending.strip():
+        yield json.loads(pending)
+
+
+def normalize_post(row, max_conversation_tokens=MAX_VIEW_TOKENS):
+    """
+    Normalize a raw forum post record in place, ready for import.
+
+    Args:
+        row (dict): Raw record from `simplified_posts.json`
+        max_conversation_tokens (int | None): `conversation` becomes a view of longer threads
+            made of their leading and trailing chunks (see `chunking.conversation_view`);
+            `conversation_full` always keeps the whole thread. `None` disables the view.
+
+    Returns:
+        dict: The same record, with `date_created` as a UTC datetime
+    """
+    if isinstance(row.get("date_created"), str):
+        row["date_created"] = datetime.fromisoformat(row["date_created"]).replace(tzinfo=timezone.utc)
+
+    conversation = row.get("conversation")
+    if conversation is not None:
+        row["conversation_full"] = conversation
+        if max_conversation_tokens is not None:
+            row["conversation"] = conversation_view(conversation, max_tokens=max_conversation_tokens)
+    return row
+
+
+def iter_posts(file_path, limit=None, max_conversation_tokens=MAX_VIEW_TOKENS):
+    """
+    Lazily load and normalize forum posts from a JSON or JSON Lines export.
+
+    Args:
+        file_path (str): Path to the export file
+        limit (int | None): Stop after this many records
+        max_conversation_tokens (int | None): See `normalize_post`
+
+    Yields:
+        dict: Normalized records, one at a time
+    """
+    records = iter_records(file_path)
+    if limit is not None:
+        records = islice(records, limit)
+    if instrumentation.enabled():
+        yield from _iter_posts_timed(records, max_conversation_tokens)
+        return
+    for row in records:
+        yield normalize_post(row, max_conversation_tokens=max_conversation_tokens)
+
+
+def _iter_posts_timed(records, max_conversation_tokens):
+    """`iter_posts` recording JSON parsing and normalization (dates, conversation view) time separately."""
+    parse = normalize = 0.0
+    n = 0
+    try:
+        while True:
+            start = time.perf_counter()
+            row = next(records, None)
+            parsed = time.perf_counter()
+            if row is None:
+                parse += parsed - start
+                return
+            row = normalize_post(row, max_conversation_tokens=max_conversation_tokens)
+            parse += parsed - start
+            normalize += time.perf_counter() - parsed
+            n += 1
+            yield row
+    finally:
+        instrumentation.record("posts.parse_json", parse, items=n)
+        instrumentation.record("posts.normalize", normalize, items=n)
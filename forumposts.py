@@ -0,0 +1,59 @@
+import argparse
+import os
+import runpy
+import sys
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+
+# command -> (script, summary). Kept here rather than read from the scripts, so listing the
+# commands imports nothing and each command only pays for the imports of its own script.
+COMMANDS = {
+    "eda": ("00_eda_forum.py", "Stream the forum export and print a sample."),
+    "generate": ("02_generate_corpus.py", "Generate a synthetic forum corpus."),
+    "dedup": ("05_dedup_posts.py", "Find near-duplicate threads and write the canonical-topic mapping."),
+    "populate": ("10_populate_weaviate.py", "Import forum posts into Weaviate."),
+    "topics": ("30_get_topics.py", "Suggest support topic categories from forum posts."),
+    "enrich": ("50_transformation_agent.py", "Enrich forum posts with the Transformation Agent."),
+    "query": ("60_queries.py", "Query the forum posts collection."),
+    "export": ("61_export_data.py", "Export the enriched collection for offline analysis."),
+    "vectors": ("62_export_vectors.py", "Export the named vectors to a local store for similarity search."),
+    "analyze": ("65_pandas_analysis.py", "Cross-tabulate the enriched properties and render heatmaps."),
+    "validate": ("66_validate_labels.py", "Check the enriched labels and repair near misses."),
+    "insights": ("70_analysis.py", "Analyse the enriched forum posts."),
+    "benchmark": ("80_benchmark.py", "Benchmark the pipeline on synthetic corpora."),
+    "pipeline": ("90_run_pipeline.py", "Run the pipeline stages, skipping unchanged ones."),
+}
+
+parser = argparse.ArgumentParser(
+    prog="forumposts",
+    description="Single entry point for the forum post pipeline scripts.",
+    epilog="Run 'forumposts COMMAND --help' for the options of a command. "
+           "Several remote steps in one process share a single connection: use 'forumposts pipeline'.",
+)
+subparsers = parser.add_subparsers(dest="command", metavar="COMMAND", required=True)
+for _name, (_, _summary) in COMMANDS.items():
+    # The command's own parser handles its arguments, including --help
+    subparsers.add_parser(_name, help=_summary, description=_summary, add_help=False)
+
+
+def load_command(command):
+    """
+    Load the script behind `command`, which imports only what that script needs.
+
+    Returns:
+        dict: The script's module namespace, with its `main` and argparse `parser`
+    """
+    script, _ = COMMANDS[command]
+    namespace = runpy.run_path(os.path.join(ROOT, script), run_name=f"forumposts_{command}")
+    if "parser" in namespace:
+        namespace["parser"].prog = f"{parser.prog} {command}"
+    return namespace
+
+
+def main(argv=None):
+    args, command_argv = parser.parse_known_args(sys.argv[1:] if argv is None else argv)
+    load_command(args.command)["main"](command_argv)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,211 @@
+import hashlib
+import json
+import os
+import re
+import sqlite3
+import threading
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+
+DEFAULT_CACHE_PATH = "data/.cache/generations.sqlite"
+DEFAULT_MODEL = "claude-3-7-sonnet-latest"
+
+_TEMPLATE_FIELD = re.compile(r"{(\w+)}")
+
+
+def _digest(*parts):
+    payload = json.dumps(parts, sort_keys=True, default=str)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def template_properties(prompt):
+    """Properties a `single_prompt` template refers to, e.g. `{conversation}`."""
+    return sorted(set(_TEMPLATE_FIELD.findall(prompt)))
+
+
+def grouped_key(model, task, properties, objects):
+    """Cache key of a grouped task: model, prompt and the grouped properties of the (unordered) objects."""
+    rows = sorted(
+        (str(o.uuid), {p: o.properties.get(p) for p in properties} if properties else o.properties)
+        for o in objects
+    )
+    return _digest("grouped", model, task, rows)
+
+
+def single_key(model, prompt, properties):
+    """Cache key of one `single_prompt` generation. Objects with identical inputs share a key."""
+    return _digest("single", model, prompt, {p: properties.get(p) for p in template_properties(prompt)})
+
+
+class GenerationCache:
+    """On-disk cache of generated text keyed by `grouped_key` / `single_key`, backed by SQLite."""
+
+    def __init__(self, path=DEFAULT_CACHE_PATH):
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self.path = path
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._lock = threading.Lock()
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS generations (
+                key TEXT PRIMARY KEY,
+                model TEXT NOT NULL,
+                text TEXT NOT NULL,
+                created TEXT NOT NULL
+            )
+            """
+        )
+        self.hits = 0
+        self.misses = 0
+
+    def get_many(self, keys):
+        keys = list(keys)
+        found = {}
+        with self._lock:
+            for start in range(0, len(keys), 500):
+                chunk = keys[start:start + 500]
+                placeholders = ",".join("?" * len(chunk))
+                found.update(self._conn.execute(
+                    f"SELECT key, text FROM generations WHERE key IN ({placeholders})", chunk
+                ).fetchall())
+        self.hits += len(found)
+        self.misses += len(set(keys)) - len(found)
+        return found
+
+    def put_many(self, model, items):
+        created = datetime.now(timezone.utc).isoformat()
+        rows = [(key, model, text, created) for key, text in items if text is not None]
+        with self._lock, self._conn:
+            self._conn.executemany("INSERT OR REPLACE INTO generations VALUES (?, ?, ?, ?)", rows)
+
+    def close(self):
+        self._conn.close()
+
+
+class WeaviateProvider:
+    """Generates through the collection's generative module (Anthropic), restricted to exactly the given objects."""
+
+    def __init__(self, collection, model=DEFAULT_MODEL):
+        self.collection = collection
+        self.model = model
+
+    def _generate(self, objects, **kwargs):
+        from weaviate.classes.generate import GenerativeConfig
+        from weaviate.classes.query import Filter
+
+        return self.collection.generate.fetch_objects(
+            filters=Filter.by_id().contains_any([o.uuid for o in objects]),
+            limit=len(objects),
+            generative_provider=GenerativeConfig.anthropic(model=self.model),
+            **kwargs,
+        )
+
+    def grouped(self, objects, task, properties=None):
+        return self._generate(objects, grouped_task=task, grouped_properties=properties).generative.text
+
+    def single(self, objects, prompt):
+        response = self._generate(objects, single_prompt=prompt)
+        texts = {str(o.uuid): o.generative.text for o in response.objects}
+        return [texts.get(str(o.uuid)) for o in objects]
+
+
+class FakeProvider:
+    """Deterministic offline provider: echoes the prompt and inputs, and counts calls."""
+
+    def __init__(self, model="fake"):
+        self.model = model
+        self.calls = 0
+        self._lock = threading.Lock()
+
+    def _count(self):
+        with self._lock:
+            self.calls += 1
+
+    def grouped(self, objects, task, properties=None):
+        self._count()
+        first_line = next((line.strip() for line in task.splitlines() if line.strip()), "")
+        return f"[{self.model}] {len(objects)} objects: {first_line}"
+
+    def single(self, objects, prompt):
+        self._count()
+        return [
+            f"[{self.model}] " + prompt.format_map(defaultdict(str, o.properties)).strip()[:200]
+            for o in objects
+        ]
+
+
+PROVIDERS = {"anthropic": WeaviateProvider, "fake": FakeProvider}
+
+
+def get_provider(name, collection=None, model=None):
+    if name == "fake":
+        return FakeProvider(model or "fake")
+    return WeaviateProvider(collection, model or DEFAULT_MODEL)
+
+
+class Generator:
+    """
+    Caching front end for grouped-task and single-prompt generation.
+
+    Grouped tasks are keyed by (model, task, grouped properties of the selected objects), so a
+    re-run over unchanged objects is answered from the cache. Single prompts are keyed per
+    object by the properties the template uses. Identical inputs are generated once, and the
+    remaining objects are sent in batches of `batch_size` with up to `max_concurrency` in flight.
+    """
+
+    def __init__(self, provider, cache=None, batch_size=10, max_concurrency=4):
+        self.provider = provider
+        self.cache = cache or GenerationCache()
+        self.batch_size = batch_size
+        self.max_concurrency = max_concurrency
+
+    def grouped(self, objects, task, properties=None, refresh=False):
+        """
+        Args:
+            objects: Query result objects (with `.uuid` and `.properties`)
+            properties (list[str] | None): Properties passed to the model, as `grouped_properties`
+
+        Returns:
+            str: Generated text
+        """
+        key = grouped_key(self.provider.model, task, properties, objects)
+        if not refresh:
+            cached = self.cache.get_many([key])
+            if key in cached:
+                return cached[key]
+        text = self.provider.grouped(objects, task, properties)
+        self.cache.put_many(self.provider.model, [(key, text)])
+        return text
+
+    def single(self, objects, prompt, refresh=False):
+        """
+        Returns:
+            dict: object UUID (str) -> generated text
+        """
+        keys = {str(o.uuid): single_key(self.provider.model, prompt, o.properties) for o in objects}
+        found = {} if refresh else self.cache.get_many(set(keys.values()))
+
+        # One representative object per distinct missing input
+        todo = {}
+        for o in objects:
+            key = keys[str(o.uuid)]
+            if key not in found and key not in todo:
+                todo[key] = o
+        batches = [list(todo.items())[i:i + self.batch_size] for i in range(0, len(todo), self.batch_size)]
+
+        def run_batch(batch):
+            texts = self.provider.single([o for _, o in batch], prompt)
+            items = [(key, text) for (key, _), text in zip(batch, texts)]
+            self.cache.put_many(self.provider.model, items)
+            return items
+
+        with ThreadPoolExecutor(max_workers=self.max_concurrency) as executor:
+            for items in executor.map(run_batch, batches):
+                found.update(items)
+        return {obj_uuid: found.get(key) for obj_uuid, key in keys.items()}
+
+
+def select_objects(collection, filters=None, limit=None, properties=None):
+    """The objects a `generate.fetch_objects` call with the same arguments would generate over."""
+    return collection.query.fetch_objects(filters=filters, limit=limit, return_properties=properties).objects
@@ -31,3 +31,60 @@ ACCESS_CONTEXT_CATEGORIES = {
     "rest_api": "Using the Weaviate REST API directly, including GraphQL queries",
     "other": "Others not covered by the above categories"
 }
+
+# Named vectors of the collection and the properties each one is computed from.
+# `conversation` is the bounded view; the full thread is searchable through the chunks below.
+NAMED_VECTORS = {
+    "default": ["conversation", "title"],
+    "title": ["title"],
+}
+
+# Token-budgeted chunks of each thread, with a `post` reference back to the parent object
+CHUNK_COLLECTION_NAME = f"{COLLECTION_NAME}Chunk"
+CHUNK_NAMED_VECTORS = {
+    "default": ["text"],
+}
+
+# Properties created by the Transformation Agent that the analysis scripts slice by
+ANALYSIS_PROPERTIES = [
+    "technicalComplexity",
+    "technicalDomain",
+    "rootCauseCategory",
+    "accessContext",
+    "causedByOutdatedStack",
+    "isDocumentationGap",
+]
+
+# Categorical properties and their valid categories
+CATEGORY_DICTS = {
+    "technicalDomain": TECHNICAL_DOMAIN_CATEGORIES,
+    "rootCauseCategory": ROOT_CAUSE_CATEGORIES,
+    "accessContext": ACCESS_CONTEXT_CATEGORIES,
+}
+
+
+def category_choices(categories):
+    """Category names for a prompt, e.g. '"queries", "security"'."""
+    return ", ".join(f'"{name}"' for name in categories)
+
+
+def category_definitions(categories, indent="    "):
+    """One '- name: definition' line per category, for a prompt; lines after the first get `indent`."""
+    return f"\n{indent}".join(f"- {name}: {definition}" for name, definition in categories.items())
+
+
+# Properties exported for offline analysis
+EXPORT_PROPERTIES = [
+    "title",
+    "date_created",
+    "has_accepted_answer",
+    "topic_id",
+    # Created by the Transformation Agent
+    "technicalComplexity",
+    "technicalDomain",
+    "rootCauseCategory",
+    "accessContext",
+    "causedByOutdatedStack",
+    "isDocumentationGap",
+    "summary"
+]
@@ -0,0 +1,268 @@
+import contextvars
+import json
+import random
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+
+import instrumentation
+from metrics import LatencyRecorder
+
+
+@dataclass
+class ImportConfig:
+    """Tuning knobs for `BatchImporter`."""
+
+    batch_size: int = 200
+    concurrent_requests: int = 2
+    # Cap on batch requests per minute, e.g. to stay under the vectorizer's rate limit
+    requests_per_minute: int | None = None
+    # Grow / shrink the batch size to keep request latency near `target_latency`
+    dynamic: bool = False
+    target_latency: float = 5.0
+    min_batch_size: int = 20
+    max_batch_size: int = 1000
+    max_retries: int = 3
+    backoff_base: float = 1.0
+    report_every: float = 10.0
+
+
+class _RateLimiter:
+    def __init__(self, requests_per_minute):
+        self.interval = 60.0 / requests_per_minute if requests_per_minute else 0.0
+        self._next = 0.0
+        self._lock = threading.Lock()
+
+    def wait(self):
+        if not self.interval:
+            return
+        with self._lock:
+            now = time.monotonic()
+            start = max(now, self._next)
+            self._next = start + self.interval
+        if start > now:
+            time.sleep(start - now)
+
+
+class ImportMetrics:
+    """Running counters for an import, safe to update from worker threads."""
+
+    def __init__(self):
+        self.started = time.monotonic()
+        self.objects = 0
+        self.bytes = 0
+        self.batches = 0
+        self.retried = 0
+        self.failed = 0
+        self.latency = LatencyRecorder()
+        self._lock = threading.Lock()
+
+    def record_batch(self, seconds, ok_objects, ok_bytes):
+        self.latency.add(seconds)
+        with self._lock:
+            self.batches += 1
+            self.objects += ok_objects
+            self.bytes += ok_bytes
+
+    def record_retry(self, n):
+        with self._lock:
+            self.retried += n
+
+    def record_failure(self, n):
+        with self._lock:
+            self.failed += n
+
+    def snapshot(self):
+        elapsed = max(time.monotonic() - self.started, 1e-9)
+        latency = self.latency.summary()
+        return {
+            "elapsed": elapsed,
+            "objects": self.objects,
+            "objects_per_sec": self.objects / elapsed,
+            "bytes_per_sec": self.bytes / elapsed,
+            "batches": self.batches,
+            "retried": self.retried,
+            "failed": self.failed,
+            "latency_p50": latency["p50"],
+            "latency_p95": latency["p95"],
+            "latency_p99": latency["p99"],
+        }
+
+
+def format_report(snapshot, batch_size=None):
+    def ms(value):
+        return "-" if value is None else f"{value * 1000:.0f}ms"
+
+    line = (
+        f"[import] {snapshot['objects']} objs in {snapshot['elapsed']:.1f}s | "
+        f"{snapshot['objects_per_sec']:.1f} obj/s | {snapshot['bytes_per_sec'] / 1024:.1f} KiB/s | "
+        f"batch p50/p95/p99 {ms(snapshot['latency_p50'])}/{ms(snapshot['latency_p95'])}/{ms(snapshot['latency_p99'])} | "
+        f"retried {snapshot['retried']} | failed {snapshot['failed']}"
+    )
+    if batch_size is not None:
+        line += f" | batch size {batch_size}"
+    return line
+
+
+class _PendingObject:
+    __slots__ = ("obj", "size", "attempt", "not_before")
+
+    def __init__(self, obj, size, attempt=0, not_before=0.0):
+        self.obj = obj
+        self.size = size
+        self.attempt = attempt
+        self.not_before = not_before
+
+
+class BatchImporter:
+    """
+    Concurrent batch importer built on `collection.data.insert_many`.
+
+    Each batch is a separate request, so per-batch latency can be measured and failed
+    objects can be re-submitted individually. Use as a context manager:
+
+        with BatchImporter(collection, ImportConfig(concurrent_requests=4)) as importer:
+            for row in rows:
+                importer.add_object(row, uuid=generate_uuid5(row["topic_id"]))
+        print(importer.failed_objects)
+    """
+
+    def __init__(self, collection, config=None, report=print):
+        self.collection = collection
+        self.config = config or ImportConfig()
+        self.report = report
+        self.metrics = ImportMetrics()
+        self.failed_objects = []  # (uuid, message) pairs that exhausted their retries
+        self.batch_size = self.config.batch_size
+
+        self._buffer = []
+        self._retry_queue = deque()
+        self._lock = threading.Lock()
+        self._slots = threading.BoundedSemaphore(self.config.concurrent_requests)
+        self._executor = ThreadPoolExecutor(max_workers=self.config.concurrent_requests)
+        self._rate_limiter = _RateLimiter(self.config.requests_per_minute)
+        self._in_flight = []
+        self._last_report = time.monotonic()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+    def add_object(self, properties, uuid=None, vector=None, references=None):
+        from weaviate.classes.data import DataObject
+
+        obj = DataObject(properties=properties, uuid=uuid, vector=vector, references=references)
+        size = len(json.dumps(properties, ensure_ascii=False, default=str).encode("utf-8"))
+        self._buffer.append(_PendingObject(obj, size))
+        self._drain_retries()
+        # Workers may resize batches concurrently, so read the size once per batch
+        while len(self._buffer) >= (size := self.batch_size):
+            self._submit(self._buffer[:size])
+            self._buffer = self._buffer[size:]
+        self._maybe_report()
+
+    def close(self):
+        while True:
+            if self._buffer:
+                self._submit(self._buffer)
+                self._buffer = []
+            self._wait_in_flight()
+            with self._lock:
+                if not self._retry_queue:
+                    break
+                wait = self._retry_queue[0].not_before - time.monotonic()
+            if wait > 0:
+                time.sleep(wait)
+            self._drain_retries(force=True)
+        self._executor.shutdown(wait=True)
+        self.report(format_report(self.metrics.snapshot(), self.batch_size))
+
+    def _drain_retries(self, force=False):
+        now = time.monotonic()
+        with self._lock:
+            while self._retry_queue and (force or self._retry_queue[0].not_before <= now):
+                self._buffer.append(self._retry_queue.popleft())
+
+    def _submit(self, pending):
+        self._slots.acquire()
+        self._rate_limiter.wait()
+        # Run in a copy of the caller's context, so the batch span nests under the caller's span
+        future = self._executor.submit(contextvars.copy_context().run, self._send, pending)
+        future.add_done_callback(lambda _: self._slots.release())
+        running = []
+        for f in self._in_flight:
+            if f.done():
+                # Raise errors from outside the request's retry handling instead of silently losing the batch
+                f.result()
+            else:
+                running.append(f)
+        self._in_flight = running + [future]
+
+    def _wait_in_flight(self):
+        for future in self._in_flight:
+            future.result()
+        self._in_flight = []
+
+    def _send(self, pending):
+        with instrumentation.span("import.batch", objects=len(pending)) as span:
+            self._send_batch(pending, span)
+
+    def _send_batch(self, pending, span):
+        start = time.monotonic()
+        try:
+            response = self.collection.data.insert_many([p.obj for p in pending])
+        except Exception as e:
+            span.set(error=str(e))
+            # The whole request failed (timeout, 429, connection reset): retry every object
+            self._schedule_retries([(p, str(e)) for p in pending])
+            self._adapt(time.monotonic() - start, failed=True)
+            return
+        elapsed = time.monotonic() - start
+
+        errors = response.errors or {}
+        failed = [(pending[i], err.message) for i, err in errors.items()]
+        ok = [p for i, p in enumerate(pending) if i not in errors]
+        self.metrics.record_batch(elapsed, len(ok), sum(p.size for p in ok))
+        span.set(failed=len(failed))
+        instrumentation.count("import.objects", len(ok))
+        instrumentation.count("import.failed_objects", len(failed))
+        self._schedule_retries(failed)
+        self._adapt(elapsed, failed=bool(failed))
+
+    def _schedule_retries(self, failed):
+        retry = []
+        for p, message in failed:
+            if p.attempt >= self.config.max_retries:
+                self.failed_objects.append((p.obj.uuid, message))
+                continue
+            p.attempt += 1
+            delay = self.config.backoff_base * 2 ** (p.attempt - 1)
+            p.not_before = time.monotonic() + delay * random.uniform(0.5, 1.5)
+            retry.append(p)
+        self.metrics.record_retry(len(retry))
+        self.metrics.record_failure(len(failed) - len(retry))
+        with self._lock:
+            self._retry_queue.extend(retry)
+            self._retry_queue = deque(sorted(self._retry_queue, key=lambda p: p.not_before))
+
+    def _adapt(self, latency, failed):
+        if not self.config.dynamic:
+            return
+        with self._lock:
+            if failed or latency > self.config.target_latency:
+                size = int(self.batch_size * 0.7)
+            elif latency < self.config.target_latency / 2:
+                size = int(self.batch_size * 1.25) + 1
+            else:
+                return
+            self.batch_size = max(self.config.min_batch_size, min(self.config.max_batch_size, size))
+
+    def _maybe_report(self):
+        now = time.monotonic()
+        if now - self._last_report >= self.config.report_every:
+            self._last_report = now
+            self.report(format_report(self.metrics.snapshot(), self.batch_size))
@@ -0,0 +1,77 @@
+import hashlib
+import json
+import os
+from datetime import datetime
+
+DEFAULT_MANIFEST_PATH = "data/.cache/ingest_manifest.json"
+
+INSERT = "insert"
+UPDATE = "update"
+SKIP = "skip"
+
+
+def _json_default(value):
+    if isinstance(value, datetime):
+        return value.isoformat()
+    return str(value)
+
+
+def hash_properties(properties):
+    """
+    Hash a dictionary of normalized object properties in a key-order independent way.
+
+    Args:
+        properties (dict): Properties as they will be sent to Weaviate
+
+    Returns:
+        str: Hex SHA-256 digest
+    """
+    payload = json.dumps(properties, sort_keys=True, ensure_ascii=False, default=_json_default)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class IngestManifest:
+    """
+    Local record of what has been imported into a collection, as `uuid -> content hash`.
+
+    Used to decide whether an incoming object is new, changed or unchanged without
+    asking the server.
+    """
+
+    def __init__(self, path=DEFAULT_MANIFEST_PATH, collection_name=None):
+        self.path = path
+        self.collection_name = collection_name
+        self.hashes = {}
+        if os.path.exists(path):
+            with open(path, "r", encoding="utf-8") as f:
+                stored = json.load(f)
+            # A manifest for another collection tells us nothing about this one
+            if collection_name is None or stored.get("collection") == collection_name:
+                self.hashes = stored.get("objects", {})
+
+    def __len__(self):
+        return len(self.hashes)
+
+    def classify(self, uuid, digest):
+        known = self.hashes.get(str(uuid))
+        if known is None:
+            return INSERT
+        if known != digest:
+            return UPDATE
+        return SKIP
+
+    def record(self, uuid, digest):
+        self.hashes[str(uuid)] = digest
+
+    def forget(self, uuid):
+        self.hashes.pop(str(uuid), None)
+
+    def reset(self):
+        self.hashes = {}
+
+    def save(self):
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump({"collection": self.collection_name, "objects": self.hashes}, f)
+        os.replace(tmp_path, self.path)
@@ -0,0 +1,456 @@
+import contextvars
+import functools
+import json
+import os
+import random
+import threading
+import time
+
+DEFAULT_TRACE_PATH = "data/traces/trace.json"
+JSON = "json"
+OTLP = "otlp"
+OTEL = "otel"
+FORMATS = [JSON, OTLP, OTEL]
+
+_state = None  # the active `_Session`, or None when disabled
+_current = contextvars.ContextVar("instrumentation_span", default=None)
+
+
+class _Noop:
+    """Returned by `span` when instrumentation is off: a reusable, do-nothing context manager."""
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+    def set(self, **attributes):
+        pass
+
+
+_NOOP = _Noop()
+
+
+class _Stat:
+    __slots__ = ("count", "total", "min", "max", "items")
+
+    def __init__(self):
+        self.count = 0
+        self.total = 0.0
+        self.min = float("inf")
+        self.max = 0.0
+        self.items = 0
+
+    def add(self, seconds, count=1, items=0):
+        self.count += count
+        self.total += seconds
+        self.items += items
+        per_call = seconds / count if count else seconds
+        self.min = min(self.min, per_call)
+        self.max = max(self.max, per_call)
+
+    def as_dict(self):
+        return {
+            "count": self.count,
+            "total_seconds": self.total,
+            "mean_seconds": self.total / self.count if self.count else None,
+            "min_seconds": self.min if self.count else None,
+            "max_seconds": self.max,
+            **({"items": self.items} if self.items else {}),
+        }
+
+
+class Span:
+    __slots__ = ("name", "attributes", "trace_id", "span_id", "parent_id", "start_ns", "end_ns",
+                 "_start", "_token", "_memory", "error")
+
+    def __init__(self, name, attributes, trace_id, parent):
+        self.name = name
+        self.attributes = attributes
+        self.trace_id = trace_id
+        self.span_id = random.getrandbits(64)
+        self.parent_id = parent.span_id if parent is not None else None
+        self.start_ns = self.end_ns = None
+        self.error = None
+
+    def set(self, **attributes):
+        self.attributes.update(attributes)
+
+    def __enter__(self):
+        self.start_ns = time.time_ns()
+        self._start = time.perf_counter()
+        self._token = _current.set(self)
+        if _state is not None and _state.trace_memory:
+            import tracemalloc
+            self._memory = tracemalloc.get_traced_memory()[0]
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        seconds = time.perf_counter() - self._start
+        self.end_ns = self.start_ns + int(seconds * 1e9)
+        _current.reset(self._token)
+        if exc_type is not None:
+            self.error = f"{exc_type.__name__}: {exc}"
+        session = _state
+        if session is not None:
+            if session.trace_memory:
+                import tracemalloc
+                self.attributes["memory_delta_bytes"] = tracemalloc.get_traced_memory()[0] - self._memory
+            session._finish(self, seconds)
+        return False
+
+    def as_dict(self):
+        return {
+            "name": self.name,
+            "trace_id": f"{self.trace_id:032x}",
+            "span_id": f"{self.span_id:016x}",
+            "parent_id": f"{self.parent_id:016x}" if self.parent_id is not None else None,
+            "start_ns": self.start_ns,
+            "end_ns": self.end_ns,
+            "seconds": (self.end_ns - self.start_ns) / 1e9,
+            "attributes": self.attributes,
+            "error": self.error,
+        }
+
+
+class _Session:
+    def __init__(self, name, max_spans, profile, trace_memory):
+        self.name = name
+        self.trace_id = random.getrandbits(128)
+        self.started_ns = time.time_ns()
+        self.max_spans = max_spans
+        self.spans = []
+        self.dropped_spans = 0
+        self.stats = {}
+        self.counters = {}
+        self.trace_memory = trace_memory
+        self._lock = threading.Lock()
+        self.profiler = None
+        if profile:
+            import cProfile
+            self.profiler = cProfile.Profile()
+            self.profiler.enable()
+        if trace_memory:
+            import tracemalloc
+            tracemalloc.start()
+
+    def _finish(self, span, seconds):
+        with self._lock:
+            self.stats.setdefault(span.name, _Stat()).add(seconds)
+            if len(self.spans) < self.max_spans:
+                self.spans.append(span)
+            else:
+                self.dropped_spans += 1
+
+    def stop(self):
+        report = {
+            "name": self.name,
+            "trace_id": f"{self.trace_id:032x}",
+            "started_ns": self.started_ns,
+            "finished_ns": time.time_ns(),
+            "stats": {name: stat.as_dict() for name, stat in sorted(self.stats.items())},
+            "counters": dict(sorted(self.counters.items())),
+            "spans": [s.as_dict() for s in self.spans],
+            "dropped_spans": self.dropped_spans,
+        }
+        if self.profiler is not None:
+            self.profiler.disable()
+            report["profile"] = _profile_summary(self.profiler)
+        if self.trace_memory:
+            import tracemalloc
+            current, peak = tracemalloc.get_traced_memory()
+            top = tracemalloc.take_snapshot().statistics("lineno")[:20]
+            tracemalloc.stop()
+            report["memory"] = {
+                "current_bytes": current,
+                "peak_bytes": peak,
+                "top": [{"location": str(s.traceback), "bytes": s.size, "blocks": s.count} for s in top],
+            }
+        return report
+
+
+def _profile_summary(profiler, limit=30):
+    import pstats
+
+    stats = pstats.Stats(profiler)
+    rows = []
+    for (filename, line, function), (_, calls, own, cumulative, _) in stats.stats.items():
+        rows.append({
+            "function": f"{os.path.basename(filename)}:{line}({function})",
+            "calls": calls,
+            "own_seconds": own,
+            "cumulative_seconds": cumulative,
+        })
+    rows.sort(key=lambda r: r["cumulative_seconds"], reverse=True)
+    return rows[:limit]
+
+
+def enabled():
+    return _state is not None
+
+
+def enable(name="run", max_spans=100_000, profile=False, trace_memory=False):
+    """
+    Start collecting spans and counters. Until then every call in this module is a no-op.
+
+    Args:
+        max_spans (int): Spans kept for export; later ones only update the per-name stats
+        profile (bool): Run `cProfile` over the session (adds noticeable overhead)
+        trace_memory (bool): Run `tracemalloc`; spans get `memory_delta_bytes` (adds overhead)
+    """
+    global _state
+    if _state is None:
+        _state = _Session(name, max_spans, profile, trace_memory)
+    return _state
+
+
+def disable():
+    """
+    Stop collecting.
+
+    Returns:
+        dict | None: The session report (see `JsonExporter`), or None if it was not enabled
+    """
+    global _state
+    session, _state = _state, None
+    return session.stop() if session is not None else None
+
+
+def span(name, **attributes):
+    """
+    Context manager timing a block as a span nested under the current one.
+
+        with span("export.write_chunk", rows=len(rows)):
+            ...
+    """
+    session = _state
+    if session is None:
+        return _NOOP
+    return Span(name, attributes, session.trace_id, _current.get())
+
+
+def traced(name=None):
+    """Decorator running the function inside a `span` (named after the function by default)."""
+    def decorator(fn):
+        span_name = name or f"{fn.__module__}.{fn.__qualname__}"
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            if _state is None:
+                return fn(*args, **kwargs)
+            with span(span_name):
+                return fn(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def count(name, value=1):
+    """Add `value` to a counter."""
+    session = _state
+    if session is not None:
+        with session._lock:
+            session.counters[name] = session.counters.get(name, 0) + value
+
+
+def record(name, seconds, calls=1, items=0):
+    """Add pre-measured time to the stats of `name` without creating a span, for per-item work in hot loops."""
+    session = _state
+    if session is not None:
+        with session._lock:
+            session.stats.setdefault(name, _Stat()).add(seconds, calls, items)
+
+
+def timed(iterable, name):
+    """
+    Wrap an iterable so the time spent producing its items (e.g. paging) is recorded under `name`.
+
+    Returns `iterable` itself when disabled, so there is no per-item cost.
+    """
+    if _state is None:
+        return iterable
+    return _timed(iterable, name)
+
+
+def _timed(iterable, name):
+    iterator = iter(iterable)
+    elapsed, n = 0.0, 0
+    try:
+        while True:
+            start = time.perf_counter()
+            try:
+                item = next(iterator)
+            except StopIteration:
+                elapsed += time.perf_counter() - start
+                return
+            elapsed += time.perf_counter() - start
+            n += 1
+            yield item
+    finally:
+        record(name, elapsed, calls=1, items=n)
+
+
+class JsonExporter:
+    """Writes the session report (stats, counters, spans, profile and memory summaries) as one JSON file."""
+
+    def __init__(self, path=DEFAULT_TRACE_PATH):
+        self.path = path
+
+    def export(self, report):
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        with open(self.path, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2, default=str)
+
+
+def _otlp_value(value):
+    if isinstance(value, bool):
+        return {"boolValue": value}
+    if isinstance(value, int):
+        return {"intValue": str(value)}
+    if isinstance(value, float):
+        return {"doubleValue": value}
+    return {"stringValue": str(value)}
+
+
+class OtlpJsonExporter:
+    """
+    Writes spans as an OTLP/JSON `ExportTraceServiceRequest`, and counters as an
+    `ExportMetricsServiceRequest` next to it (`*.metrics.json`). Either file can be
+    POSTed to a collector's `/v1/traces` or `/v1/metrics` endpoint as is.
+    """
+
+    def __init__(self, path=DEFAULT_TRACE_PATH, service_name="forumposts"):
+        self.path = path
+        self.service_name = service_name
+
+    def export(self, report):
+        resource = {"attributes": [{"key": "service.name", "value": {"stringValue": self.service_name}}]}
+        scope = {"name": "instrumentation", "version": "1"}
+        spans = [{
+            "traceId": s["trace_id"],
+            "spanId": s["span_id"],
+            **({"parentSpanId": s["parent_id"]} if s["parent_id"] else {}),
+            "name": s["name"],
+            "kind": 1,
+            "startTimeUnixNano": str(s["start_ns"]),
+            "endTimeUnixNano": str(s["end_ns"]),
+            "attributes": [{"key": k, "value": _otlp_value(v)} for k, v in s["attributes"].items()],
+            "status": {"code": 2, "message": s["error"]} if s["error"] else {"code": 1},
+        } for s in report["spans"]]
+        metrics = [{
+            "name": name,
+            "sum": {
+                "dataPoints": [{
+                    "startTimeUnixNano": str(report["started_ns"]),
+                    "timeUnixNano": str(report["finished_ns"]),
+                    **({"asInt": str(value)} if isinstance(value, int) else {"asDouble": value}),
+                }],
+                "aggregationTemporality": 2,
+                "isMonotonic": True,
+            },
+        } for name, value in report["counters"].items()]
+
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        with open(self.path, "w", encoding="utf-8") as f:
+            json.dump({"resourceSpans": [{"resource": resource, "scopeSpans": [{"scope": scope, "spans": spans}]}]}, f)
+        with open(os.path.splitext(self.path)[0] + ".metrics.json", "w", encoding="utf-8") as f:
+            json.dump({"resourceMetrics": [{"resource": resource, "scopeMetrics": [{"scope": scope, "metrics": metrics}]}]}, f)
+
+
+class OpenTelemetryExporter:
+    """Replays the session's spans and counters through the OpenTelemetry SDK's configured providers."""
+
+    def __init__(self, tracer_provider=None, meter_provider=None):
+        try:
+            from opentelemetry import metrics, trace
+        except ImportError as e:
+            raise ImportError("OpenTelemetryExporter requires `pip install opentelemetry-sdk`") from e
+        self.tracer = (tracer_provider or trace.get_tracer_provider()).get_tracer("instrumentation")
+        self.meter = (meter_provider or metrics.get_meter_provider()).get_meter("instrumentation")
+
+    def export(self, report):
+        from opentelemetry import trace
+
+        by_id = {s["span_id"]: s for s in report["spans"]}
+        started = {}
+
+        def start(record):
+            if record["span_id"] in started:
+                return started[record["span_id"]]
+            parent = by_id.get(record["parent_id"])
+            context = trace.set_span_in_context(start(parent)) if parent else None
+            otel_span = self.tracer.start_span(
+                record["name"], context=context, attributes=record["attributes"], start_time=record["start_ns"]
+            )
+            started[record["span_id"]] = otel_span
+            return otel_span
+
+        for record in report["spans"]:
+            start(record)
+        for record in report["spans"]:
+            otel_span = started[record["span_id"]]
+            if record["error"]:
+                otel_span.set_status(trace.Status(trace.StatusCode.ERROR, record["error"]))
+            otel_span.end(end_time=record["end_ns"])
+        for name, value in report["counters"].items():
+            self.meter.create_counter(name).add(value)
+
+
+def get_exporter(fmt=JSON, path=DEFAULT_TRACE_PATH):
+    if fmt == JSON:
+        return JsonExporter(path)
+    if fmt == OTLP:
+        return OtlpJsonExporter(path)
+    if fmt == OTEL:
+        return OpenTelemetryExporter()
+    raise ValueError(f"Unknown trace format '{fmt}', expected one of {FORMATS}")
+
+
+def instrumented(name):
+    """
+    Decorator for a script's `main`: when `TRACE_OUTPUT` is set, instruments the run and exports it.
+
+    Environment:
+        TRACE_OUTPUT: Report path; unset leaves instrumentation off
+        TRACE_FORMAT: `json` (default), `otlp` (OTLP/JSON files) or `otel` (OpenTelemetry SDK)
+        TRACE_PROFILE, TRACE_MEMORY: Set to 1 to add cProfile / tracemalloc summaries
+
+    Inside an already instrumented run (e.g. a pipeline stage) it only adds a span.
+    """
+    def decorator(main):
+        @functools.wraps(main)
+        def wrapper(*args, **kwargs):
+            if _state is not None:
+                with span(name):
+                    return main(*args, **kwargs)
+            path = os.environ.get("TRACE_OUTPUT")
+            if not path:
+                return main(*args, **kwargs)
+            exporter = get_exporter(os.environ.get("TRACE_FORMAT", JSON), path)
+            enable(
+                name,
+                profile=os.environ.get("TRACE_PROFILE") == "1",
+                trace_memory=os.environ.get("TRACE_MEMORY") == "1",
+            )
+            try:
+                with span(name):
+                    return main(*args, **kwargs)
+            finally:
+                report = disable()
+                exporter.export(report)
+                print(format_stats(report))
+                print(f"Trace written to {path}")
+        return wrapper
+    return decorator
+
+
+def format_stats(report, limit=20):
+    """Slowest span names by total time, one line each."""
+    rows = sorted(report["stats"].items(), key=lambda item: item[1]["total_seconds"], reverse=True)[:limit]
+    lines = [f"{'name':<32} {'count':>8} {'total s':>9} {'mean ms':>9} {'max ms':>9}"]
+    for name, stat in rows:
+        mean = stat["mean_seconds"] or 0
+        lines.append(
+            f"{name:<32} {stat['count']:>8} {stat['total_seconds']:>9.3f} {mean * 1000:>9.2f} {stat['max_seconds'] * 1000:>9.2f}"
+        )
+    return "\n".join(lines)
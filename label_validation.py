@@ -0,0 +1,347 @@
+import json
+import os
+import re
+from collections import Counter, defaultdict
+from dataclasses import asdict, dataclass, field
+from datetime import datetime, timezone
+
+import numpy as np
+import pandas as pd
+
+from analysis import BOOLEAN_PROPERTIES, COMPLEXITY_RANGE
+from helpers import CATEGORY_DICTS
+
+DEFAULT_REPORT_PATH = "data/label_validation.json"
+DEFAULT_THRESHOLD = 0.5
+# Generated labels only: has_accepted_answer comes from the forum export
+LABEL_PROPERTIES = list(CATEGORY_DICTS) + ["technicalComplexity", "causedByOutdatedStack", "isDocumentationGap"]
+
+_SEPARATORS = re.compile(r"[\s\-/.]+")
+_STRIP = "\"'`*[](){}:;,!? \t\r\n"
+# Labels copied from a prompt that embedded `categories.keys()`
+_DICT_KEYS = re.compile(r"^\s*dict_keys\(\[(.*)\]\)\s*$", re.DOTALL)
+_INTEGER = re.compile(r"-?\d+(?:\.0+)?")
+_TRUE = {"true", "yes", "y", "1"}
+_FALSE = {"false", "no", "n", "0"}
+
+
+def normalize_label(value):
+    """Case- and punctuation-insensitive form of a label: ' Python-Client.' -> 'python_client'."""
+    text = str(value)
+    wrapped = _DICT_KEYS.match(text)
+    if wrapped:
+        text = wrapped.group(1)
+    return _SEPARATORS.sub("_", text.strip(_STRIP).lower()).strip("_")
+
+
+def _trigrams(text):
+    padded = f"  {text} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+class TrigramIndex:
+    """
+    Nearest valid label by trigram (Dice) similarity, through an inverted trigram index.
+
+    Given a dict of label -> definition (as in `helpers.py`), definitions are indexed too, since
+    models sometimes answer with the definition instead of the label. A value matches when its
+    normalized form equals a label's or definition's, or when its best similarity is at least
+    `threshold` and beats the best *other* label by `margin`, so ambiguous values stay unmatched.
+    """
+
+    def __init__(self, choices, threshold=DEFAULT_THRESHOLD, margin=0.1):
+        self.threshold = threshold
+        self.margin = margin
+        aliases = [(c, c) for c in choices]
+        if isinstance(choices, dict):
+            aliases += [(definition, c) for c, definition in choices.items()]
+        self._labels = [label for _, label in aliases]
+        self._exact = {}
+        for text, label in aliases:
+            self._exact.setdefault(normalize_label(text), label)
+        self._grams = [_trigrams(normalize_label(text)) for text, _ in aliases]
+        self._postings = defaultdict(list)
+        for i, grams in enumerate(self._grams):
+            for gram in grams:
+                self._postings[gram].append(i)
+
+    def scores(self, value):
+        """Best Dice similarity of `value` to each label sharing a trigram with it, best first."""
+        grams = _trigrams(normalize_label(value))
+        shared = Counter(i for gram in grams for i in self._postings.get(gram, ()))
+        best = {}
+        for i, n in shared.items():
+            score = 2 * n / (len(grams) + len(self._grams[i]))
+            label = self._labels[i]
+            if score > best.get(label, 0.0):
+                best[label] = score
+        return sorted(best.items(), key=lambda item: -item[1])
+
+    def match(self, value):
+        """
+        Returns:
+            tuple: (valid label or None, similarity score)
+        """
+        exact = self._exact.get(normalize_label(value))
+        if exact is not None:
+            return exact, 1.0
+        scored = self.scores(value)
+        if not scored:
+            return None, 0.0
+        best, score = scored[0]
+        runner_up = scored[1][1] if len(scored) > 1 else 0.0
+        if score >= self.threshold and score - runner_up >= self.margin:
+            return best, score
+        return None, score
+
+
+def repair_complexity(value):
+    """An integer in `COMPLEXITY_RANGE` from values like 4.0, '3', '3/5' or 'Level 4', else None."""
+    low, high = COMPLEXITY_RANGE
+    for token in _INTEGER.findall(str(value)):
+        number = int(float(token))
+        if low <= number <= high:
+            return number
+    return None
+
+
+def repair_boolean(value):
+    text = normalize_label(value)
+    return True if text in _TRUE else False if text in _FALSE else None
+
+
+class LabelValidator:
+    """Validity checks and near-miss repairs for every enriched property."""
+
+    def __init__(self, threshold=DEFAULT_THRESHOLD, margin=0.1):
+        self.indexes = {prop: TrigramIndex(categories, threshold, margin) for prop, categories in CATEGORY_DICTS.items()}
+
+    def is_valid(self, prop, value):
+        if prop in self.indexes:
+            return value in CATEGORY_DICTS[prop]
+        if prop == "technicalComplexity":
+            low, high = COMPLEXITY_RANGE
+            # Exports widen the column to float where values are missing, so 3.0 is valid too
+            numeric = isinstance(value, (int, float, np.number)) and not isinstance(value, (bool, np.bool_))
+            return numeric and float(value).is_integer() and low <= value <= high
+        if prop in BOOLEAN_PROPERTIES:
+            return isinstance(value, (bool, np.bool_))
+        return True
+
+    def repair(self, prop, value):
+        """A valid value for an invalid `value`, or None if it cannot be repaired confidently."""
+        if prop in self.indexes:
+            return self.indexes[prop].match(value)[0]
+        if prop == "technicalComplexity":
+            return repair_complexity(value)
+        return repair_boolean(value)
+
+    def clean(self, prop, value):
+        """`value` if valid, else its repair (or None). Used on freshly generated values."""
+        if value is None or self.is_valid(prop, value):
+            return value
+        return self.repair(prop, value)
+
+
+@dataclass
+class PropertyReport:
+    """Validation outcome of one enriched property (one Transformation Agent operation)."""
+
+    property_name: str
+    total: int = 0
+    missing: int = 0
+    valid: int = 0
+    invalid: int = 0
+    repaired: int = 0
+    unrepairable: int = 0
+    # Most frequent invalid values: (value, count, repair or None)
+    top_invalid: list = field(default_factory=list)
+
+    @property
+    def invalid_rate(self):
+        labelled = self.total - self.missing
+        return self.invalid / labelled if labelled else 0.0
+
+
+@dataclass
+class ValidationReport:
+    properties: dict = field(default_factory=dict)
+    # property -> {uuid: repaired value}
+    repairs: dict = field(default_factory=dict)
+    # property -> [uuid, ...] holding invalid values with no confident repair
+    unrepairable: dict = field(default_factory=dict)
+
+    def updates(self):
+        """uuid -> {property: repaired value}, ready for `enrichment.write_back`."""
+        merged = defaultdict(dict)
+        for prop, repairs in self.repairs.items():
+            for obj_uuid, value in repairs.items():
+                merged[obj_uuid][prop] = value
+        return dict(merged)
+
+    def summary(self):
+        return {
+            "checked": datetime.now(timezone.utc).isoformat(),
+            "properties": {
+                prop: {**asdict(r), "invalid_rate": r.invalid_rate} for prop, r in self.properties.items()
+            },
+        }
+
+
+def _python_value(value):
+    return value.item() if isinstance(value, np.generic) else value
+
+
+def validate_frame(df, validator=None, properties=LABEL_PROPERTIES, top=10):
+    """
+    Validate every label column of `df` in one pass per column.
+
+    Each column is factorized, so validity and repairs are worked out once per distinct
+    value and mapped back to the rows with NumPy indexing. Rows are identified by the
+    `uuid` column if there is one, else by the index.
+
+    Returns:
+        ValidationReport
+    """
+    validator = validator or LabelValidator()
+    ids = df["uuid"].astype(str).to_numpy() if "uuid" in df else df.index.astype(str).to_numpy()
+    report = ValidationReport()
+
+    for prop in properties:
+        if prop not in df:
+            continue
+        codes, uniques = pd.factorize(df[prop].astype(object), use_na_sentinel=True)
+        uniques = [_python_value(u) for u in uniques]
+        valid = np.array([validator.is_valid(prop, u) for u in uniques], dtype=bool)
+        fixes = [None if ok else validator.repair(prop, u) for u, ok in zip(uniques, valid)]
+        fixable = np.array([f is not None for f in fixes], dtype=bool)
+
+        present = codes >= 0
+        safe_codes = np.where(present, codes, 0)
+        row_invalid = present & ~valid[safe_codes] if len(uniques) else np.zeros(len(df), dtype=bool)
+        row_fixable = row_invalid & fixable[safe_codes] if len(uniques) else row_invalid
+
+        counts = np.bincount(codes[row_invalid], minlength=len(uniques)) if len(uniques) else np.array([])
+        order = [i for i in np.argsort(-counts, kind="stable")[:top] if counts[i]]
+        report.properties[prop] = PropertyReport(
+            property_name=prop,
+            total=len(df),
+            missing=int((~present).sum()),
+            valid=int((present & ~row_invalid).sum()),
+            invalid=int(row_invalid.sum()),
+            repaired=int(row_fixable.sum()),
+            unrepairable=int((row_invalid & ~row_fixable).sum()),
+            top_invalid=[(uniques[i], int(counts[i]), fixes[i]) for i in order],
+        )
+        if row_fixable.any():
+            report.repairs[prop] = {
+                obj_uuid: fixes[code] for obj_uuid, code in zip(ids[row_fixable], codes[row_fixable])
+            }
+        if (row_invalid & ~row_fixable).any():
+            report.unrepairable[prop] = list(ids[row_invalid & ~row_fixable])
+    return report
+
+
+def repair_frame(df, report):
+    """A copy of `df` with the repairs of `report` applied (rows matched on `uuid`, else the index)."""
+    df = df.copy()
+    ids = df["uuid"].astype(str) if "uuid" in df else pd.Series(df.index.astype(str), index=df.index)
+    for prop, repairs in report.repairs.items():
+        fixed = ids.map(repairs)
+        mask = fixed.notna()
+        df[prop] = df[prop].astype(object)
+        df.loc[mask, prop] = fixed[mask]
+    return df
+
+
+def scan_collection(collection, properties=LABEL_PROPERTIES):
+    """Every object's label properties, in one pass of the collection iterator."""
+    existing = {p.name for p in collection.config.get().properties}
+    properties = [p for p in properties if p in existing]
+    rows = [{"uuid": str(o.uuid), **o.properties} for o in collection.iterator(return_properties=properties)]
+    return pd.DataFrame(rows, columns=["uuid", *properties])
+
+
+def apply_repairs(collection, report, max_workers=8):
+    """
+    Write every repaired value back onto its object, in parallel update requests.
+
+    Returns:
+        int: Number of objects updated
+    """
+    from enrichment import write_back
+
+    updates = report.updates()
+    if updates:
+        write_back(collection, updates, max_workers=max_workers)
+    return len(updates)
+
+
+def sync_enrichment_cache(collection, operations, cache, report, fetch_chunk=100):
+    """
+    Make the enrichment cache agree with the validation outcome.
+
+    Repaired values replace the cached invalid ones, so an incremental enrichment run does not
+    write the invalid value back. Cache entries of unrepairable values are dropped, so the
+    next incremental run re-generates exactly those labels instead of everything.
+
+    Returns:
+        dict: property -> (cache entries updated, cache entries dropped)
+    """
+    from weaviate.classes.query import Filter
+
+    from enrichment import input_hash, operation_fingerprint
+
+    by_name = {op.property_name: op for op in operations}
+    affected = {
+        obj_uuid
+        for prop in set(report.repairs) | set(report.unrepairable) if prop in by_name
+        for obj_uuid in list(report.repairs.get(prop, {})) + report.unrepairable.get(prop, [])
+    }
+    view_properties = sorted({p for op in operations for p in op.view_properties})
+    inputs = {}
+    affected = sorted(affected)
+    for i in range(0, len(affected), fetch_chunk):
+        chunk = affected[i:i + fetch_chunk]
+        response = collection.query.fetch_objects(
+            filters=Filter.by_id().contains_any(chunk), return_properties=view_properties, limit=len(chunk)
+        )
+        inputs.update((str(o.uuid), o.properties) for o in response.objects)
+
+    outcome = {}
+    for prop, op in by_name.items():
+        fingerprint = operation_fingerprint(op)
+        updated = [
+            (input_hash(op, inputs[obj_uuid], fingerprint), value)
+            for obj_uuid, value in report.repairs.get(prop, {}).items() if obj_uuid in inputs
+        ]
+        dropped = [
+            input_hash(op, inputs[obj_uuid], fingerprint)
+            for obj_uuid in report.unrepairable.get(prop, []) if obj_uuid in inputs
+        ]
+        if updated:
+            cache.put_many(prop, updated)
+        if dropped:
+            cache.delete_many(prop, dropped)
+        if updated or dropped:
+            outcome[prop] = (len(updated), len(dropped))
+    return outcome
+
+
+def write_report(report, path=DEFAULT_REPORT_PATH):
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    summary = report.summary()
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(summary, f, indent=2, default=str)
+    return summary
+
+
+def format_report(report):
+    lines = [f"{'property':<24} {'labelled':>9} {'invalid':>8} {'rate':>7} {'repaired':>9} {'unrepairable':>13}"]
+    for prop, r in report.properties.items():
+        lines.append(
+            f"{prop:<24} {r.total - r.missing:>9} {r.invalid:>8} {r.invalid_rate:>7.2%} {r.repaired:>9} {r.unrepairable:>13}"
+        )
+        for value, count, fix in r.top_invalid:
+            lines.append(f"    {value!r:<40} x{count:<6} -> {fix!r}")
+    return "\n".join(lines)
@@ -0,0 +1,73 @@
+import bisect
+import math
+import threading
+
+# Upper bounds (seconds) of the latency histogram buckets
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+def percentile(sorted_values, q):
+    """
+    Nearest-rank percentile of an already sorted sequence.
+
+    Args:
+        sorted_values (list[float]): Values in ascending order
+        q (float): Percentile between 0 and 100
+
+    Returns:
+        float | None: The percentile, or None for an empty sequence
+    """
+    if not sorted_values:
+        return None
+    rank = max(1, math.ceil(q / 100 * len(sorted_values)))
+    return sorted_values[min(rank, len(sorted_values)) - 1]
+
+
+class LatencyRecorder:
+    """Thread-safe collector of latency samples (in seconds)."""
+
+    def __init__(self):
+        self._samples = []
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._samples)
+
+    def add(self, seconds):
+        with self._lock:
+            self._samples.append(seconds)
+
+    def summary(self, percentiles=(50, 95, 99)):
+        with self._lock:
+            values = sorted(self._samples)
+        result = {"count": len(values)}
+        if values:
+            result["mean"] = sum(values) / len(values)
+            result["max"] = values[-1]
+        for q in percentiles:
+            result[f"p{q}"] = percentile(values, q)
+        return result
+
+    def histogram(self, bounds=LATENCY_BUCKETS):
+        """
+        Counts of samples per latency bucket.
+
+        Returns:
+            list[tuple]: (upper bound in seconds, count) pairs; the last bound is `inf`
+        """
+        with self._lock:
+            values = list(self._samples)
+        edges = list(bounds) + [math.inf]
+        counts = [0] * len(edges)
+        for value in values:
+            counts[bisect.bisect_left(edges, value)] += 1
+        return list(zip(edges, counts))
+
+
+def format_histogram(buckets, width=40):
+    peak = max((count for _, count in buckets), default=0) or 1
+    lines = []
+    for upper, count in buckets:
+        label = "+inf" if math.isinf(upper) else f"{upper * 1000:.0f}ms"
+        lines.append(f"<= {label:>7} {count:>6} {'#' * round(count / peak * width)}")
+    return "\n".join(lines)
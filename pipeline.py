@@ -0,0 +1,298 @@
+import contextvars
+import hashlib
+import json
+import os
+import runpy
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from contextlib import ExitStack
+from dataclasses import asdict, dataclass, field
+from datetime import datetime, timezone
+
+from helpers import COLLECTION_NAME
+
+# Stage scripts are relative to this directory, data artifacts to the working directory
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_STATE_PATH = "data/.cache/pipeline_state.json"
+DEFAULT_REPORT_PATH = "data/pipeline_report.json"
+COLLECTION_PREFIX = "collection:"
+
+RAN = "ran"
+SKIPPED = "skipped"
+FAILED = "failed"
+BLOCKED = "blocked"
+
+
+@dataclass
+class Stage:
+    """
+    One step of the pipeline: a numbered script run in-process through its `main(argv)`.
+
+    `inputs` and `outputs` are artifacts: file or directory paths, or `collection:<name>`.
+    The script itself and `args` are implicit inputs, so editing either re-runs the stage.
+    """
+
+    name: str
+    script: str
+    args: list = field(default_factory=list)
+    inputs: list = field(default_factory=list)
+    outputs: list = field(default_factory=list)
+
+
+_COLLECTION = COLLECTION_PREFIX + COLLECTION_NAME
+
+DEFAULT_STAGES = [
+    Stage("load", "00_eda_forum.py", inputs=["data/simplified_posts.json"]),
+    Stage("dedup", "05_dedup_posts.py", inputs=["data/simplified_posts.json"], outputs=["data/canonical_topics.json"]),
+    Stage(
+        "populate",
+        "10_populate_weaviate.py",
+        args=["--mode", "incremental", "--dedup", "data/canonical_topics.json"],
+        inputs=["data/simplified_posts.json", "data/canonical_topics.json"],
+        outputs=[_COLLECTION],
+    ),
+    Stage("enrich", "50_transformation_agent.py", args=["--incremental"], inputs=[_COLLECTION], outputs=[_COLLECTION]),
+    Stage("export", "61_export_data.py", args=["--incremental"], inputs=[_COLLECTION], outputs=["data/transformed_data"]),
+    Stage(
+        "analyze",
+        "65_pandas_analysis.py",
+        args=["--input", "data/transformed_data"],
+        inputs=["data/transformed_data"],
+        outputs=["data/heatmap_data.csv", "data/analysis"],
+    ),
+    Stage("insights", "70_analysis.py", inputs=[_COLLECTION]),
+]
+
+
+@dataclass
+class StageResult:
+    name: str
+    status: str
+    reason: str | None = None
+    started: str | None = None
+    elapsed: float = 0.0
+    fingerprint_seconds: float = 0.0
+    error: str | None = None
+
+
+def file_fingerprint(path):
+    """Content hash of a file, or of every file under a directory. `None` if it does not exist."""
+    if not os.path.exists(path):
+        return None
+    digest = hashlib.sha256()
+    if os.path.isdir(path):
+        files = sorted(
+            os.path.relpath(os.path.join(root, name), path)
+            for root, _, names in os.walk(path)
+            for name in names
+            if not name.endswith(".tmp")
+        )
+    else:
+        files = [""]
+    for rel in files:
+        digest.update(rel.encode("utf-8"))
+        with open(os.path.join(path, rel) if rel else path, "rb") as f:
+            for block in iter(lambda: f.read(1 << 20), b""):
+                digest.update(block)
+    return digest.hexdigest()
+
+
+def collection_fingerprint(client, name):
+    """Object count and newest update time of a collection. `None` if it does not exist."""
+    from weaviate.classes.query import MetadataQuery, Sort
+
+    if not client.collections.exists(name):
+        return None
+    collection = client.collections.get(name)
+    total = collection.aggregate.over_all(total_count=True).total_count
+    newest = collection.query.fetch_objects(
+        limit=1,
+        sort=Sort.by_update_time(ascending=False),
+        return_properties=[],
+        return_metadata=MetadataQuery(last_update_time=True),
+    ).objects
+    updated = newest[0].metadata.last_update_time.isoformat() if newest else None
+    return f"{total}:{updated}"
+
+
+def stage_dependencies(stages):
+    """Each stage depends on the earlier stages that output one of its inputs."""
+    deps = {}
+    for i, stage in enumerate(stages):
+        deps[stage.name] = {
+            earlier.name for earlier in stages[:i] if set(earlier.outputs) & set(stage.inputs)
+        }
+    return deps
+
+
+class PipelineState:
+    """Fingerprints of each stage's inputs as of its last successful run, persisted as JSON."""
+
+    def __init__(self, path=DEFAULT_STATE_PATH):
+        self.path = path
+        self._lock = threading.Lock()
+        self.stages = {}
+        if os.path.exists(path):
+            with open(path, "r", encoding="utf-8") as f:
+                self.stages = json.load(f)
+
+    def get(self, name):
+        return self.stages.get(name)
+
+    def update(self, name, fingerprints):
+        with self._lock:
+            self.stages[name] = fingerprints
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            with open(self.path + ".tmp", "w", encoding="utf-8") as f:
+                json.dump(self.stages, f, indent=2)
+            os.replace(self.path + ".tmp", self.path)
+
+
+def script_path(script):
+    return os.path.join(SCRIPT_DIR, script)
+
+
+def run_script(script, args):
+    """Run a numbered script's `main(argv)` in this process."""
+    namespace = runpy.run_path(script_path(script), run_name="pipeline_stage")
+    try:
+        namespace["main"](list(args))
+    except SystemExit as e:
+        if e.code not in (None, 0):
+            raise RuntimeError(f"{script} exited with {e.code}") from e
+
+
+class Pipeline:
+    """
+    Runs stages as a DAG in one process, sharing one Weaviate client.
+
+    A stage is skipped when the fingerprints of its inputs match those recorded after its
+    last successful run and its outputs exist. Inputs are fingerprinted when the stage
+    becomes ready, so a stage re-runs only if an upstream stage actually changed something.
+    Independent stages run concurrently, up to `max_workers` at a time.
+    """
+
+    def __init__(self, stages=DEFAULT_STAGES, state=None, max_workers=2, runner=run_script, report=print):
+        self.stages = list(stages)
+        self.state = state or PipelineState()
+        self.max_workers = max_workers
+        self.runner = runner
+        self.report = report
+        self._client = None
+        self._client_lock = threading.Lock()
+        self._exit_stack = ExitStack()
+
+    def client(self):
+        # Connect only when a collection is first fingerprinted, then keep it warm for every stage
+        with self._client_lock:
+            if self._client is None:
+                from connection import shared_client
+                self._client = self._exit_stack.enter_context(shared_client())
+            return self._client
+
+    def fingerprint(self, artifact):
+        if artifact.startswith(COLLECTION_PREFIX):
+            return collection_fingerprint(self.client(), artifact[len(COLLECTION_PREFIX):])
+        return file_fingerprint(artifact)
+
+    def input_fingerprints(self, stage):
+        fingerprints = {artifact: self.fingerprint(artifact) for artifact in stage.inputs}
+        fingerprints["script"] = file_fingerprint(script_path(stage.script))
+        fingerprints["args"] = " ".join(stage.args)
+        return fingerprints
+
+    def run_stage(self, stage, force=False, dry_run=False):
+        result = StageResult(name=stage.name, status=RAN, started=datetime.now(timezone.utc).isoformat())
+        start = time.monotonic()
+        try:
+            fingerprints = self.input_fingerprints(stage)
+            missing = [a for a in stage.outputs if self.fingerprint(a) is None]
+        except Exception as e:
+            result.status, result.error = FAILED, f"fingerprinting failed: {type(e).__name__}: {e}"
+            result.elapsed = time.monotonic() - start
+            self.report(f"[{stage.name}] {result.status} ({result.error})")
+            return result
+        result.fingerprint_seconds = time.monotonic() - start
+
+        if force:
+            result.reason = "forced"
+        elif self.state.get(stage.name) != fingerprints:
+            result.reason = "inputs changed" if self.state.get(stage.name) else "never run"
+        elif missing:
+            result.reason = f"missing {', '.join(missing)}"
+        else:
+            result.status = SKIPPED
+            result.reason = "inputs unchanged"
+
+        if result.status == RAN and dry_run:
+            result.status = SKIPPED
+            result.reason = f"dry run, would run: {result.reason}"
+        elif result.status == RAN:
+            self.report(f"[{stage.name}] running {stage.script} {' '.join(stage.args)} ({result.reason})")
+            try:
+                self.runner(stage.script, stage.args)
+                # Record inputs as the stage left them, so stages that update their own input in place settle
+                self.state.update(stage.name, self.input_fingerprints(stage))
+            except Exception as e:
+                result.status = FAILED
+                result.error = f"{type(e).__name__}: {e}"
+        result.elapsed = time.monotonic() - start
+        self.report(f"[{stage.name}] {result.status} in {result.elapsed:.1f}s ({result.error or result.reason})")
+        return result
+
+    def run(self, only=None, force=False, dry_run=False):
+        """
+        Run the pipeline, or only the stages named in `only` (their dependencies are not added).
+
+        Returns:
+            list[StageResult]: In stage order
+        """
+        deps = stage_dependencies(self.stages)
+        selected = {s.name for s in self.stages if not only or s.name in only}
+        pending = [s for s in self.stages if s.name in selected]
+        results = {}
+
+        with self._exit_stack, ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            running = {}
+            while pending or running:
+                for stage in list(pending):
+                    upstream = deps[stage.name] & selected
+                    if any(results.get(d) is None for d in upstream):
+                        continue
+                    pending.remove(stage)
+                    failed = [d for d in upstream if results[d].status in (FAILED, BLOCKED)]
+                    if failed:
+                        results[stage.name] = StageResult(stage.name, BLOCKED, reason=f"{', '.join(failed)} failed")
+                        self.report(f"[{stage.name}] {BLOCKED} ({results[stage.name].reason})")
+                    else:
+                        # Copy the context so instrumentation spans of the stage nest under the run
+                        context = contextvars.copy_context()
+                        running[executor.submit(context.run, self.run_stage, stage, force, dry_run)] = stage
+                if not running:
+                    continue
+                done, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in done:
+                    results[running.pop(future).name] = future.result()
+        self._client = None
+        self._exit_stack = ExitStack()
+        return [results[s.name] for s in self.stages if s.name in results]
+
+
+def write_report(results, path=DEFAULT_REPORT_PATH, total=None):
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    report = {
+        "finished": datetime.now(timezone.utc).isoformat(),
+        "total_seconds": total,
+        "stages": [asdict(r) for r in results],
+    }
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+    return report
+
+
+def format_report(results):
+    lines = [f"{'stage':<10} {'status':<8} {'seconds':>8}  reason"]
+    for r in results:
+        lines.append(f"{r.name:<10} {r.status:<8} {r.elapsed:>8.1f}  {r.error or r.reason or ''}")
+    return "\n".join(lines)
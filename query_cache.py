@@ -0,0 +1,246 @@
+import dataclasses
+import enum
+import hashlib
+import json
+import os
+import pickle
+import threading
+import time
+import uuid as uuid_lib
+from collections import OrderedDict
+from datetime import datetime
+
+import instrumentation
+
+DEFAULT_VERSIONS_PATH = "data/.cache/collection_versions.json"
+DEFAULT_CACHE_PATH = "data/.cache/query_cache.pickle"
+
+
+class CollectionVersions:
+    """
+    Per-collection write counters shared by every process through a small JSON file.
+
+    Stages that write to a collection call `bump`; caches compare the version an entry was
+    stored under with the current one. `get` only re-reads the file when its mtime changes.
+    """
+
+    def __init__(self, path=DEFAULT_VERSIONS_PATH):
+        self.path = path
+        self._lock = threading.Lock()
+        self._mtime = None
+        self._versions = {}
+
+    def _refresh(self):
+        try:
+            mtime = os.stat(self.path).st_mtime_ns
+        except FileNotFoundError:
+            self._mtime, self._versions = None, {}
+            return
+        if mtime != self._mtime:
+            with open(self.path, "r", encoding="utf-8") as f:
+                self._versions = json.load(f)
+            self._mtime = mtime
+
+    def get(self, collection_name):
+        with self._lock:
+            self._refresh()
+            return self._versions.get(collection_name, {}).get("version", 0)
+
+    def bump(self, collection_name):
+        with self._lock:
+            self._refresh()
+            entry = self._versions.get(collection_name, {"version": 0})
+            self._versions[collection_name] = {
+                "version": entry["version"] + 1,
+                "updated": datetime.now().astimezone().isoformat(),
+            }
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            with open(self.path + ".tmp", "w", encoding="utf-8") as f:
+                json.dump(self._versions, f, indent=2)
+            os.replace(self.path + ".tmp", self.path)
+            self._mtime = os.stat(self.path).st_mtime_ns
+            return self._versions[collection_name]["version"]
+
+
+def invalidate(collection_name, path=DEFAULT_VERSIONS_PATH):
+    """Mark every cached result for `collection_name` stale. Call after writing to the collection."""
+    return CollectionVersions(path).bump(collection_name)
+
+
+def normalize(value):
+    """Order-insensitive, hashable form of query arguments (filters, group-by models, property lists)."""
+    if value is None or isinstance(value, (bool, int, float, str)):
+        return value
+    if isinstance(value, (list, tuple)):
+        return tuple(normalize(v) for v in value)
+    if isinstance(value, dict):
+        return tuple(sorted((str(k), normalize(v)) for k, v in value.items()))
+    if isinstance(value, (set, frozenset)):
+        return tuple(sorted(repr(normalize(v)) for v in value))
+    if isinstance(value, enum.Enum):
+        return normalize(value.value)
+    if isinstance(value, (datetime, uuid_lib.UUID)):
+        return str(value)
+    if dataclasses.is_dataclass(value) or hasattr(type(value), "model_fields"):
+        # Single filter conditions and pydantic models (GroupByAggregate, Sort, ...) have field-wise reprs
+        return repr(value)
+    filters = vars(value).get("filters") if hasattr(value, "__dict__") else None
+    if isinstance(filters, list):
+        # AND / OR of filters: operand order does not matter
+        return (type(value).__name__, tuple(sorted(repr(normalize(f)) for f in filters)))
+    if hasattr(value, "__dict__"):
+        return (type(value).__name__, normalize(vars(value)))
+    return (type(value).__name__, repr(value))
+
+
+def cache_key(collection_name, method, arguments):
+    """Stable key of a call. `return_properties` is treated as a set."""
+    arguments = dict(arguments)
+    if isinstance(arguments.get("return_properties"), (list, tuple)):
+        arguments["return_properties"] = set(arguments["return_properties"])
+    payload = repr((collection_name, method, normalize(arguments)))
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+@dataclasses.dataclass
+class _Entry:
+    value: object
+    version: int
+    expires: float
+    size: int
+
+
+class QueryCache:
+    """
+    In-memory LRU + TTL cache of query and aggregate results, bounded by entry count and bytes.
+
+    Entries are tagged with the collection version they were computed under and dropped once
+    the collection is written to (see `invalidate`). With `path`, entries are loaded at start
+    and written back by `save`. Sizes are estimated from the pickled result.
+    """
+
+    def __init__(self, max_entries=1024, max_bytes=64 * 1024 * 1024, ttl=3600.0, path=None, versions=None):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.path = path
+        self.versions = versions or CollectionVersions()
+        self._entries = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.hits = self.misses = 0
+        if path and os.path.exists(path):
+            self._load()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get(self, collection_name, key):
+        """Cached value for `key`, or `None` when missing, expired or stale."""
+        version = self.versions.get(collection_name)
+        with self._lock:
+            entry = self._entries.get((collection_name, key))
+            if entry is None or entry.expires < time.time() or entry.version != version:
+                if entry is not None:
+                    self._drop((collection_name, key))
+                self.misses += 1
+                return None
+            self._entries.move_to_end((collection_name, key))
+            self.hits += 1
+            return entry.value
+
+    def put(self, collection_name, key, value):
+        try:
+            size = len(pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL))
+        except (pickle.PicklingError, TypeError, AttributeError):
+            # Not cacheable (e.g. holds a connection); the caller still gets the fresh result
+            return
+        if size > self.max_bytes:
+            return
+        entry = _Entry(value, self.versions.get(collection_name), time.time() + self.ttl, size)
+        with self._lock:
+            if (collection_name, key) in self._entries:
+                self._drop((collection_name, key))
+            self._entries[(collection_name, key)] = entry
+            self._bytes += size
+            while len(self._entries) > self.max_entries or self._bytes > self.max_bytes:
+                self._drop(next(iter(self._entries)))
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def _drop(self, entry_key):
+        self._bytes -= self._entries.pop(entry_key).size
+
+    def save(self):
+        if not self.path:
+            return
+        now = time.time()
+        with self._lock:
+            live = [(k, e) for k, e in self._entries.items() if e.expires >= now]
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        with open(self.path + ".tmp", "wb") as f:
+            pickle.dump(live, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(self.path + ".tmp", self.path)
+
+    def _load(self):
+        try:
+            with open(self.path, "rb") as f:
+                entries = pickle.load(f)
+        except (OSError, pickle.UnpicklingError, EOFError, AttributeError):
+            # A cache that cannot be read is just empty
+            return
+        now = time.time()
+        for (collection_name, key), entry in entries:
+            if entry.expires >= now and entry.version == self.versions.get(collection_name):
+                self._entries[(collection_name, key)] = entry
+                self._bytes += entry.size
+        while len(self._entries) > self.max_entries or self._bytes > self.max_bytes:
+            self._drop(next(iter(self._entries)))
+
+
+class _CachedNamespace:
+    def __init__(self, namespace, collection_name, prefix, cache, methods):
+        self._namespace = namespace
+        self._collection_name = collection_name
+        self._prefix = prefix
+        self._cache = cache
+        self._methods = methods
+
+    def __getattr__(self, name):
+        attribute = getattr(self._namespace, name)
+        if name not in self._methods:
+            return attribute
+
+        def cached(**kwargs):
+            key = cache_key(self._collection_name, f"{self._prefix}.{name}", kwargs)
+            value = self._cache.get(self._collection_name, key)
+            instrumentation.count("query_cache.misses" if value is None else "query_cache.hits")
+            if value is None:
+                value = attribute(**kwargs)
+                self._cache.put(self._collection_name, key, value)
+            return value
+
+        return cached
+
+
+class CachedCollection:
+    """
+    Wraps a collection so `query.fetch_objects` and `aggregate.over_all` go through a `QueryCache`.
+
+    Everything else (including `generate`, `data` and `iterator`) is passed through unchanged.
+    Only keyword arguments are supported for the cached calls.
+
+        collection = CachedCollection(client.collections.get(COLLECTION_NAME), QueryCache())
+    """
+
+    def __init__(self, collection, cache):
+        self._collection = collection
+        self.cache = cache
+        self.query = _CachedNamespace(collection.query, collection.name, "query", cache, {"fetch_objects"})
+        self.aggregate = _CachedNamespace(collection.aggregate, collection.name, "aggregate", cache, {"over_all"})
+
+    def __getattr__(self, name):
+        return getattr(self._collection, name)
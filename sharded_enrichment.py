@@ -0,0 +1,211 @@
+import hashlib
+import json
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from dataclasses import asdict, dataclass, field
+
+from enrichment import enrich_subset, ensure_properties, link_duplicates, operation_fingerprint, plan_delta, wait_for_workflow, write_back
+
+DEFAULT_CHECKPOINT_PATH = "data/.cache/enrichment_shards.json"
+
+PENDING = "pending"
+RUNNING = "running"
+DONE = "done"
+FAILED = "failed"
+
+
+def topic_buckets(n):
+    """Partition function assigning objects to `n` buckets by `topic_id`."""
+    def assign(properties):
+        return f"topic-{properties['topic_id'] % n:03d}-of-{n:03d}"
+    assign.properties = ["topic_id"]
+    return assign
+
+
+def date_ranges(boundaries):
+    """
+    Partition function assigning objects to `date_created` ranges.
+
+    Args:
+        boundaries (list[datetime]): Sorted, timezone-aware range edges. Objects before the
+            first edge or after the last one get their own open-ended partitions, and
+            objects without a `date_created` get one of their own.
+    """
+    boundaries = sorted(boundaries)
+
+    def assign(properties):
+        created = properties.get("date_created")
+        if created is None:
+            return "date-undated"
+        for i, edge in enumerate(boundaries):
+            if created < edge:
+                return f"date-{i:03d}-before-{edge:%Y-%m-%d}"
+        return f"date-{len(boundaries):03d}-from-{boundaries[-1]:%Y-%m-%d}"
+    assign.properties = ["date_created"]
+    return assign
+
+
+@dataclass
+class PartitionReport:
+    name: str
+    objects: int
+    state: str = PENDING
+    attempts: int = 0
+    workflow_id: str | None = None
+    enriched: int = 0
+    elapsed: float | None = None
+    error: str | None = None
+    operations: list = field(default_factory=list)
+
+
+class ShardCheckpoint:
+    """JSON file recording the state of each partition of a sharded run, keyed by run fingerprint."""
+
+    def __init__(self, path=DEFAULT_CHECKPOINT_PATH):
+        self.path = path
+        self._lock = threading.Lock()
+        self.runs = {}
+        if os.path.exists(path):
+            with open(path, "r", encoding="utf-8") as f:
+                self.runs = json.load(f)
+
+    def get(self, run_key, name):
+        return self.runs.get(run_key, {}).get(name)
+
+    def update(self, run_key, report):
+        with self._lock:
+            self.runs.setdefault(run_key, {})[report.name] = asdict(report)
+            self._save()
+
+    def discard(self, run_keys):
+        """Drop the entries of finished runs, so running the same work again really runs it."""
+        with self._lock:
+            for run_key in run_keys:
+                self.runs.pop(run_key, None)
+            self._save()
+
+    def _save(self):
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(self.runs, f, indent=2)
+        os.replace(tmp_path, self.path)
+
+
+def _run_key(operations, name, uuids, plan):
+    # The input hashes make a partition whose objects changed again a new run, not a finished one
+    hashes = sorted(plan.input_hashes.get((op.property_name, u), "") for op in operations for u in uuids)
+    payload = json.dumps([sorted(operation_fingerprint(op) for op in operations), name, sorted(uuids), hashes])
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def assign_partitions(collection, assign, uuids=None):
+    """Map each object (optionally only `uuids`) to a partition name. Returns {name: set of uuids}."""
+    partitions = {}
+    for o in collection.iterator(return_properties=assign.properties):
+        obj_uuid = str(o.uuid)
+        if uuids is None or obj_uuid in uuids:
+            partitions.setdefault(assign(o.properties), set()).add(obj_uuid)
+    return partitions
+
+
+def run_sharded(
+    client,
+    collection_name,
+    operations,
+    cache,
+    assign,
+    max_concurrency=4,
+    max_retries=2,
+    backoff_base=30.0,
+    incremental=True,
+    checkpoint=None,
+    wait=wait_for_workflow,
+    report=print,
+    on_release=None,
+):
+    """
+    Enrich a collection as independent TransformationAgent jobs, one per partition.
+
+    Each partition is staged into its own collection and enriched in parallel with at
+    most `max_concurrency` jobs in flight. A failed partition is retried with backoff
+    without affecting the others (a partition whose workflow was submitted waits for that
+    workflow again), and finished partitions are checkpointed, so a re-run
+    only redoes what failed. Once every partition is done, the run's checkpoint entries are
+    dropped. Results go through the same cache as `enrichment.run_delta`.
+
+    Args:
+        assign: Partition function, see `topic_buckets` and `date_ranges`
+        incremental (bool): Skip objects whose results are cached; otherwise enrich everything
+
+    Returns:
+        dict: Merged report with per-partition `PartitionReport`s and totals
+    """
+    checkpoint = checkpoint or ShardCheckpoint()
+    source = client.collections.get(collection_name)
+    plan = plan_delta(source, operations, cache, force=not incremental)
+    ensure_properties(source, operations)
+    if plan.writeback:
+        write_back(source, plan.writeback)
+
+    partitions = assign_partitions(source, assign, plan.pending_uuids)
+
+    run_keys = {}
+
+    def run_partition(index, name, uuids):
+        pending_ops = [op for op in operations if plan.pending.get(op.property_name, set()) & uuids]
+        run_key = run_keys[name] = _run_key(pending_ops, name, uuids, plan)
+        part = PartitionReport(name=name, objects=len(uuids), operations=[op.property_name for op in pending_ops])
+        previous = checkpoint.get(run_key, name)
+        if previous and previous["state"] == DONE:
+            return PartitionReport(**previous)
+
+        staging_name = f"{collection_name}Part{index:03d}"
+        while True:
+            part.attempts += 1
+            part.state = RUNNING
+            start = time.monotonic()
+            try:
+                def submitted(workflow_id):
+                    part.workflow_id = workflow_id
+                    checkpoint.update(run_key, part)
+
+                # A wait that failed (e.g. the status API was unreachable) leaves the workflow running
+                # on its staging collection: wait for it again rather than paying for a second run
+                resume_id = part.workflow_id if part.workflow_id and client.collections.exists(staging_name) else None
+                _, part.enriched = enrich_subset(
+                    client, source, pending_ops, uuids, plan, cache, staging_name,
+                    wait=wait, on_submit=submitted, on_release=on_release, workflow_id=resume_id,
+                )
+                part.state = DONE
+                part.error = None
+            except Exception as e:
+                part.error = str(e)
+                part.state = FAILED if part.attempts > max_retries else PENDING
+            part.elapsed = time.monotonic() - start
+            checkpoint.update(run_key, part)
+            report(f"[{name}] {part.state} after attempt {part.attempts} ({part.elapsed:.0f}s)")
+            if part.state != PENDING:
+                return part
+            time.sleep(backoff_base * 2 ** (part.attempts - 1))
+
+    with ThreadPoolExecutor(max_workers=max_concurrency) as executor:
+        futures = [
+            executor.submit(run_partition, i, name, uuids)
+            for i, (name, uuids) in enumerate(sorted(partitions.items()))
+        ]
+        results = [f.result() for f in as_completed(futures)]
+
+    if all(r.state == DONE for r in results):
+        checkpoint.discard(run_keys.values())
+    results.sort(key=lambda r: r.name)
+    return {
+        "partitions": results,
+        "from_cache": plan.summary()["from_cache"],
+        "done": sum(r.state == DONE for r in results),
+        "failed": sum(r.state == FAILED for r in results),
+        "enriched": sum(r.enriched for r in results),
+        "linked": link_duplicates(source, operations, plan) if plan.linked else 0,
+    }
@@ -0,0 +1,233 @@
+import bisect
+import json
+import math
+import os
+import random
+import re
+from collections import Counter
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+
+from forum_data import iter_records
+from helpers import CATEGORY_DICTS
+
+DEFAULT_SOURCE = "data/simplified_posts.json"
+JSON = "json"
+JSONL = "jsonl"
+FORMATS = [JSON, JSONL]
+
+_WORD = re.compile(r"[A-Za-z][A-Za-z0-9_'.-]*[A-Za-z0-9]|[A-Za-z]|\d+")
+_POST_START = re.compile(r"^\[[^\]\n]+ \(\d{4}-", re.MULTILINE)
+# Share of the longest threads modelled by a Pareto tail rather than resampled
+_TAIL_FRACTION = 0.05
+
+
+@dataclass
+class CorpusProfile:
+    """
+    Statistics of a real export that synthetic threads are drawn from.
+
+    Conversation lengths are resampled from the observed ones, except the top 5%, which
+    follow a Pareto tail fitted to them (capped at `max_length`), so large corpora produce
+    threads longer than any in the source. Words are drawn by their frequency in the source.
+    """
+
+    conversation_lengths: list
+    title_lengths: list
+    chars_per_post: float
+    accepted_rate: float
+    user_ids: tuple
+    date_range: tuple
+    words: list
+    cum_weights: list
+    tail_start: float
+    tail_alpha: float
+    max_length: int
+
+    @classmethod
+    def from_file(cls, path=DEFAULT_SOURCE, vocabulary=20000, max_length_factor=4):
+        lengths, titles, posts, accepted, users, dates = [], [], [], 0, [], []
+        counts = Counter()
+        for row in iter_records(path):
+            conversation = row.get("conversation") or ""
+            lengths.append(len(conversation))
+            titles.append(len(row.get("title") or ""))
+            posts.append(max(1, len(_POST_START.findall(conversation))))
+            accepted += bool(row.get("has_accepted_answer"))
+            users.append(row.get("user_id") or 0)
+            dates.append(row["date_created"])
+            counts.update(_WORD.findall(conversation))
+        if not lengths:
+            raise ValueError(f"No records in {path}")
+
+        lengths.sort()
+        words, weights = zip(*counts.most_common(vocabulary))
+        tail_start, tail_alpha = fit_pareto_tail(lengths, _TAIL_FRACTION)
+        return cls(
+            conversation_lengths=lengths,
+            title_lengths=sorted(titles),
+            chars_per_post=sum(lengths) / sum(posts),
+            accepted_rate=accepted / len(lengths),
+            user_ids=(min(users), max(users)),
+            date_range=(min(dates), max(dates)),
+            words=list(words),
+            cum_weights=list(_accumulate(weights)),
+            tail_start=tail_start,
+            tail_alpha=tail_alpha,
+            max_length=lengths[-1] * max_length_factor,
+        )
+
+    def sample_length(self, rng):
+        body = bisect.bisect_left(self.conversation_lengths, self.tail_start)
+        if rng.random() < _TAIL_FRACTION or not body:
+            # Inverse CDF of the Pareto tail
+            length = self.tail_start / (1 - rng.random()) ** (1 / self.tail_alpha)
+            return int(min(length, self.max_length))
+        length = self.conversation_lengths[rng.randrange(body)]
+        return max(1, int(length * rng.uniform(0.9, 1.1)))
+
+
+def _accumulate(values):
+    total = 0
+    for value in values:
+        total += value
+        yield total
+
+
+def fit_pareto_tail(sorted_lengths, fraction=_TAIL_FRACTION):
+    """
+    Hill estimate of the Pareto tail above the (1 - `fraction`) quantile.
+
+    Returns:
+        tuple: (tail start, shape alpha)
+    """
+    k = max(2, int(len(sorted_lengths) * fraction))
+    tail = sorted_lengths[-k:]
+    start = tail[0] or 1
+    logs = sum(math.log(x / start) for x in tail if x > 0)
+    return float(start), (len(tail) / logs) if logs else 3.0
+
+
+def _text(rng, profile, n_chars, sentence_words=(6, 18), sentences=(1, 5)):
+    """About `n_chars` of prose: sentences of frequency-weighted words, grouped into paragraphs."""
+    # Draw all the words at once (about 6 characters each with the space), then cut into sentences
+    words = rng.choices(profile.words, cum_weights=profile.cum_weights, k=n_chars // 5 + 1)
+    paragraphs, paragraph, size, i = [], [], 0, 0
+    remaining = rng.randint(*sentences)
+    while size < n_chars and i < len(words):
+        n = rng.randint(*sentence_words)
+        sentence = " ".join(words[i:i + n])
+        i += n
+        paragraph.append(sentence[:1].upper() + sentence[1:] + rng.choice(".?."))
+        size += len(paragraph[-1]) + 1
+        remaining -= 1
+        if not remaining:
+            paragraphs.append(" ".join(paragraph))
+            paragraph, remaining = [], rng.randint(*sentences)
+    if paragraph:
+        paragraphs.append(" ".join(paragraph))
+    return "\n\n".join(paragraphs)[:n_chars]
+
+
+def _format_time(value):
+    return value.strftime("%Y-%m-%dT%H:%M:%S.") + f"{value.microsecond // 1000:03d}Z"
+
+
+def synthetic_labels(rng):
+    """
+    Transformation Agent properties for load-testing the analysis, with skewed category frequencies.
+
+    Returns:
+        dict: technicalComplexity, the `CATEGORY_DICTS` properties, the two flags and `summary`
+    """
+    labels = {}
+    for prop, categories in CATEGORY_DICTS.items():
+        names = list(categories)
+        labels[prop] = rng.choices(names, weights=[1 / (i + 1) for i in range(len(names))])[0]
+    labels["technicalComplexity"] = rng.choices([1, 2, 3, 4, 5], weights=[2, 4, 5, 3, 1])[0]
+    labels["causedByOutdatedStack"] = rng.random() < 0.25
+    labels["isDocumentationGap"] = rng.random() < 0.3
+    labels["summary"] = ""
+    return labels
+
+
+def make_thread(profile, topic_id, seed=0, labels=False):
+    """
+    One synthetic thread. Threads depend only on (`seed`, `topic_id`), so a smaller corpus
+    with the same seed is a prefix of a larger one.
+    """
+    rng = random.Random(f"{seed}:{topic_id}")
+    low, high = (datetime.fromisoformat(d.replace("Z", "+00:00")) for d in profile.date_range)
+    created = low + timedelta(seconds=rng.uniform(0, (high - low).total_seconds()))
+
+    user_id = rng.randint(*profile.user_ids)
+    length = profile.sample_length(rng)
+    n_posts = max(1, round(length / profile.chars_per_post * rng.uniform(0.5, 1.5)))
+    # Uneven post sizes, summing to the thread length
+    weights = [rng.expovariate(1.0) for _ in range(n_posts)]
+    total = sum(weights)
+    posts, posted = [], created
+    for i, weight in enumerate(weights):
+        author = f"user{rng.randint(*profile.user_ids) if i else user_id}"
+        header = f"[{author} ({_format_time(posted)})]: "
+        posts.append(header + _text(rng, profile, max(20, int(length * weight / total) - len(header))))
+        posted += timedelta(minutes=rng.expovariate(1 / 180))
+
+    title_words = max(1, rng.choice(profile.title_lengths) // 6)
+    title = " ".join(rng.choices(profile.words, cum_weights=profile.cum_weights, k=title_words))
+    row = {
+        "user_id": user_id,
+        "conversation": "\n\n".join(posts),
+        "date_created": _format_time(created),
+        "has_accepted_answer": rng.random() < profile.accepted_rate,
+        "title": title[:1].upper() + title[1:],
+        "topic_id": topic_id,
+    }
+    if labels:
+        row.update(synthetic_labels(rng))
+    return row
+
+
+def iter_threads(count, profile=None, seed=0, labels=False, first_topic_id=1):
+    """Yield `count` synthetic threads, one at a time."""
+    profile = profile or CorpusProfile.from_file()
+    for topic_id in range(first_topic_id, first_topic_id + count):
+        yield make_thread(profile, topic_id, seed, labels)
+
+
+def write_corpus(path, count, profile=None, seed=0, labels=False, fmt=None, first_topic_id=1):
+    """
+    Stream a synthetic corpus to `path` as a JSON array or JSON Lines, one thread in memory at a time.
+
+    Args:
+        fmt (str | None): `json` or `jsonl`; defaults from the file extension
+        labels (bool): Also write pre-labelled enrichment columns (see `synthetic_labels`)
+
+    Returns:
+        int: Number of threads written
+    """
+    fmt = fmt or (JSONL if path.endswith((".jsonl", ".ndjson")) else JSON)
+    if fmt not in FORMATS:
+        raise ValueError(f"Unknown format '{fmt}', expected one of {FORMATS}")
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+
+    n = 0
+    with open(path + ".tmp", "w", encoding="utf-8") as f:
+        if fmt == JSON:
+            f.write("[")
+        for row in iter_threads(count, profile, seed, labels, first_topic_id):
+            line = json.dumps(row, ensure_ascii=False)
+            if fmt == JSON:
+                f.write(("," if n else "") + "\n  " + line)
+            else:
+                f.write(line + "\n")
+            n += 1
+        if fmt == JSON:
+            f.write("\n]\n")
+    os.replace(path + ".tmp", path)
+    return n
+
+
+def length_percentiles(lengths, quantiles=(0.5, 0.9, 0.99, 1.0)):
+    ordered = sorted(lengths)
+    return {q: ordered[min(len(ordered) - 1, int(q * len(ordered)))] for q in quantiles} if ordered else {}
@@ -0,0 +1,206 @@
+import os
+from dataclasses import dataclass
+
+import numpy as np
+
+import instrumentation
+from vector_store import DEFAULT_STORE_DIR, VectorStore, export_store, normalize
+
+DEFAULT_CLUSTERS_PATH = "data/.cache/topics/clusters.npz"
+
+
+def _kmeans_plus_plus(sample, k, rng):
+    """Greedy k-means++ seeding on unit vectors with cosine distance: the best of 2 + log(k) candidates per step."""
+    trials = 2 + int(np.log(k))
+    centers = [sample[rng.integers(len(sample))]]
+    distance = np.clip(1.0 - sample @ centers[0], 0, None)
+    for _ in range(1, k):
+        weights = distance ** 2
+        total = weights.sum()
+        if total <= 0:
+            candidates = rng.integers(len(sample), size=trials)
+        else:
+            candidates = rng.choice(len(sample), size=trials, p=weights / total)
+        candidate_distance = np.minimum(distance, np.clip(1.0 - sample @ sample[candidates].T, 0, None).T)
+        best = int((candidate_distance ** 2).sum(axis=1).argmin())
+        centers.append(sample[candidates[best]])
+        distance = candidate_distance[best]
+    return np.array(centers, dtype=np.float32)
+
+
+def assign(vectors, centers, chunk_size=8192):
+    """
+    Nearest center of every vector, in chunks so memory-mapped arrays are read sequentially.
+
+    Returns:
+        tuple: (labels int32 array, cosine similarity to the assigned center, float32 array)
+    """
+    labels = np.empty(len(vectors), dtype=np.int32)
+    similarity = np.empty(len(vectors), dtype=np.float32)
+    for start in range(0, len(vectors), chunk_size):
+        scores = np.asarray(vectors[start:start + chunk_size]) @ centers.T
+        labels[start:start + chunk_size] = scores.argmax(axis=1)
+        similarity[start:start + chunk_size] = scores.max(axis=1)
+    return labels, similarity
+
+
+def minibatch_kmeans(vectors, k, batch_size=1024, max_iter=200, tol=1e-4, seed=0, init_size=None, n_init=3,
+                     reassignment_ratio=0.05):
+    """
+    Spherical mini-batch k-means (Sculley, 2010) on unit vectors.
+
+    Each step assigns a random batch to the nearest centers and moves every center towards
+    the mean of its batch members, with a learning rate of 1 / (points it has seen so far).
+    Centers are seeded with k-means++ on `n_init` samples of `init_size` vectors (default
+    3 * k, at least `batch_size`), keeping the seeding that fits a held-out sample best. During the first half of the steps, centers that recently won
+    fewer than `reassignment_ratio` times the points of the busiest one are moved to poorly
+    fitted batch points, so a bad seed does not leave clusters empty while others are merged.
+
+    Returns:
+        np.ndarray: (k, dimensions) float32 unit centers
+    """
+    n = len(vectors)
+    k = min(k, n)
+    rng = np.random.default_rng(seed)
+    init_size = min(n, init_size or max(3 * k, batch_size))
+    held_out = np.asarray(vectors[np.sort(rng.choice(n, size=init_size, replace=False))], dtype=np.float32)
+    centers, fit = None, -np.inf
+    for _ in range(n_init):
+        sample = np.asarray(vectors[np.sort(rng.choice(n, size=init_size, replace=False))], dtype=np.float32)
+        candidate = _kmeans_plus_plus(sample, k, rng)
+        candidate_fit = (held_out @ candidate.T).max(axis=1).sum()
+        if candidate_fit > fit:
+            centers, fit = candidate, candidate_fit
+    counts = np.zeros(k, dtype=np.float64)
+    # Points won per center, decayed so centers that stopped winning any show up as starved
+    recent = np.zeros(k, dtype=np.float64)
+
+    for step in range(max_iter):
+        batch = np.asarray(vectors[np.sort(rng.choice(n, size=min(batch_size, n), replace=False))])
+        scores = batch @ centers.T
+        labels = scores.argmax(axis=1)
+        sums = np.zeros_like(centers)
+        np.add.at(sums, labels, batch)
+        seen = np.bincount(labels, minlength=k)
+        counts += seen
+        recent = 0.8 * recent + seen
+        moved = seen > 0
+        previous = centers.copy()
+        centers[moved] += (sums[moved] - seen[moved, None] * centers[moved]) / counts[moved, None].astype(np.float32)
+        centers = normalize(centers)
+
+        starved = recent < reassignment_ratio * recent.max()
+        if step < max_iter // 2 and starved.any():
+            # With more starved centers than batch points, reseed as many as there are points
+            starved[np.flatnonzero(starved)[len(batch):]] = False
+            distance = np.clip(1.0 - scores.max(axis=1), 1e-12, None)
+            picks = rng.choice(len(batch), size=int(starved.sum()), replace=False, p=distance / distance.sum())
+            centers[starved] = normalize(batch[picks])
+            counts[starved] = counts[~starved].min()
+            recent[starved] = recent[~starved].mean()
+            continue
+        if np.abs(centers - previous).max() < tol:
+            break
+    return centers
+
+
+def representatives(labels, similarity, per_cluster=5):
+    """
+    Indices of the `per_cluster` members closest to their center, per cluster.
+
+    The nearest members of a spherical k-means cluster approximate its medoids at the
+    cost of one sort, rather than the pairwise distances a true medoid needs.
+
+    Returns:
+        dict: cluster -> array of indices, most central first
+    """
+    order = np.lexsort((-similarity, labels))
+    sorted_labels = labels[order]
+    starts = np.flatnonzero(np.r_[True, sorted_labels[1:] != sorted_labels[:-1]])
+    return {int(sorted_labels[s]): order[s:s + per_cluster] for s in starts}
+
+
+@dataclass
+class TopicClusters:
+    """Result of clustering a collection: every object's cluster and the most central objects of each."""
+
+    vector_name: str
+    uuids: list
+    labels: np.ndarray
+    similarity: np.ndarray
+    centers: np.ndarray
+    # cluster -> uuids of its most central objects
+    representatives: dict
+
+    @property
+    def sizes(self):
+        return np.bincount(self.labels, minlength=len(self.centers))
+
+    def cohesion(self):
+        """Mean cosine similarity of each cluster's members to its center."""
+        sizes = self.sizes
+        totals = np.bincount(self.labels, weights=self.similarity, minlength=len(self.centers))
+        return np.divide(totals, sizes, out=np.zeros(len(sizes)), where=sizes > 0)
+
+    def by_size(self):
+        """Non-empty clusters, largest first."""
+        sizes = self.sizes
+        return [int(c) for c in np.argsort(-sizes, kind="stable") if sizes[c]]
+
+    def save(self, path=DEFAULT_CLUSTERS_PATH):
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        np.savez(
+            path,
+            vector_name=self.vector_name,
+            uuids=np.array(self.uuids),
+            labels=self.labels,
+            similarity=self.similarity,
+            centers=self.centers,
+        )
+
+    @classmethod
+    def load(cls, path=DEFAULT_CLUSTERS_PATH, per_cluster=5):
+        with np.load(path) as data:
+            labels, similarity = data["labels"], data["similarity"]
+            uuids = data["uuids"].tolist()
+            result = cls(str(data["vector_name"]), uuids, labels, similarity, data["centers"], {})
+        result.representatives = {
+            c: [uuids[i] for i in indices] for c, indices in representatives(labels, similarity, per_cluster).items()
+        }
+        return result
+
+
+def cluster_vectors(uuids, vectors, k, vector_name="default", per_cluster=5, seed=0, batch_size=1024, max_iter=200):
+    """
+    Returns:
+        TopicClusters
+    """
+    with instrumentation.span("topics.kmeans", k=k, objects=len(uuids)):
+        centers = minibatch_kmeans(vectors, k, batch_size=batch_size, max_iter=max_iter, seed=seed)
+    with instrumentation.span("topics.assign", objects=len(uuids)):
+        labels, similarity = assign(vectors, centers)
+    central = {
+        c: [uuids[i] for i in indices] for c, indices in representatives(labels, similarity, per_cluster).items()
+    }
+    return TopicClusters(vector_name, uuids, labels, similarity, centers, central)
+
+
+def discover_topics(collection, k=12, vector_name="default", per_cluster=5, seed=0, store_path=DEFAULT_STORE_DIR,
+                    export=True):
+    """
+    Cluster every object of `collection` by one of its named vectors.
+
+    The vectors are read from the local vector store at `store_path` (see `vector_store`), which is
+    memory-mapped, so corpora larger than RAM can still be clustered. With `export` the store is
+    first rewritten from the collection, with all named vectors so it stays usable for search.
+
+    Returns:
+        TopicClusters
+    """
+    if export:
+        export_store(collection, store_path)
+    store = VectorStore.open(store_path)
+    if not len(store):
+        raise ValueError(f"No objects of {collection.name} have a '{vector_name}' vector")
+    uuids = [store.uuid(i) for i in range(len(store))]
+    return cluster_vectors(uuids, store.matrix(vector_name), k, vector_name, per_cluster, seed)
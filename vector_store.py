@@ -0,0 +1,392 @@
+import json
+import os
+import shutil
+import tempfile
+from datetime import datetime, timezone
+
+import numpy as np
+
+import instrumentation
+
+DEFAULT_STORE_DIR = "data/vectors"
+QUANTIZATIONS = ["none", "int8"]
+_UUID_DTYPE = "S36"
+_FILE_SUFFIX = {"float32": "f32", "int8": "i8"}
+
+
+def normalize(vectors):
+    """Rows scaled to unit length (zero rows are left as they are)."""
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return vectors / norms
+
+
+def quantize_int8(vectors):
+    """
+    Symmetric per-row int8 quantization.
+
+    Returns:
+        tuple: (int8 array, float32 per-row scale), with `vectors ~= codes * scale[:, None]`
+    """
+    scale = np.abs(vectors).max(axis=1) / 127.0
+    scale[scale == 0] = 1.0
+    codes = np.clip(np.rint(vectors / scale[:, None]), -127, 127).astype(np.int8)
+    return codes, scale.astype(np.float32)
+
+
+class _VectorWriter:
+    """Appends unit vectors of one named vector to its raw file, quantizing each chunk if asked."""
+
+    def __init__(self, directory, name, dimensions, dtype):
+        self.name = name
+        self.dimensions = dimensions
+        self.dtype = dtype
+        self.file = f"{name}.{_FILE_SUFFIX[dtype]}"
+        self._f = open(os.path.join(directory, self.file), "wb")
+        self._scales = []
+
+    def write(self, rows):
+        vectors = normalize(np.asarray(rows, dtype=np.float32))
+        if self.dtype == "int8":
+            vectors, scale = quantize_int8(vectors)
+            self._scales.append(scale)
+        self._f.write(vectors.tobytes())
+
+    def close(self, directory):
+        self._f.close()
+        if self.dtype == "int8":
+            scales = np.concatenate(self._scales) if self._scales else np.empty(0, dtype=np.float32)
+            np.save(os.path.join(directory, f"{self.name}.scale.npy"), scales)
+        return {"file": self.file, "dimensions": self.dimensions, "dtype": self.dtype}
+
+
+def export_store(collection, path=DEFAULT_STORE_DIR, vector_names=None, quantize="none", chunk_size=4096, cache_size=1000):
+    """
+    Write every named vector of every object, plus uuid and `topic_id` mappings, to `path`.
+
+    One iterator pass over the collection; vectors are L2-normalized (so dot product is cosine
+    similarity) and appended in chunks of `chunk_size` rows to one raw file per named vector,
+    which `VectorStore.open` memory-maps. Objects missing any of the selected vectors are skipped,
+    so row `i` of every vector file belongs to the same object.
+
+    The store is written to a temporary sibling directory that replaces `path` only once it is
+    complete, so a failed export leaves the previous store intact. IVF indexes of the previous
+    store are dropped with it, as the rows are renumbered.
+
+    Args:
+        vector_names (list[str] | None): Named vectors to export; defaults to all of the first object's
+        quantize (str): 'none' (float32) or 'int8' (4x smaller, per-row scale)
+
+    Returns:
+        int: Number of objects exported
+    """
+    if quantize not in QUANTIZATIONS:
+        raise ValueError(f"Unknown quantization '{quantize}', expected one of {QUANTIZATIONS}")
+    path = os.path.normpath(path)
+    parent, name = os.path.split(path)
+    os.makedirs(parent or ".", exist_ok=True)
+    staging = tempfile.mkdtemp(dir=parent or ".", prefix=f".{name}-")
+    try:
+        count = _write_store(collection, staging, vector_names, quantize, chunk_size, cache_size)
+        if os.path.exists(path):
+            # Open memory maps keep reading the old files, which are unlinked but not yet freed
+            previous = tempfile.mkdtemp(dir=parent or ".", prefix=f".{name}-old-")
+            os.rename(path, os.path.join(previous, name))
+            os.rename(staging, path)
+            shutil.rmtree(previous)
+        else:
+            os.rename(staging, path)
+    except BaseException:
+        shutil.rmtree(staging, ignore_errors=True)
+        raise
+    return count
+
+
+def _write_store(collection, path, vector_names, quantize, chunk_size, cache_size):
+    dtype = "int8" if quantize == "int8" else "float32"
+    writers, uuids, topic_ids = None, [], []
+    pending, skipped = {}, 0
+
+    def flush():
+        if not pending or not pending[next(iter(writers))]:
+            return
+        for name, writer in writers.items():
+            writer.write(pending[name])
+            pending[name] = []
+
+    try:
+        with instrumentation.span("vectors.export", quantize=quantize) as export_span:
+            include = vector_names if vector_names else True
+            for o in collection.iterator(include_vector=include, return_properties=["topic_id"], cache_size=cache_size):
+                vectors = o.vector or {}
+                if writers is None:
+                    names = list(vector_names or vectors)
+                    if not names or any(vectors.get(name) is None for name in names):
+                        skipped += 1
+                        continue
+                    writers = {name: _VectorWriter(path, name, len(vectors[name]), dtype) for name in names}
+                    pending = {name: [] for name in names}
+                if any(vectors.get(name) is None for name in writers):
+                    skipped += 1
+                    continue
+                for name in writers:
+                    pending[name].append(vectors[name])
+                uuids.append(str(o.uuid))
+                topic_id = o.properties.get("topic_id")
+                topic_ids.append(-1 if topic_id is None else int(topic_id))
+                if len(pending[next(iter(writers))]) >= chunk_size:
+                    flush()
+            if writers is None:
+                raise ValueError(f"No objects of {collection.name} have the vectors {vector_names or '(any)'}")
+            flush()
+            vector_meta = {name: writer.close(path) for name, writer in writers.items()}
+            export_span.set(objects=len(uuids), skipped=skipped)
+    except BaseException:
+        for writer in (writers or {}).values():
+            writer._f.close()
+        raise
+
+    np.save(os.path.join(path, "uuids.npy"), np.array(uuids, dtype=_UUID_DTYPE))
+    np.save(os.path.join(path, "topic_ids.npy"), np.array(topic_ids, dtype=np.int64))
+    meta = {
+        "collection": collection.name,
+        "count": len(uuids),
+        "skipped": skipped,
+        "exported": datetime.now(timezone.utc).isoformat(),
+        "vectors": vector_meta,
+    }
+    with open(os.path.join(path, "meta.json"), "w", encoding="utf-8") as f:
+        json.dump(meta, f, indent=2)
+    return len(uuids)
+
+
+def _merge_top_k(best_scores, best_rows, scores, rows, k):
+    """Keep the `k` highest of two (queries, n) score blocks, unsorted."""
+    scores = np.concatenate([best_scores, scores], axis=1)
+    rows = np.concatenate([best_rows, rows], axis=1)
+    if scores.shape[1] <= k:
+        return scores, rows
+    keep = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+    return np.take_along_axis(scores, keep, axis=1), np.take_along_axis(rows, keep, axis=1)
+
+
+def _sorted(scores, rows):
+    order = np.argsort(-scores, axis=1, kind="stable")
+    return np.take_along_axis(scores, order, axis=1), np.take_along_axis(rows, order, axis=1)
+
+
+class VectorStore:
+    """
+    Read-only, memory-mapped view of a store written by `export_store`.
+
+    Opening it reads only `meta.json`; vectors, uuids and topic ids are memory-mapped and paged
+    in by the OS as searches touch them. Searches are exact (brute-force) unless an `IVFIndex`
+    is passed.
+    """
+
+    def __init__(self, path, meta):
+        self.path = path
+        self.meta = meta
+        self.uuids = np.load(os.path.join(path, "uuids.npy"), mmap_mode="r")
+        self.topic_ids = np.load(os.path.join(path, "topic_ids.npy"), mmap_mode="r")
+        self._vectors = {}
+        self._rows_by_uuid = self._rows_by_topic = None
+
+    @classmethod
+    def open(cls, path=DEFAULT_STORE_DIR):
+        with open(os.path.join(path, "meta.json"), "r", encoding="utf-8") as f:
+            return cls(path, json.load(f))
+
+    def __len__(self):
+        return self.meta["count"]
+
+    @property
+    def vector_names(self):
+        return list(self.meta["vectors"])
+
+    def vectors(self, name):
+        """
+        Returns:
+            tuple: (memory-mapped (n, dimensions) float32 or int8 array, per-row scales or None)
+        """
+        if name not in self._vectors:
+            info = self.meta["vectors"].get(name)
+            if info is None:
+                raise KeyError(f"No '{name}' vectors in {self.path}, only {self.vector_names}")
+            data = np.memmap(
+                os.path.join(self.path, info["file"]), dtype=info["dtype"], mode="r",
+                shape=(len(self), info["dimensions"]),
+            )
+            scales = np.load(os.path.join(self.path, f"{name}.scale.npy")) if info["dtype"] == "int8" else None
+            self._vectors[name] = (data, scales)
+        return self._vectors[name]
+
+    def matrix(self, name):
+        """Row-sliceable (n, dimensions) float32 unit vectors: the memory map, or a dequantizing view of int8 codes."""
+        data, scales = self.vectors(name)
+        return data if scales is None else _DequantizedView(data, scales)
+
+    def get(self, name, rows):
+        """float32 unit vectors of `rows` (dequantized if the store is int8)."""
+        data, scales = self.vectors(name)
+        rows = np.asarray(rows)
+        block = np.asarray(data[rows], dtype=np.float32)
+        return block * scales[rows, None] if scales is not None else block
+
+    def uuid(self, row):
+        return self.uuids[row].decode("ascii")
+
+    def row_of(self, obj_uuid):
+        if self._rows_by_uuid is None:
+            self._rows_by_uuid = {u.decode("ascii"): i for i, u in enumerate(self.uuids)}
+        return self._rows_by_uuid.get(str(obj_uuid))
+
+    def row_of_topic(self, topic_id):
+        if self._rows_by_topic is None:
+            self._rows_by_topic = {int(t): i for i, t in enumerate(self.topic_ids) if t >= 0}
+        return self._rows_by_topic.get(int(topic_id))
+
+    def _scores(self, name, queries, start, stop):
+        data, scales = self.vectors(name)
+        scores = queries @ np.asarray(data[start:stop], dtype=np.float32).T
+        return scores * scales[start:stop] if scales is not None else scores
+
+    def search(self, name, queries, k=10, index=None, n_probe=8, exclude=None, chunk_size=65536):
+        """
+        Top-`k` cosine similarity for a batch of query vectors.
+
+        Args:
+            queries: (m, dimensions) array, or one vector; normalized here
+            index (IVFIndex | None): Approximate search over `n_probe` lists instead of a full scan
+            exclude: Optional (m,) rows to leave out of each query's results, e.g. the query's own row
+
+        Returns:
+            tuple: (rows, scores), (m, k) arrays sorted by descending similarity; rows are -1 where
+            fewer than `k` candidates exist
+        """
+        queries = normalize(np.atleast_2d(np.asarray(queries, dtype=np.float32)))
+        extra = 0 if exclude is None else 1
+        if index is not None:
+            rows, scores = index.search(self, queries, k + extra, n_probe)
+        else:
+            m = len(queries)
+            best_scores = np.empty((m, 0), dtype=np.float32)
+            best_rows = np.empty((m, 0), dtype=np.int64)
+            for start in range(0, len(self), chunk_size):
+                stop = min(start + chunk_size, len(self))
+                scores = self._scores(name, queries, start, stop)
+                rows = np.broadcast_to(np.arange(start, stop), scores.shape)
+                best_scores, best_rows = _merge_top_k(best_scores, best_rows, scores, rows, k + extra)
+            scores, rows = _sorted(best_scores, best_rows)
+        if exclude is not None:
+            keep = rows != np.asarray(exclude)[:, None]
+            # Drop the excluded row where present, else the lowest-scoring result
+            keep[np.arange(len(keep)), np.where(keep.all(axis=1), keep.shape[1] - 1, keep.argmin(axis=1))] = False
+            rows = rows[keep].reshape(len(rows), -1)
+            scores = scores[keep].reshape(len(scores), -1)
+        rows, scores = rows[:, :k], scores[:, :k]
+        if rows.shape[1] < k:
+            pad = k - rows.shape[1]
+            rows = np.pad(rows, ((0, 0), (0, pad)), constant_values=-1)
+            scores = np.pad(scores, ((0, 0), (0, pad)), constant_values=-np.inf)
+        return rows, scores
+
+    def neighbors(self, name, rows, k=10, index=None, n_probe=8, batch_size=256):
+        """
+        Top-`k` most similar other objects of each stored row, in query batches of `batch_size`.
+
+        Returns:
+            tuple: (rows, scores) as in `search`
+        """
+        rows = np.asarray(rows)
+        found, similarity = [], []
+        for start in range(0, len(rows), batch_size):
+            batch = rows[start:start + batch_size]
+            r, s = self.search(name, self.get(name, batch), k, index=index, n_probe=n_probe, exclude=batch)
+            found.append(r)
+            similarity.append(s)
+        if not found:
+            return np.empty((0, k), dtype=np.int64), np.empty((0, k), dtype=np.float32)
+        return np.concatenate(found), np.concatenate(similarity)
+
+
+class IVFIndex:
+    """
+    Inverted-file index: the store's rows bucketed by nearest k-means center (see `topic_clustering`).
+
+    A query scans only the `n_probe` lists whose centers are most similar to it, trading a little
+    recall for scanning roughly n_probe / n_lists of the vectors.
+    """
+
+    def __init__(self, name, centers, order, offsets):
+        self.name = name
+        self.centers = centers
+        # Rows grouped by list: rows of list i are order[offsets[i]:offsets[i + 1]]
+        self.order = order
+        self.offsets = offsets
+
+    @classmethod
+    def build(cls, store, name, n_lists=None, seed=0):
+        from topic_clustering import assign, minibatch_kmeans
+
+        n_lists = n_lists or max(1, int(np.sqrt(len(store))))
+        vectors = store.matrix(name)
+        with instrumentation.span("vectors.ivf_build", vector=name, lists=n_lists):
+            centers = minibatch_kmeans(vectors, n_lists, seed=seed)
+            labels, _ = assign(vectors, centers)
+        order = np.argsort(labels, kind="stable")
+        offsets = np.concatenate([[0], np.cumsum(np.bincount(labels, minlength=len(centers)))])
+        return cls(name, centers, order, offsets)
+
+    @staticmethod
+    def path_for(store, name):
+        return os.path.join(store.path, f"{name}.ivf.npz")
+
+    def save(self, store):
+        np.savez(self.path_for(store, self.name), centers=self.centers, order=self.order, offsets=self.offsets)
+
+    @classmethod
+    def load(cls, store, name):
+        with np.load(cls.path_for(store, name)) as data:
+            return cls(name, data["centers"], data["order"], data["offsets"])
+
+    def search(self, store, queries, k, n_probe=8):
+        """List-major batched search: each probed list is read once and scored against every query probing it."""
+        probes = np.argsort(-(queries @ self.centers.T), axis=1)[:, :n_probe]
+        best_scores = [np.empty(0, dtype=np.float32) for _ in queries]
+        best_rows = [np.empty(0, dtype=np.int64) for _ in queries]
+        for i in np.unique(probes):
+            members = np.sort(self.order[self.offsets[i]:self.offsets[i + 1]])
+            if not len(members):
+                continue
+            probing = np.flatnonzero((probes == i).any(axis=1))
+            scores = queries[probing] @ store.get(self.name, members).T
+            for q, row_scores in zip(probing, scores):
+                merged_scores = np.concatenate([best_scores[q], row_scores])
+                merged_rows = np.concatenate([best_rows[q], members])
+                if len(merged_scores) > k:
+                    keep = np.argpartition(-merged_scores, k - 1)[:k]
+                    merged_scores, merged_rows = merged_scores[keep], merged_rows[keep]
+                best_scores[q], best_rows[q] = merged_scores, merged_rows
+
+        all_rows = np.full((len(queries), k), -1, dtype=np.int64)
+        all_scores = np.full((len(queries), k), -np.inf, dtype=np.float32)
+        for q, (scores, rows) in enumerate(zip(best_scores, best_rows)):
+            order = np.argsort(-scores, kind="stable")
+            all_rows[q, :len(order)] = rows[order]
+            all_scores[q, :len(order)] = scores[order]
+        return all_rows, all_scores
+
+
+class _DequantizedView:
+    """Row-sliceable float32 view of int8 codes, so an int8 store can be clustered like a float32 one."""
+
+    def __init__(self, codes, scales):
+        self._codes = codes
+        self._scales = scales
+
+    def __len__(self):
+        return len(self._codes)
+
+    def __getitem__(self, rows):
+        return np.asarray(self._codes[rows], dtype=np.float32) * self._scales[rows, None]
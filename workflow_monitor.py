@@ -0,0 +1,408 @@
+import asyncio
+import concurrent.futures
+import json
+import os
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from datetime import datetime, timezone
+
+from instrumentation import span
+
+try:
+    import fcntl
+except ImportError:  # Windows: state writes are serialized within the process only
+    fcntl = None
+
+DEFAULT_STATE_PATH = "data/.cache/ta_workflows.json"
+# State of a workflow given up on after `max_poll_errors` failed polls in a row; it may still be running
+UNREACHABLE = "unreachable"
+_state_lock = threading.Lock()
+
+# Keys the agent status may use for progress counters, in order of preference
+_PROCESSED_KEYS = ("items_processed", "processed_items", "completed_items", "processed")
+_TOTAL_KEYS = ("total_items", "total")
+
+
+class WorkflowPollError(RuntimeError):
+    """A workflow's status could not be polled `max_poll_errors` times in a row."""
+
+
+def _parse_time(value):
+    if not value:
+        return None
+    return datetime.strptime(value, "%Y-%m-%d %H:%M:%S").replace(tzinfo=timezone.utc)
+
+
+def _first_int(status, keys):
+    for key in keys:
+        value = status.get(key)
+        if isinstance(value, (int, float)):
+            return int(value)
+    return None
+
+
+@contextmanager
+def _locked(path):
+    """Serialize read-merge-write cycles of a state file across threads and processes."""
+    with _state_lock:
+        if fcntl is None:
+            yield
+            return
+        with open(path + ".lock", "a") as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+
+def property_progress(collection, property_name):
+    """
+    Progress probe counting objects that already have `property_name` set.
+
+    Relies on `index_null_state=True` in the collection's inverted index config.
+    Use with `WorkflowMonitor(progress_fn=...)` when the agent status has no counters.
+    """
+    from weaviate.classes.query import Filter
+
+    def probe(workflow_id):
+        total = collection.aggregate.over_all(total_count=True).total_count
+        try:
+            done = collection.aggregate.over_all(
+                total_count=True,
+                filters=Filter.by_property(property_name).is_none(False),
+            ).total_count
+        except Exception:
+            # The property does not exist until the agent writes its first value
+            done = 0
+        return done, total
+
+    return probe
+
+
+@dataclass
+class WorkflowProgress:
+    workflow_id: str
+    label: str | None
+    state: str
+    elapsed: float | None
+    processed: int | None = None
+    total: int | None = None
+    # Objects enriched per minute, and estimated seconds remaining
+    throughput: float | None = None
+    eta: float | None = None
+    status: dict = field(default_factory=dict, repr=False)
+    # Last poll error, when the workflow is UNREACHABLE
+    error: str | None = None
+
+    @property
+    def finished(self):
+        return self.state != "running"
+
+
+def format_progress(progress):
+    line = f"[{progress.label or progress.workflow_id}] {progress.state}"
+    if progress.elapsed is not None:
+        line += f" | elapsed {progress.elapsed:.0f}s"
+    if progress.processed is not None:
+        line += f" | {progress.processed}" + (f"/{progress.total}" if progress.total else "")
+    if progress.throughput is not None:
+        line += f" | {progress.throughput:.1f} obj/min"
+    if progress.eta is not None:
+        line += f" | ETA {progress.eta:.0f}s"
+    if progress.error is not None:
+        line += f" | {progress.error}"
+    return line
+
+
+class _Tracked:
+    def __init__(self, workflow_id, agent, label, interval, metadata=None, keep=False, progress_fn=None):
+        self.workflow_id = workflow_id
+        self.agent = agent
+        self.label = label
+        self.interval = interval
+        self.metadata = metadata or {}
+        self.keep = keep
+        self.progress_fn = progress_fn
+        self.next_poll = 0.0
+        self.first_sample = None  # (monotonic time, processed)
+        self.errors = 0  # Consecutive failed polls
+
+    def persisted(self):
+        entry = {"label": self.label, **self.metadata}
+        if self.keep:
+            entry["keep"] = True
+        return entry
+
+
+class WorkflowMonitor:
+    """
+    Polls any number of TransformationAgent workflows concurrently, without blocking the event loop.
+
+    Each workflow is polled quickly at first and then less often (`min_interval` growing by
+    `backoff` up to `max_interval`). A failed poll (timeout, 5xx) is retried on the same
+    schedule; only a workflow whose polls fail `max_poll_errors` times in a row is given up
+    on, as an UNREACHABLE progress that stays persisted. Tracked workflow IDs are persisted
+    to `state_path`, so a restarted driver can `resume()` monitoring them. Workflows tracked with `keep=True` stay
+    persisted after they finish, until `forget()`, so a driver that crashes before using the
+    results (e.g. harvesting a staging collection) can still find them.
+
+        monitor = WorkflowMonitor(agent)
+        monitor.track(response.workflow_id, label="enrichment")
+        final = asyncio.run(monitor.run(callback=lambda p: print(format_progress(p))))
+    """
+
+    def __init__(
+        self,
+        agent=None,
+        state_path=DEFAULT_STATE_PATH,
+        min_interval=2.0,
+        max_interval=60.0,
+        backoff=1.5,
+        progress_fn=None,
+        max_poll_errors=5,
+    ):
+        self.agent = agent
+        self.state_path = state_path
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.backoff = backoff
+        self.progress_fn = progress_fn
+        self.max_poll_errors = max_poll_errors
+        self._tracked = {}
+
+    def track(self, workflow_id, agent=None, label=None, metadata=None, keep=False, progress_fn=None):
+        """
+        Args:
+            metadata (dict | None): JSON-serializable details persisted with the workflow ID
+            keep (bool): Keep the persisted entry once the workflow finished, until `forget()`
+            progress_fn (callable | None): Overrides the monitor's `progress_fn` for this workflow
+        """
+        agent = agent or self.agent
+        if agent is None:
+            raise ValueError("An agent is required to poll a workflow")
+        self._tracked[workflow_id] = _Tracked(
+            workflow_id, agent, label, self.min_interval, metadata=metadata, keep=keep, progress_fn=progress_fn
+        )
+        self._save()
+
+    def forget(self, workflow_id):
+        """Stop tracking a workflow and remove it from the persisted state."""
+        self._tracked.pop(workflow_id, None)
+        self._save(drop=workflow_id)
+
+    def persisted(self):
+        """
+        Returns:
+            dict: workflow ID -> {"label": ..., metadata..., "keep": True if kept}, as persisted by any run
+        """
+        return self._load()
+
+    def resume(self, agent=None):
+        """Start tracking every workflow persisted by an earlier run. Returns their IDs."""
+        for workflow_id, meta in self.persisted().items():
+            if workflow_id not in self._tracked:
+                meta = dict(meta)
+                label, keep = meta.pop("label", None), meta.pop("keep", False)
+                self.track(workflow_id, agent=agent, label=label, metadata=meta, keep=keep)
+        return list(self._tracked)
+
+    async def watch(self):
+        """Async iterator of `WorkflowProgress`, one per poll, until every workflow has finished."""
+        while self._tracked:
+            now = time.monotonic()
+            due = [t for t in self._tracked.values() if t.next_poll <= now]
+            if not due:
+                await asyncio.sleep(min(t.next_poll for t in self._tracked.values()) - now)
+                continue
+            for progress in await asyncio.gather(*(self._poll(t) for t in due)):
+                if progress is None:
+                    continue
+                if progress.finished:
+                    tracked = self._tracked.pop(progress.workflow_id)
+                    # An unreachable workflow may still be running, so a later resume() can pick it up
+                    keep = tracked.keep or progress.state == UNREACHABLE
+                    self._save(drop=None if keep else progress.workflow_id)
+                yield progress
+
+    async def run(self, callback=None):
+        """
+        Poll until every tracked workflow has finished.
+
+        Returns:
+            dict: workflow ID -> final `WorkflowProgress`
+        """
+        final = {}
+        async for progress in self.watch():
+            if callback is not None:
+                callback(progress)
+            if progress.finished:
+                final[progress.workflow_id] = progress
+        return final
+
+    async def _poll(self, tracked):
+        """The workflow's progress, or None after a failed poll that will be retried."""
+        progress_fn = tracked.progress_fn or self.progress_fn
+        try:
+            with span("workflow.get_status", workflow_id=tracked.workflow_id):
+                status = await asyncio.to_thread(tracked.agent.get_status, workflow_id=tracked.workflow_id)
+            inner = status.get("status", {})
+            processed, total = _first_int(inner, _PROCESSED_KEYS), _first_int(inner, _TOTAL_KEYS)
+            if processed is None and progress_fn is not None:
+                with span("workflow.progress_probe", workflow_id=tracked.workflow_id):
+                    processed, total = await asyncio.to_thread(progress_fn, tracked.workflow_id)
+        except Exception as e:
+            return self._poll_failed(tracked, e)
+        tracked.errors = 0
+        state = inner.get("state", "unknown")
+
+        start = _parse_time(inner.get("start_time"))
+        if inner.get("total_duration"):
+            elapsed = inner["total_duration"]
+        elif start is not None:
+            end = _parse_time(inner.get("end_time")) or datetime.now(timezone.utc)
+            elapsed = (end - start).total_seconds()
+        else:
+            elapsed = None
+
+        progress = WorkflowProgress(
+            workflow_id=tracked.workflow_id,
+            label=tracked.label,
+            state=state,
+            elapsed=elapsed,
+            processed=processed,
+            total=total,
+            status=status,
+        )
+
+        now = time.monotonic()
+        if processed is not None:
+            if tracked.first_sample is None:
+                tracked.first_sample = (now, processed)
+            t0, p0 = tracked.first_sample
+            if now > t0 and processed > p0:
+                per_second = (processed - p0) / (now - t0)
+                progress.throughput = per_second * 60
+                if total:
+                    progress.eta = max(total - processed, 0) / per_second
+
+        tracked.interval = min(tracked.interval * self.backoff, self.max_interval)
+        tracked.next_poll = now + tracked.interval
+        return progress
+
+    def _poll_failed(self, tracked, error):
+        tracked.errors += 1
+        tracked.interval = min(tracked.interval * self.backoff, self.max_interval)
+        tracked.next_poll = time.monotonic() + tracked.interval
+        if tracked.errors < self.max_poll_errors:
+            return None
+        return WorkflowProgress(
+            workflow_id=tracked.workflow_id,
+            label=tracked.label,
+            state=UNREACHABLE,
+            elapsed=None,
+            error=f"{tracked.errors} status polls failed in a row, last: {error!r}",
+        )
+
+    def _load(self):
+        if not os.path.exists(self.state_path):
+            return {}
+        with open(self.state_path, "r", encoding="utf-8") as f:
+            return json.load(f)
+
+    def _save(self, drop=None):
+        directory = os.path.dirname(self.state_path) or "."
+        os.makedirs(directory, exist_ok=True)
+        with _locked(self.state_path):
+            # Merge, so workflows persisted by other monitors and processes are kept
+            state = self._load()
+            state.update({t.workflow_id: t.persisted() for t in self._tracked.values()})
+            state.pop(drop, None)
+            fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=os.path.basename(self.state_path), suffix=".tmp")
+            try:
+                with os.fdopen(fd, "w", encoding="utf-8") as f:
+                    json.dump(state, f)
+                os.replace(tmp_path, self.state_path)
+            except BaseException:
+                if os.path.exists(tmp_path):
+                    os.unlink(tmp_path)
+                raise
+
+
+class BackgroundMonitor:
+    """
+    Runs one `WorkflowMonitor` on a background event loop, so that several threads can each
+    block on their own workflow while a single monitor polls all of them and owns the state file.
+
+        with BackgroundMonitor(WorkflowMonitor(), callback=lambda p: print(format_progress(p))) as background:
+            final = background.wait(response.workflow_id, agent=agent, label="part-001")
+    """
+
+    def __init__(self, monitor, callback=None):
+        self.monitor = monitor
+        self.callback = callback
+        self._waiters = {}
+        self._task = None
+        self._loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(target=self._loop.run_forever, name="workflow-monitor", daemon=True)
+        self._thread.start()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+    def wait(self, workflow_id, agent=None, label=None, metadata=None, keep=False, progress_fn=None):
+        """
+        Track a workflow (see `WorkflowMonitor.track`) and block until it finishes.
+
+        Returns:
+            WorkflowProgress: The final poll of the workflow
+
+        Raises:
+            WorkflowPollError: The workflow's status could not be polled; it may still be running
+        """
+        future = concurrent.futures.Future()
+
+        def start():
+            # Runs on the loop thread, which is the only one touching the monitor
+            try:
+                self.monitor.track(workflow_id, agent, label, metadata=metadata, keep=keep, progress_fn=progress_fn)
+            except Exception as e:
+                future.set_exception(e)
+                return
+            self._waiters[workflow_id] = future
+            if self._task is None or self._task.done():
+                self._task = self._loop.create_task(self._serve())
+
+        self._loop.call_soon_threadsafe(start)
+        return future.result()
+
+    async def _serve(self):
+        try:
+            async for progress in self.monitor.watch():
+                if self.callback is not None:
+                    self.callback(progress)
+                if progress.finished:
+                    future = self._waiters.pop(progress.workflow_id, None)
+                    if future is None:
+                        continue
+                    if progress.state == UNREACHABLE:
+                        future.set_exception(WorkflowPollError(f"Workflow {progress.workflow_id}: {progress.error}"))
+                    else:
+                        future.set_result(progress)
+        except Exception as e:
+            # Poll errors are handled per workflow, so this is the monitor itself failing (e.g. its state file)
+            for workflow_id, future in self._waiters.items():
+                self.monitor._tracked.pop(workflow_id, None)
+                future.set_exception(e)
+            self._waiters.clear()
+
+    def close(self):
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        self._thread.join()
+        self._loop.close()